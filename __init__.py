@@ -4,6 +4,7 @@
 # WEBSITE -------> https://vinavfx.com
 # -----------------------------------------------------------
 import os
+import json
 import nuke  # type: ignore
 from .src import *
 from .testing import *
@@ -13,6 +14,102 @@ from .env import NUKE_COMFYUI_NUKE_USER
 
 update_menu_at_start = False
 path = os.path.dirname(os.path.abspath(__file__))
+nodes_dir = os.path.join(path, 'nodes')
+nodes_manifest = os.path.join(nodes_dir, 'manifest.json')
+
+
+def scan_nodes():
+    items = []
+
+    for dirname in sorted(os.listdir(nodes_dir)):
+        folder = os.path.join(nodes_dir, dirname)
+
+        if not os.path.isdir(folder):
+            continue
+
+        for nk in sorted(os.listdir(folder)):
+            if not nk.split('.')[-1] == 'nk':
+                continue
+
+            name = '{}/{}'.format('Basic Nodes' if dirname ==
+                                  'ComfyUI' else dirname, nk.split('.')[0])
+
+            items.append([name, '{}/{}'.format(dirname, nk)])
+
+    return items
+
+
+def write_nodes_manifest():
+    items = scan_nodes()
+
+    with open(nodes_manifest, 'w') as f:
+        json.dump(items, f, indent=4)
+
+    return items
+
+
+def get_nodes_manifest():
+    """List of [menu name, .nk] of the Basic Nodes and Gizmos, read from the
+    generated manifest instead of listing the directories at every start."""
+
+    try:
+        with open(nodes_manifest) as f:
+            items = json.load(f)
+
+        manifest_time = os.path.getmtime(nodes_manifest)
+        folders = set(os.path.join(nodes_dir, nk.split('/')[0]) for _, nk in items)
+        folders.add(nodes_dir)
+
+        if all(os.path.getmtime(f) <= manifest_time for f in folders):
+            return items
+
+    except (OSError, IOError, ValueError):
+        pass
+
+    try:
+        return write_nodes_manifest()
+    except (OSError, IOError):
+        return scan_nodes()
+
+
+def connect_first_show(callback):
+    """Calls 'callback' the first time the ComfyUI menu is opened, returns
+    False if the menu is not found in Qt."""
+
+    try:
+        from PySide2 import QtWidgets  # type: ignore
+    except ImportError:
+        try:
+            from PySide6 import QtWidgets  # type: ignore
+        except ImportError:
+            return False
+
+    app = QtWidgets.QApplication.instance()
+    if not app:
+        return False
+
+    called = [False]
+
+    def first_show():
+        if not called[0]:
+            called[0] = True
+            callback()
+
+    connected = False
+
+    # The Nodes toolbar and the Nodes menu of the menu bar have their own
+    # copy of the menu
+    for widget in app.allWidgets():
+        if not isinstance(widget, QtWidgets.QMenu):
+            continue
+
+        if not 'Update all ComfyUI' in [a.text().replace('&', '') for a in widget.actions()]:
+            continue
+
+        widget.aboutToShow.connect(first_show)
+        connected = True
+
+    return connected
 
 
 def setup():
@@ -20,18 +117,21 @@ def setup():
     comfyui_menu = nuke.menu('Nodes').addMenu('ComfyUI', icon=icon)
 
     icon_gray = '{}/icons/comfyui_icon_gray.png'.format(path)
-    nodes_dir = os.path.join(path, 'nodes')
 
     refresh_icon = '{}/icons/refresh.png'.format(path)
     basic_icon = '{}/icons/basic.png'.format(path)
     workflow_icon = '{}/icons/workflow.png'.format(path)
     gizmos_icon = '{}/icons/gizmos.png'.format(path)
 
+    # Modules are only imported when the commands are used
+    comfyui_menu.addCommand(
+        'Update all ComfyUI', lambda: update_menu.update(), '', refresh_icon)
+
     comfyui_menu.addCommand(
-        'Update all ComfyUI', update_menu.update, '', refresh_icon)
+        'Import Workflow', lambda: workflow_importer.import_workflow(), '', workflow_icon)
 
     comfyui_menu.addCommand(
-        'Import Workflow', workflow_importer.import_workflow, '', workflow_icon)
+        'Search Nodes', lambda: search.show_panel(), '', icon)
 
     comfyui_menu.addMenu('Basic Nodes', basic_icon)
     comfyui_menu.addMenu('Gizmos', gizmos_icon)
@@ -40,22 +140,19 @@ def setup():
         node = nuke.nodePaste(os.path.join(nodes_dir, nk))
         node.showControlPanel()
 
-    for dirname in os.listdir(nodes_dir):
-        folder = os.path.join(nodes_dir, dirname)
-
-        if not os.path.isdir(folder):
-            continue
-
-        for nk in os.listdir(folder):
-            if not nk.split('.')[-1] == 'nk':
-                continue
+    for name, nk in get_nodes_manifest():
+        comfyui_menu.addCommand(name, partial(create_node, nk), '', icon_gray)
 
-            name = '{}/{}'.format('Basic Nodes' if dirname ==
-                                  'ComfyUI' else dirname, nk.split('.')[0])
+    # The ComfyUI nodes are read from the cache and added to the menu the
+    # first time it is opened, so update_menu is not imported at start
+    if not connect_first_show(lambda: update_menu.load_menu()):
+        update_menu.load_menu()
 
-            path_nk = os.path.join(folder, nk)
-            comfyui_menu.addCommand(name, partial(
-                create_node, path_nk), '', icon_gray)
+    # Exports the inputs of the Run nodes with 'Pre-export Inputs' while the
+    # artist works, the module is imported at the first change
+    nuke.addKnobChanged(lambda: pre_export.knob_changed())
+    nuke.addOnCreate(lambda: pre_export.node_created())
+    nuke.addOnScriptLoad(lambda: pre_export.reset())
 
     if update_menu_at_start:
-        update_menu.update()
+        update_menu.update_in_background()
@@ -0,0 +1,18 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+# nuke -t nuke_comfyui/batch_import.py <workflows_dir> <output_dir> [-j 4]
+import os
+import sys
+import importlib
+
+plugin_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(plugin_dir))
+
+batch_import = importlib.import_module(
+    os.path.basename(plugin_dir) + '.src.batch_import')
+
+if __name__ == '__main__':
+    sys.exit(batch_import.main(sys.argv[1:]))
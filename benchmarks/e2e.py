@@ -0,0 +1,282 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+"""End to end throughput of run.submit against the fake ComfyUI server, with
+the nuke stub, on any Linux box without GPU:
+
+- single: jobs per second of consecutive submits;
+- iteration: the same with iteration_submit_for_node;
+- animation: overhead per frame of a frame by frame animation;
+- cancel: time from the cancel of the task until the server interrupts the
+  prompt and until the Run is released.
+
+    python benchmarks/e2e.py --jobs 20 --frames 20 --node-latency 0.05
+
+The overhead is the wall time minus the time the fake server spent
+'executing', that is, the cost of the plugin, HTTP and websocket.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+from time import time
+
+import nuke_stub
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+plugin_dir = os.path.dirname(benchmarks_dir)
+package = os.path.basename(plugin_dir)
+
+
+class Environment(object):
+    def __init__(self, args):
+        import fake_comfyui
+
+        self.temp_dir = tempfile.mkdtemp(prefix='nuke_comfyui_e2e_')
+        comfyui_dir = os.path.join(self.temp_dir, 'ComfyUI')
+
+        self.server, self.fake = fake_comfyui.serve(
+            **fake_comfyui.get_options(args, comfyui_dir))
+
+        # Same directory for Nuke and the server, as with a shared drive
+        os.environ['NUKE_COMFYUI_IP'] = '127.0.0.1'
+        os.environ['NUKE_COMFYUI_PORT'] = str(self.server.server_address[1])
+        os.environ['NUKE_COMFYUI_DIR_LOCAL'] = comfyui_dir
+        os.environ['NUKE_COMFYUI_DIR_REMOTE'] = comfyui_dir
+        os.environ['NUKE_COMFYUI_CACHE_DIR'] = os.path.join(self.temp_dir, 'cache')
+
+        nuke_stub.install()
+        nuke_stub.write_placeholders = True
+        sys.path.insert(0, os.path.dirname(plugin_dir))
+
+        import graphs
+        self.graphs = graphs
+        self.plugin = __import__(package)
+        self.run = self.plugin.src.run
+
+        self.plugin.src.object_info.fetch(quiet=True)
+
+    def close(self):
+        # Callbacks still queued, eg: the write of the profiles
+        nuke_stub.process_events(0.1)
+
+        self.server.shutdown()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def executions(self):
+        with self.fake.lock:
+            return dict(self.fake.stats['executions'])
+
+    def reset(self, size, graph='deep'):
+        self.run.states.clear()
+        self.plugin.src.nodes.states.clear()
+        nuke_stub.comfyui_running = False
+        return self.graphs.GENERATORS[graph](size)
+
+    def wait(self, condition, timeout):
+        deadline = time() + timeout
+
+        while not condition():
+            if time() > deadline:
+                raise RuntimeError('Timeout')
+
+            nuke_stub.process_events(0.005)
+
+
+def busy_time(executions, prompt_ids=None):
+    return sum(e['end'] - e['start'] for prompt_id, e in executions.items()
+               if prompt_ids is None or prompt_id in prompt_ids)
+
+
+def new_executions(env, before):
+    return dict((k, v) for k, v in env.executions().items() if not k in before)
+
+
+def bench_single(env, jobs, size, timeout, graph='deep'):
+    run_node = env.reset(size, graph)
+    before = env.executions()
+    done = []
+
+    start = time()
+
+    for _ in range(jobs):
+        count = len(done)
+        env.run.states.clear()
+        env.run.submit(run_node, success_callback=lambda read: done.append(time()))
+        env.wait(lambda: len(done) > count, timeout)
+
+    total = time() - start
+    executions = new_executions(env, before)
+
+    return {
+        'jobs': jobs,
+        'seconds': total,
+        'jobs_per_second': jobs / total,
+        'overhead_per_job': (total - busy_time(executions)) / jobs,
+        'server_errors': len([e for e in executions.values() if not e['status'] == 'success'])
+    }
+
+
+def bench_iteration(env, jobs, size, timeout):
+    # Without a random seed the next iterations would be the same prompt
+    run_node = env.reset(size, 'seeded')
+    before = env.executions()
+    done = []
+
+    start = time()
+    env.run.iteration_submit_for_node(
+        run_node, jobs, lambda read: done.append(time()))
+    env.wait(lambda: done, timeout * jobs)
+
+    total = time() - start
+    executions = new_executions(env, before)
+
+    return {
+        'jobs': jobs,
+        'seconds': total,
+        'jobs_per_second': jobs / total,
+        'overhead_per_job': (total - busy_time(executions)) / jobs,
+        'server_errors': len([e for e in executions.values() if not e['status'] == 'success'])
+    }
+
+
+def bench_animation(env, frames, size, timeout):
+    run_node = env.reset(size, 'animated')
+    before = env.executions()
+    done = []
+    sequence = []
+
+    task = [nuke_stub.ProgressTask('Sending Frames...')]
+
+    def each_frame(frame, filename):
+        sequence.append((filename, frame))
+
+    def finished_inference():
+        done.append(time())
+
+    start = time()
+    env.run.submit(run_node, animation=[1, frames, each_frame, finished_inference, task])
+    env.wait(lambda: done, timeout * frames)
+
+    total = time() - start
+    executions = new_executions(env, before)
+
+    return {
+        'frames': frames,
+        'seconds': total,
+        'frames_per_second': frames / total,
+        'overhead_per_frame': (total - busy_time(executions)) / frames,
+        'missing_outputs': len([f for f, _ in sequence if not f])
+    }
+
+
+def bench_cancel(env, size, repeat, timeout, graph='deep'):
+    latencies = []
+    releases = []
+
+    for _ in range(repeat):
+        run_node = env.reset(size, graph)
+        before = env.executions()
+
+        env.run.submit(run_node)
+
+        # Cancel once the prompt is running on the server
+        def running():
+            queue = env.fake.get_queue()['queue_running']
+            return queue and not queue[0][3].get('fake')
+
+        env.wait(running, timeout)
+
+        with env.fake.lock:
+            interrupts = len(env.fake.stats['interrupts'])
+
+        cancel_time = time()
+        for task in nuke_stub.tasks:
+            task.cancel()
+
+        env.wait(lambda: not nuke_stub.comfyui_running, timeout)
+        releases.append(time() - cancel_time)
+
+        with env.fake.lock:
+            new_interrupts = env.fake.stats['interrupts'][interrupts:]
+
+        if new_interrupts:
+            latencies.append(new_interrupts[0][1] - cancel_time)
+
+        env.wait(lambda: new_executions(env, before), timeout)
+
+    def mean(values):
+        return sum(values) / len(values) if values else None
+
+    return {
+        'repeat': repeat,
+        'interrupt_latency': mean(latencies),
+        'release_latency': mean(releases),
+        'not_interrupted': repeat - len(latencies)
+    }
+
+
+def main(argv=None):
+    import fake_comfyui
+
+    # The generators are built on the stub
+    nuke_stub.install()
+    import graphs
+
+    parser = argparse.ArgumentParser(
+        description='End to end throughput against the fake ComfyUI server.')
+    parser.add_argument('--modes', nargs='+', default=['single', 'iteration', 'animation', 'cancel'],
+                        choices=['single', 'iteration', 'animation', 'cancel'])
+    parser.add_argument('--jobs', type=int, default=10)
+    parser.add_argument('--frames', type=int, default=10)
+    parser.add_argument('--size', type=int, default=10,
+                        help='nodes of the graph of each job')
+    parser.add_argument('--graph', default='deep', choices=sorted(graphs.GENERATORS),
+                        help='graph of the single and cancel modes')
+    parser.add_argument('--timeout', type=float, default=30,
+                        help='seconds per job before giving up')
+    parser.add_argument('--json', help='save the results to this file')
+    fake_comfyui.add_arguments(parser)
+
+    args = parser.parse_args(argv)
+    env = Environment(args)
+    results = {}
+
+    try:
+        if 'single' in args.modes:
+            results['single'] = bench_single(env, args.jobs, args.size, args.timeout, args.graph)
+
+        if 'iteration' in args.modes:
+            results['iteration'] = bench_iteration(env, args.jobs, args.size, args.timeout)
+
+        if 'animation' in args.modes:
+            results['animation'] = bench_animation(env, args.frames, args.size, args.timeout)
+
+        if 'cancel' in args.modes:
+            # Long enough nodes so that the prompt is cancelled while running
+            env.fake.node_latency = max(args.node_latency, 2.0)
+            results['cancel'] = bench_cancel(env, args.size, 3, args.timeout, args.graph)
+            env.fake.node_latency = args.node_latency
+    finally:
+        env.close()
+
+    for mode, result in results.items():
+        print(mode)
+        for key, value in sorted(result.items()):
+            if type(value) == float:
+                value = '{:.4f}'.format(value)
+            print('    {:<20} {}'.format(key, value))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
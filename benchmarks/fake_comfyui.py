@@ -0,0 +1,720 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+"""Stand-in of a ComfyUI server with the standard library only, implements
+/prompt, /queue, /history, /interrupt, /object_info, /upload/image, /view and
+the /ws messages. Prompts are 'executed' sleeping a configurable time per node
+and the output nodes write placeholder files in a ComfyUI directory layout.
+
+    python benchmarks/fake_comfyui.py --port 8188 --dir /tmp/ComfyUI --node-latency 0.2
+
+GET /fake/stats returns the counters and the execution times of the prompts.
+"""
+import os
+import re
+import sys
+import json
+import uuid
+import base64
+import struct
+import random
+import hashlib
+import argparse
+import threading
+import zlib
+from time import time, sleep
+
+if sys.version_info.major > 2:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.parse import urlparse, parse_qs
+else:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer  # type: ignore
+    from SocketServer import ThreadingMixIn  # type: ignore
+    from urlparse import urlparse, parse_qs  # type: ignore
+
+from schemas import get_object_info
+
+WEBSOCKET_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+
+
+def png_1x1():
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + \
+            struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', 1, 1, 8, 2, 0, 0, 0)) + \
+        chunk(b'IDAT', zlib.compress(b'\x00\x00\x00\x00')) + chunk(b'IEND', b'')
+
+
+PLACEHOLDER_PNG = png_1x1()
+
+
+class WebSocketClient(object):
+    def __init__(self, connection):
+        self.connection = connection
+        self.lock = threading.Lock()
+        self.closed = False
+
+    def send(self, payload, opcode=0x1):
+        if type(payload) == str and sys.version_info.major > 2:
+            payload = payload.encode('utf-8')
+
+        length = len(payload)
+
+        if length < 126:
+            header = struct.pack('>BB', 0x80 | opcode, length)
+        elif length < 65536:
+            header = struct.pack('>BBH', 0x80 | opcode, 126, length)
+        else:
+            header = struct.pack('>BBQ', 0x80 | opcode, 127, length)
+
+        with self.lock:
+            if self.closed:
+                return
+
+            try:
+                self.connection.sendall(header + payload)
+            except (IOError, OSError):
+                self.closed = True
+
+    def read_frame(self, rfile):
+        header = rfile.read(2)
+        if len(header) < 2:
+            return None, None
+
+        first, second = struct.unpack('>BB', header)
+        opcode = first & 0x0f
+        length = second & 0x7f
+
+        if length == 126:
+            length = struct.unpack('>H', rfile.read(2))[0]
+        elif length == 127:
+            length = struct.unpack('>Q', rfile.read(8))[0]
+
+        mask = rfile.read(4) if second & 0x80 else None
+        payload = bytearray(rfile.read(length))
+
+        if mask:
+            mask = bytearray(mask)
+            for i in range(len(payload)):
+                payload[i] ^= mask[i % 4]
+
+        return opcode, bytes(payload)
+
+
+class FakeComfyUI(object):
+    def __init__(self, comfyui_dir, node_latency=0.05, steps=4, error_rate=0.0,
+                 start_delay=0.0, busy=0, seed=None, object_info=None, previews=False):
+
+        self.comfyui_dir = comfyui_dir
+        self.node_latency = node_latency
+        self.steps = max(1, steps)
+        self.error_rate = error_rate
+        self.start_delay = start_delay
+        self.previews = previews
+        self.random = random.Random(seed)
+        self.object_info = object_info or get_object_info()
+
+        for dirname in ['comfy', 'input', 'output', 'temp']:
+            path = os.path.join(comfyui_dir, dirname)
+            if not os.path.isdir(path):
+                os.makedirs(path)
+
+        self.lock = threading.Lock()
+        self.condition = threading.Condition(self.lock)
+        self.queue = []
+        self.running = None
+        self.history = {}
+        self.clients = {}
+        self.number = 0
+        self.interrupt_id = [None]
+
+        self.stats = {
+            'prompts': 0, 'executed': 0, 'errors': 0, 'interrupted': 0,
+            'deleted': 0, 'rejected': 0, 'uploads': 0, 'messages': 0,
+            'executions': {}, 'interrupts': []
+        }
+
+        # Prompts of other users that keep the server busy
+        for _ in range(busy):
+            self.queue_prompt({'prompt': {}, 'client_id': None,
+                               'extra_data': {'fake': 'busy'}})
+
+        self.thread = threading.Thread(target=self.worker)
+        self.thread.daemon = True
+        self.thread.start()
+
+    # Queue
+    def queue_prompt(self, body):
+        prompt = body.get('prompt', {})
+
+        for node_id, node in prompt.items():
+            if not node.get('class_type') in self.object_info:
+                self.stats['rejected'] += 1
+                return 400, {
+                    'error': {
+                        'type': 'invalid_prompt',
+                        'message': 'Cannot execute because node {} does not exist.'.format(
+                            node.get('class_type')),
+                        'details': 'Node ID #{}'.format(node_id),
+                        'extra_info': {}
+                    },
+                    'node_errors': {}
+                }
+
+        prompt_id = body.get('prompt_id') or str(uuid.uuid4())
+
+        with self.condition:
+            self.number += 1
+            number = -self.number if body.get('front') else self.number
+
+            item = [number, prompt_id, prompt, dict(body.get('extra_data', {}),
+                                                    client_id=body.get('client_id')), []]
+            self.queue.append(item)
+            self.queue.sort(key=lambda i: i[0])
+            self.stats['prompts'] += 1
+            self.condition.notify()
+
+        self.send_status()
+        return 200, {'prompt_id': prompt_id, 'number': number, 'node_errors': {}}
+
+    def get_queue(self):
+        with self.lock:
+            return {
+                'queue_running': [self.running] if self.running else [],
+                'queue_pending': list(self.queue)
+            }
+
+    def delete(self, prompt_ids):
+        with self.lock:
+            before = len(self.queue)
+            self.queue = [i for i in self.queue if not i[1] in prompt_ids]
+            self.stats['deleted'] += before - len(self.queue)
+
+        self.send_status()
+
+    def clear(self):
+        with self.lock:
+            self.stats['deleted'] += len(self.queue)
+            self.queue = []
+
+        self.send_status()
+
+    def interrupt(self, prompt_id=None):
+        with self.lock:
+            running = self.running
+            self.stats['interrupts'].append([prompt_id, time()])
+
+            if not running:
+                return
+
+            if prompt_id and not prompt_id == running[1]:
+                return
+
+            self.interrupt_id[0] = running[1]
+
+    # Websocket
+    def add_client(self, client_id, client):
+        with self.lock:
+            self.clients[client_id] = client
+
+        client.send(json.dumps({'type': 'status', 'data': {
+            'status': self.get_status(), 'sid': client_id}}))
+
+    def remove_client(self, client_id, client):
+        with self.lock:
+            if self.clients.get(client_id) is client:
+                self.clients.pop(client_id)
+
+    def get_status(self):
+        return {'exec_info': {'queue_remaining': len(self.queue) + (1 if self.running else 0)}}
+
+    def send(self, client_id, type_data, data):
+        with self.lock:
+            client = self.clients.get(client_id)
+            self.stats['messages'] += 1
+
+        if client:
+            client.send(json.dumps({'type': type_data, 'data': data}))
+
+    def send_binary(self, client_id, payload):
+        with self.lock:
+            client = self.clients.get(client_id)
+            self.stats['messages'] += 1
+
+        if client:
+            client.send(payload, 0x2)
+
+    def send_status(self):
+        with self.lock:
+            clients = list(self.clients.values())
+            status = self.get_status()
+
+        message = json.dumps({'type': 'status', 'data': {'status': status}})
+        for client in clients:
+            client.send(message)
+
+    # Execution
+    def worker(self):
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+
+                self.running = self.queue.pop(0)
+                item = self.running
+
+            sleep(self.start_delay)
+            self.execute(item)
+
+            with self.lock:
+                self.running = None
+                self.interrupt_id[0] = None
+
+            self.send_status()
+
+    def get_order(self, prompt):
+        order = []
+        visited = set()
+
+        def visit(node_id):
+            if node_id in visited or not node_id in prompt:
+                return
+
+            visited.add(node_id)
+            for value in prompt[node_id].get('inputs', {}).values():
+                if type(value) == list and len(value) == 2 and type(value[1]) == int:
+                    visit(str(value[0]))
+
+            order.append(node_id)
+
+        for node_id in sorted(prompt):
+            visit(node_id)
+
+        return order
+
+    def execute(self, item):
+        _, prompt_id, prompt, extra_data, _ = item
+        client_id = extra_data.get('client_id')
+        start = time()
+
+        def send(type_data, data):
+            data = dict(data, prompt_id=prompt_id)
+            self.send(client_id, type_data, data)
+
+        if extra_data.get('fake') == 'busy':
+            sleep(self.node_latency * 5)
+
+        send('execution_start', {'timestamp': int(start * 1000)})
+        send('execution_cached', {'nodes': [], 'timestamp': int(start * 1000)})
+
+        order = self.get_order(prompt)
+        error_node = None
+
+        if order and self.random.random() < self.error_rate:
+            error_node = self.random.choice(order)
+
+        status = 'success'
+        outputs = {}
+        frames = self.get_frames(prompt)
+
+        for node_id in order:
+            node = prompt[node_id]
+            send('executing', {'node': node_id, 'display_node': node_id})
+
+            for step in range(self.steps):
+                if self.interrupt_id[0] == prompt_id:
+                    break
+
+                sleep(self.node_latency / self.steps)
+                send('progress', {'value': step + 1, 'max': self.steps, 'node': node_id})
+
+                if self.previews:
+                    # PREVIEW_IMAGE event of a PNG, as the latent previews of the samplers
+                    self.send_binary(client_id, struct.pack('>II', 1, 2) + PLACEHOLDER_PNG)
+
+            if self.interrupt_id[0] == prompt_id:
+                status = 'interrupted'
+                send('execution_interrupted', {
+                    'node_id': node_id, 'node_type': node['class_type'], 'executed': list(outputs)})
+                break
+
+            if node_id == error_node:
+                status = 'error'
+                send('execution_error', {
+                    'node_id': node_id, 'node_type': node['class_type'],
+                    'exception_message': 'Fake error', 'exception_type': 'RuntimeError',
+                    'traceback': ['fake traceback'], 'executed': list(outputs)})
+                break
+
+            output = self.write_outputs(node, frames)
+            if output:
+                outputs[node_id] = output
+                send('executed', {'node': node_id, 'display_node': node_id, 'output': output})
+
+        if status == 'success':
+            send('executing', {'node': None})
+            send('execution_success', {'timestamp': int(time() * 1000)})
+
+        self.add_history(item, start, status, outputs, frames)
+
+    def add_history(self, item, start, status, outputs, frames):
+        prompt_id, extra_data = item[1], item[3]
+
+        with self.lock:
+            self.history[prompt_id] = {
+                'prompt': item[:4], 'outputs': outputs,
+                'status': {'status_str': status, 'completed': status == 'success', 'messages': []}
+            }
+
+            key = {'success': 'executed', 'error': 'errors', 'interrupted': 'interrupted'}
+            self.stats[key[status]] += 1
+            self.stats['executions'][prompt_id] = {
+                'start': start, 'end': time(), 'status': status,
+                'lane': extra_data.get('nuke_comfyui', {}).get('lane'),
+                'queued': item[0], 'frames': frames}
+
+    def get_frames(self, prompt):
+        """Number of images of the batch, from the sequences of the LoadEXR
+        nodes, 1 if there are none."""
+
+        frames = 1
+
+        for node in prompt.values():
+            if not node.get('class_type') == 'LoadEXR':
+                continue
+
+            inputs = node.get('inputs', {})
+            filepath = inputs.get('filepath', '')
+            count = len(os.listdir(filepath)) if os.path.isdir(filepath) else 1
+            count = max(0, count - int(inputs.get('skip_first_images') or 0))
+
+            cap = int(inputs.get('image_load_cap') or 0)
+            if cap:
+                count = min(count, cap)
+
+            frames = max(frames, count)
+
+        return frames
+
+    def write_outputs(self, node, frames):
+        class_type = node['class_type']
+        inputs = node.get('inputs', {})
+
+        if 'ShowText' in class_type:
+            return {'text': ['fake text']}
+
+        info = self.object_info.get(class_type, {})
+        if not info.get('output_node'):
+            return
+
+        if class_type == 'PreviewImage':
+            folder_type = 'temp'
+            prefix = 'ComfyUI_temp_{}'.format(uuid.uuid4().hex[:5])
+        else:
+            folder_type = 'output'
+            prefix = inputs.get('filename_prefix', 'ComfyUI')
+
+        ext = 'exr' if 'EXR' in class_type else 'png'
+        subfolder = os.path.dirname(prefix)
+        prefix = os.path.basename(prefix)
+
+        directory = os.path.join(self.comfyui_dir, folder_type, subfolder)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        images = []
+
+        for i in range(frames):
+            filename = '{}_{:05d}_.{}'.format(prefix, i + 1, ext)
+            with open(os.path.join(directory, filename), 'wb') as f:
+                f.write(PLACEHOLDER_PNG if ext == 'png' else b'')
+
+            images.append({'filename': filename, 'subfolder': subfolder, 'type': folder_type})
+
+        return {'images': images}
+
+    def upload(self, filename, subfolder, data):
+        directory = os.path.join(self.comfyui_dir, 'input', subfolder)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        with open(os.path.join(directory, filename), 'wb') as f:
+            f.write(data)
+
+        self.stats['uploads'] += 1
+        return {'name': filename, 'subfolder': subfolder, 'type': 'input'}
+
+
+def parse_multipart(content_type, body):
+    boundary = re.search(r'boundary=(.+)', content_type)
+    if not boundary:
+        return {}
+
+    boundary = b'--' + boundary.group(1).strip('"').encode('utf-8')
+    fields = {}
+
+    for part in body.split(boundary):
+        if not b'\r\n\r\n' in part:
+            continue
+
+        headers, content = part.split(b'\r\n\r\n', 1)
+        headers = headers.decode('utf-8', 'replace')
+
+        name = re.search(r'name="([^"]*)"', headers)
+        if not name:
+            continue
+
+        filename = re.search(r'filename="([^"]*)"', headers)
+        content = content[:-2] if content.endswith(b'\r\n') else content
+
+        fields[name.group(1)] = (filename.group(1) if filename else None, content)
+
+    return fields
+
+
+def make_handler(fake):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *args):
+            pass
+
+        def send_json(self, data, code=200):
+            body = json.dumps(data).encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def read_body(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return self.rfile.read(length) if length else b''
+
+        def read_json(self):
+            body = self.read_body()
+            return json.loads(body.decode('utf-8')) if body else {}
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            path = url.path.rstrip('/')
+            query = parse_qs(url.query)
+
+            if path == '/ws':
+                return self.websocket(query.get('clientId', [str(uuid.uuid4())])[0])
+
+            if path == '':
+                body = b'<html>Fake ComfyUI</html>'
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            elif path == '/object_info':
+                self.send_json(fake.object_info)
+
+            elif path.startswith('/object_info/'):
+                name = path.split('/', 2)[2]
+                self.send_json({name: fake.object_info[name]} if name in fake.object_info else {})
+
+            elif path == '/queue':
+                self.send_json(fake.get_queue())
+
+            elif path == '/prompt':
+                self.send_json({'exec_info': fake.get_status()['exec_info']})
+
+            elif path == '/history':
+                with fake.lock:
+                    self.send_json(dict(fake.history))
+
+            elif path.startswith('/history/'):
+                prompt_id = path.split('/', 2)[2]
+                with fake.lock:
+                    history = fake.history.get(prompt_id)
+                self.send_json({prompt_id: history} if history else {})
+
+            elif path == '/view':
+                self.view(query)
+
+            elif path == '/fake/stats':
+                with fake.lock:
+                    self.send_json(json.loads(json.dumps(fake.stats)))
+
+            else:
+                self.send_json({'error': 'not found'}, 404)
+
+        def do_POST(self):
+            path = urlparse(self.path).path.rstrip('/')
+
+            if path == '/prompt':
+                code, response = fake.queue_prompt(self.read_json())
+                self.send_json(response, code)
+
+            elif path == '/queue':
+                data = self.read_json()
+                if data.get('clear'):
+                    fake.clear()
+                if data.get('delete'):
+                    fake.delete(data['delete'])
+                self.send_json({})
+
+            elif path == '/interrupt':
+                data = self.read_json()
+                fake.interrupt(data.get('prompt_id'))
+                self.send_json({})
+
+            elif path == '/upload/image':
+                fields = parse_multipart(
+                    self.headers.get('Content-Type', ''), self.read_body())
+
+                if not 'image' in fields:
+                    self.send_json({'error': 'no image'}, 400)
+                    return
+
+                filename, data = fields['image']
+                subfolder = fields.get('subfolder', (None, b''))[1].decode('utf-8')
+                self.send_json(fake.upload(os.path.basename(filename), subfolder, data))
+
+            else:
+                self.send_json({'error': 'not found'}, 404)
+
+        def view(self, query):
+            folder_type = query.get('type', ['output'])[0]
+            subfolder = query.get('subfolder', [''])[0]
+            filename = os.path.basename(query.get('filename', [''])[0])
+
+            path = os.path.join(fake.comfyui_dir, folder_type, subfolder, filename)
+            if not filename or not os.path.isfile(path):
+                self.send_json({'error': 'not found'}, 404)
+                return
+
+            with open(path, 'rb') as f:
+                body = f.read()
+
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/octet-stream')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def websocket(self, client_id):
+            key = self.headers.get('Sec-WebSocket-Key')
+            if not key:
+                self.send_json({'error': 'websocket expected'}, 400)
+                return
+
+            accept = base64.b64encode(hashlib.sha1(
+                (key + WEBSOCKET_GUID).encode('utf-8')).digest()).decode('utf-8')
+
+            self.send_response(101)
+            self.send_header('Upgrade', 'websocket')
+            self.send_header('Connection', 'Upgrade')
+            self.send_header('Sec-WebSocket-Accept', accept)
+            self.end_headers()
+            self.wfile.flush()
+
+            client = WebSocketClient(self.connection)
+            fake.add_client(client_id, client)
+
+            try:
+                while True:
+                    opcode, payload = client.read_frame(self.rfile)
+
+                    if opcode is None or opcode == 0x8:
+                        client.send(b'', 0x8)
+                        break
+
+                    if opcode == 0x9:
+                        client.send(payload, 0xA)
+            except (IOError, OSError, struct.error):
+                pass
+            finally:
+                client.closed = True
+                fake.remove_client(client_id, client)
+                self.close_connection = True
+
+    return Handler
+
+
+class ThreadingServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def serve(host='127.0.0.1', port=0, fake=None, **options):
+    """Starts the server in a thread, returns (server, fake), the port is
+    server.server_address[1] when port is 0."""
+
+    fake = fake or FakeComfyUI(**options)
+    server = ThreadingServer((host, port), make_handler(fake))
+
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+
+    return server, fake
+
+
+def add_arguments(parser):
+    parser.add_argument('--node-latency', type=float, default=0.05,
+                        help='seconds that each node takes to execute')
+    parser.add_argument('--steps', type=int, default=4,
+                        help='progress messages per node')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='probability that a prompt fails in a random node')
+    parser.add_argument('--start-delay', type=float, default=0.0,
+                        help='seconds between taking a prompt from the queue and executing it')
+    parser.add_argument('--busy', type=int, default=0,
+                        help='prompts of other users in the queue at start')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--previews', action='store_true',
+                        help='send a binary preview image with each progress message')
+    parser.add_argument('--object-info', help='object_info json to serve, '
+                        'by default the node types of the benchmark graphs')
+
+
+def get_options(args, comfyui_dir):
+    object_info = None
+    if args.object_info:
+        with open(args.object_info) as f:
+            object_info = json.load(f)
+
+    return {
+        'comfyui_dir': comfyui_dir,
+        'node_latency': args.node_latency,
+        'steps': args.steps,
+        'error_rate': args.error_rate,
+        'start_delay': args.start_delay,
+        'busy': args.busy,
+        'seed': args.seed,
+        'previews': args.previews,
+        'object_info': object_info
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Fake ComfyUI server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8188)
+    parser.add_argument('--dir', required=True, help='ComfyUI directory')
+    add_arguments(parser)
+
+    args = parser.parse_args(argv)
+    server, _ = serve(args.host, args.port, **get_options(args, args.dir))
+
+    print('Fake ComfyUI on http://{}:{}'.format(*server.server_address))
+
+    try:
+        while True:
+            sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
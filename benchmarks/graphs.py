@@ -0,0 +1,262 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+"""Synthetic node graphs for the benchmarks, built on the nuke stub with the
+same knobs and data knob that update_menu.create_node gives to the ComfyUI
+nodes. Every generator returns the Run node of the graph."""
+import json
+
+import nuke  # type: ignore
+
+from schemas import SCHEMAS
+
+
+def comfyui_node(class_type, name, schema=None):
+    schema = schema or SCHEMAS[class_type]
+    n = nuke.createNode('Group', inpanel=False)
+    n.setName(name)
+
+    knobs_order = []
+    inputs = []
+
+    schema_inputs = list(schema['input']['required'].items())
+    schema_inputs += list(schema['input'].get('optional', {}).items())
+
+    for key, _input in schema_inputs:
+        _class, info = _input[0], (_input[1] if len(_input) > 1 else {})
+
+        if _class == 'FLOAT':
+            knob = nuke.Double_Knob(key + '_', key)
+            knob.setValue(info.get('default', 0))
+        elif _class == 'INT':
+            knob = nuke.Int_Knob(key + '_', key)
+            knob.setValue(info.get('default', 0))
+        elif _class == 'STRING':
+            knob = nuke.String_Knob(key + '_', key)
+            knob.setValue(info.get('default', ''))
+        elif type(_class) == list:
+            knob = nuke.Enumeration_Knob(key + '_', key, _class)
+        else:
+            inputs.append({'name': key, 'outputs': [_class.lower()],
+                           'opt': not key in schema['input']['required']})
+            continue
+
+        n.addKnob(knob)
+        knobs_order.append(knob.name())
+
+        if 'seed' in key:
+            n.addKnob(nuke.Boolean_Knob('randomize'))
+
+    data_knob = nuke.PyScript_Knob('data')
+    data_knob.setValue(json.dumps({
+        'knobs_order': knobs_order,
+        'class_type': class_type,
+        'output_node': schema['output_node'],
+        'inputs': inputs,
+        'outputs': [o.lower() for o in schema['output']],
+    }, indent=4).replace('"', "'"))
+    n.addKnob(data_knob)
+
+    n._max_inputs = len(inputs)
+    return n
+
+
+def read_node(name, first_frame=1, last_frame=10):
+    n = nuke.createNode('Read', inpanel=False)
+    n.setName(name)
+    n.addKnob(nuke.File_Knob('file'))
+    n.setFrameRange(first_frame, last_frame)
+    return n
+
+
+def run_node(output_node):
+    n = nuke.createNode('Group', inpanel=False)
+    n.setName('Run')
+    n.setInput(0, output_node)
+
+    for knob in [nuke.PyScript_Knob('comfyui_submit'), nuke.String_Knob('filename_prefix'),
+                 nuke.Enumeration_Knob('tonemap', '', ['sRGB', 'linear']),
+                 nuke.Text_Knob('timing')]:
+        n.addKnob(knob)
+
+    return n
+
+
+def save_and_run(node):
+    save = comfyui_node('SaveImage', 'SaveImage')
+    save.setInput(0, node)
+    return run_node(save)
+
+
+def chain(size, source, animated=False):
+    node = source
+
+    for i in range(size):
+        scale = comfyui_node('ImageScaleBy', 'ImageScaleBy{}'.format(i + 1))
+        scale.setInput(0, node)
+
+        if animated:
+            knob = scale.knob('scale_by_')
+            knob.setValueAt(1.0, 1)
+            knob.setValueAt(2.0, 100)
+
+        node = scale
+
+    return node
+
+
+def deep(size):
+    """Chain of 'size' nodes on a single Read."""
+
+    nuke.scriptClear()
+    read = read_node('Read1')
+    return save_and_run(chain(max(size - 2, 1), read))
+
+
+def seeded(size):
+    """Same as deep ending in a node with a randomized seed, so that every
+    submit is a new prompt as with the samplers."""
+
+    nuke.scriptClear()
+    read = read_node('Read1')
+
+    noise = comfyui_node('ImageAddNoise', 'ImageAddNoise1')
+    noise.setInput(0, chain(max(size - 3, 1), read))
+    noise.knob('randomize').setValue(True)
+
+    return save_and_run(noise)
+
+
+def animated(size):
+    """Same as deep but every node has an animated knob."""
+
+    nuke.scriptClear()
+    read = read_node('Read1', 1, 100)
+    return save_and_run(chain(max(size - 2, 1), read, animated=True))
+
+
+def masked(size):
+    """Inpaint setup, the same Read is the destination and the mask of the
+    composite and the source is a chain on it."""
+
+    nuke.scriptClear()
+    plate = read_node('Plate')
+
+    composite = comfyui_node('ImageCompositeMasked', 'ImageCompositeMasked1')
+    composite.setInput(0, plate)
+    composite.setInput(1, chain(max(size - 3, 1), plate))
+    composite.setInput(2, plate)
+
+    return save_and_run(composite)
+
+
+def wide(size, reads=8):
+    """Balanced tree of ImageBatch nodes whose leaves are a few Read nodes
+    shared by many consumers."""
+
+    nuke.scriptClear()
+    read_nodes = [read_node('Read{}'.format(i + 1)) for i in range(reads)]
+
+    level = list(read_nodes)
+    count = 0
+    leaves = max(size - 1, 2)
+
+    # Every pair of the current level is merged until one node is left
+    while len(level) < leaves:
+        level = level + level[:leaves - len(level)]
+
+    while len(level) > 1:
+        next_level = []
+
+        for a, b in zip(level[::2], level[1::2]):
+            count += 1
+            batch = comfyui_node('ImageBatch', 'ImageBatch{}'.format(count))
+            batch.setInput(0, a)
+            batch.setInput(1, b)
+            next_level.append(batch)
+
+        if len(level) % 2:
+            next_level.append(level[-1])
+
+        level = next_level
+
+    return save_and_run(level[0])
+
+
+def gizmo_nested(size, depth=3):
+    """Chain inside groups nested 'depth' levels like the ComfyUI gizmos,
+    the Run lives in the innermost group and the Read at the root."""
+
+    nuke.scriptClear()
+    read = read_node('Read1')
+    parent_input = read
+
+    for level in range(depth):
+        group = nuke.createNode('Group', inpanel=False)
+        group.setName('Gizmo{}'.format(level + 1))
+        group.setInput(0, parent_input)
+        group.begin()
+
+        parent_input = nuke.createNode('Input', inpanel=False)
+        parent_input._max_inputs = 0
+
+    node = save_and_run(chain(max(size - 2, 1), parent_input))
+
+    for _ in range(depth):
+        nuke.thisGroup().end()
+
+    return node
+
+
+def from_prompt(prompt, object_info, frames=1):
+    """Graph that submits 'prompt' again, with the same node names so that the
+    messages of a recording match. The LoadEXR nodes of the inputs exported
+    from Nuke (the ones with an 'id') become Read nodes of 'frames' frames."""
+
+    nuke.scriptClear()
+    nodes = {}
+
+    for name, node in prompt.items():
+        inputs = node.get('inputs', {})
+
+        if node['class_type'] == 'LoadEXR' and 'id' in inputs:
+            nodes[name] = read_node(name, 1, frames)
+            continue
+
+        n = comfyui_node(node['class_type'], name, object_info[node['class_type']])
+        nodes[name] = n
+
+        for key, value in inputs.items():
+            knob = n.knob(key + '_')
+            if knob and not type(value) == list:
+                knob.setValue(value)
+
+    for name, node in prompt.items():
+        n = nodes[name]
+        if not n.knob('data'):
+            continue
+
+        data = json.loads(n.knob('data').value().replace("'", '"'))
+
+        for i, _input in enumerate(data['inputs']):
+            link = node.get('inputs', {}).get(_input['name'])
+            if type(link) == list and link[0] in nodes:
+                n.setInput(i, nodes[link[0]])
+
+    output_nodes = [nodes[name] for name, node in sorted(prompt.items())
+                    if object_info[node['class_type']].get('output_node')
+                    and not node['class_type'] == 'PreviewImage']
+
+    return run_node(output_nodes[0])
+
+
+GENERATORS = {
+    'wide': wide,
+    'deep': deep,
+    'seeded': seeded,
+    'animated': animated,
+    'masked': masked,
+    'gizmo_nested': gizmo_nested,
+}
@@ -0,0 +1,58 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+"""Measures the cost of importing the plugin and running setup() as in a
+menu.py, and which of its modules are loaded at startup.
+
+    nuke -t benchmarks/import_time.py [repeat]
+"""
+import os
+import sys
+import time
+
+plugin_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+package = os.path.basename(plugin_dir)
+
+
+def measure():
+    for name in list(sys.modules):
+        if name == package or name.startswith(package + '.'):
+            del sys.modules[name]
+
+    before = set(sys.modules)
+
+    start = time.time()
+    plugin = __import__(package)
+    import_time = time.time() - start
+
+    start = time.time()
+    plugin.setup()
+    setup_time = time.time() - start
+
+    loaded = sorted(m for m in set(sys.modules) - before
+                    if m.startswith(package + '.') and sys.modules[m])
+
+    return import_time, setup_time, loaded
+
+
+def main(repeat=5):
+    sys.path.insert(0, os.path.dirname(plugin_dir))
+
+    results = [measure() for _ in range(repeat)]
+    import_times = sorted(r[0] for r in results)
+    setup_times = sorted(r[1] for r in results)
+
+    print('import: min {:.1f} ms, median {:.1f} ms'.format(
+        import_times[0] * 1000, import_times[len(import_times) // 2] * 1000))
+    print('setup:  min {:.1f} ms, median {:.1f} ms'.format(
+        setup_times[0] * 1000, setup_times[len(setup_times) // 2] * 1000))
+
+    print('\nmodules loaded at startup:')
+    for module in results[0][2]:
+        print(' - ' + module)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)
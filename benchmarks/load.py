@@ -0,0 +1,455 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+"""Load of many artists on a pool of ComfyUI servers. Each artist is a process
+with its own nuke stub, cache and script, that submits a mix of jobs with
+run.submit, with a think time between them, as an artist tweaking a shot:
+
+    python benchmarks/load.py --artists 8 --fake-servers 2 --duration 60 \\
+        --mix single=4 iteration=1 animation=1 --think 5
+
+Against real servers, with the same shared directory for all the artists:
+
+    python benchmarks/load.py --artists 8 --servers 10.0.0.5:8188 10.0.0.6:8188 \\
+        --dir-local /mnt/comfyui --dir-remote /mnt/comfyui
+
+The artists are assigned to the servers in turn. It reports the distribution
+of the queue wait (from the /prompt answer to the start of the execution) by
+mode, the throughput of the pool and of each server, the fairness between
+artists (Jain's index, 1 is fair) and the CPU of the artist process per job.
+"""
+import os
+import sys
+import json
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+from time import time
+
+import nuke_stub
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+plugin_dir = os.path.dirname(benchmarks_dir)
+package = os.path.basename(plugin_dir)
+
+MODES = ['single', 'iteration', 'animation']
+
+
+def parse_mix(mix):
+    weights = {}
+
+    for item in mix:
+        mode, _, weight = item.partition('=')
+        if not mode in MODES:
+            raise argparse.ArgumentTypeError('Unknown mode: ' + mode)
+
+        weights[mode] = float(weight or 1)
+
+    return weights
+
+
+def cpu_time():
+    times = os.times()
+    return times[0] + times[1]
+
+
+class Artist(object):
+    """Client side of a single artist, the server, directories and cache come
+    from the environment set by the parent process."""
+
+    def __init__(self, index, args):
+        self.index = index
+        self.args = args
+        self.random = random.Random((args.seed or 0) * 1000 + index)
+        self.weights = parse_mix(args.mix)
+        self.output = open(args.output, 'w')
+
+        # Each artist works on its own script, as the exported inputs are
+        # named after it
+        nuke_stub.script_name = os.path.join(
+            os.environ['NUKE_COMFYUI_CACHE_DIR'], 'artist_{:03d}.nk'.format(index))
+        nuke_stub.install()
+        nuke_stub.write_placeholders = True
+        sys.path.insert(0, os.path.dirname(plugin_dir))
+
+        import graphs
+        self.graphs = graphs
+        self.plugin = __import__(package)
+        self.run = self.plugin.src.run
+        self.timing = self.plugin.src.timing
+
+        self.plugin.src.object_info.fetch(quiet=True)
+
+    def write(self, data):
+        self.output.write(json.dumps(dict(data, artist=self.index)) + '\n')
+        self.output.flush()
+
+    def wait(self, condition, timeout):
+        deadline = time() + timeout
+
+        while not condition():
+            if time() > deadline:
+                return False
+
+            nuke_stub.process_events(0.005)
+
+        return True
+
+    def think(self, seconds):
+        """Idle as the artist looking at the result, the cost of the event
+        loop of the stub is measured here to subtract it from the jobs."""
+
+        start, cpu = time(), cpu_time()
+        self.wait(lambda: False, seconds)
+        return time() - start, cpu_time() - cpu
+
+    def choose_mode(self):
+        value = self.random.random() * sum(self.weights.values())
+
+        for mode in MODES:
+            if not mode in self.weights:
+                continue
+
+            value -= self.weights[mode]
+            if value < 0:
+                return mode
+
+        return list(self.weights)[-1]
+
+    def submit(self, mode):
+        args = self.args
+        self.run.states.clear()
+        nuke_stub.comfyui_running = False
+        done = []
+
+        if mode == 'single':
+            run_node = self.graphs.GENERATORS[args.graph](args.size)
+            self.run.submit(run_node, success_callback=lambda read: done.append(time()))
+            timeout = args.timeout
+
+        elif mode == 'iteration':
+            run_node = self.graphs.GENERATORS['seeded'](args.size)
+            self.run.iteration_submit_for_node(
+                run_node, args.iterations, lambda read: done.append(time()))
+            timeout = args.timeout * args.iterations
+
+        else:
+            run_node = self.graphs.GENERATORS['animated'](args.size)
+            task = [nuke_stub.ProgressTask('Sending Frames...')]
+            self.run.submit(run_node, animation=[
+                1, args.frames, lambda frame, filename: None, lambda: done.append(time()), task])
+            timeout = args.timeout * args.frames
+
+        # A server that failed the prompt never calls back, the job ends when
+        # the Run is released
+        finished = self.wait(lambda: done or not nuke_stub.comfyui_running, timeout)
+
+        if not finished:
+            for task in nuke_stub.tasks:
+                task.cancel()
+
+            self.wait(lambda: not nuke_stub.comfyui_running, 5)
+
+        return 'success' if done else 'timeout' if not finished else 'error'
+
+    def loop(self):
+        args = self.args
+        end = time() + args.duration
+        idle_seconds = idle_cpu = 0.0
+        jobs = 0
+
+        # Not all the artists start at the same time
+        seconds, cpu = self.think(self.random.uniform(0, args.think))
+        idle_seconds += seconds
+        idle_cpu += cpu
+
+        while time() < end and (not args.jobs or jobs < args.jobs):
+            mode = self.choose_mode()
+            records = set(self.timing.records)
+
+            start, cpu = time(), cpu_time()
+            status = self.submit(mode)
+            wall, cpu = time() - start, cpu_time() - cpu
+
+            prompts = [r for key, r in list(self.timing.records.items()) if not key in records]
+
+            self.write({
+                'kind': 'job', 'mode': mode, 'status': status, 'start': start,
+                'seconds': wall, 'cpu': cpu, 'prompts': len(prompts)})
+
+            for record in prompts:
+                stages = record.durations()
+                self.write({
+                    'kind': 'prompt', 'mode': mode, 'status': record.status,
+                    'server': os.environ['NUKE_COMFYUI_IP'] + ':' + os.environ['NUKE_COMFYUI_PORT'],
+                    'created': record.created, 'queued': record.queued, 'started': record.started,
+                    'executed': record.executed, 'queue': stages['queue'],
+                    'execution': stages['execution']})
+
+            jobs += 1
+
+            seconds, cpu = self.think(self.random.expovariate(1.0 / args.think) if args.think else 0)
+            idle_seconds += seconds
+            idle_cpu += cpu
+
+        self.write({'kind': 'artist', 'jobs': jobs, 'idle_seconds': idle_seconds,
+                    'idle_cpu': idle_cpu})
+
+    def close(self):
+        nuke_stub.process_events(0.1)
+        self.output.close()
+
+
+def percentiles(values, points=(50, 90, 99)):
+    values = sorted(values)
+    result = {}
+
+    for point in points:
+        if values:
+            index = min(len(values) - 1, max(0, int(round(point / 100.0 * len(values))) - 1))
+            result['p{}'.format(point)] = values[index]
+        else:
+            result['p{}'.format(point)] = None
+
+    result['max'] = values[-1] if values else None
+    result['mean'] = sum(values) / len(values) if values else None
+    return result
+
+
+def jain(values):
+    """(sum x)^2 / (n * sum x^2), 1 when all are equal and 1/n when a single
+    one gets everything."""
+
+    square = sum(v * v for v in values)
+    return (sum(values) ** 2) / (len(values) * square) if square else None
+
+
+def summarize(events, artists, seconds):
+    jobs = [e for e in events if e['kind'] == 'job']
+    prompts = [e for e in events if e['kind'] == 'prompt']
+    idle = dict((e['artist'], e) for e in events if e['kind'] == 'artist')
+
+    executed = [p for p in prompts if p['status'] == 'success']
+    waits = [p['queue'] for p in prompts if p['started']]
+
+    queue_wait = {'all': percentiles(waits)}
+    for mode in MODES:
+        mode_waits = [p['queue'] for p in prompts if p['started'] and p['mode'] == mode]
+        if mode_waits:
+            queue_wait[mode] = percentiles(mode_waits)
+
+    servers = {}
+    for prompt in prompts:
+        server = servers.setdefault(prompt['server'], {'prompts': 0, 'busy_seconds': 0.0})
+        server['prompts'] += prompt['status'] == 'success'
+        server['busy_seconds'] += prompt['execution']
+
+    for server in servers.values():
+        server['prompts_per_second'] = server['prompts'] / seconds
+        server['utilization'] = server['busy_seconds'] / seconds
+
+    # Fairness of the service that each artist got, the jobs done and the
+    # mean queue wait of its prompts
+    done = []
+    mean_waits = []
+
+    for artist in range(artists):
+        done.append(len([p for p in executed if p['artist'] == artist]))
+        artist_waits = [p['queue'] for p in prompts if p['artist'] == artist and p['started']]
+        mean_waits.append(sum(artist_waits) / len(artist_waits) if artist_waits else 0.0)
+
+    # The event loop of the stub polls while waiting, its rate measured in
+    # the think time is not counted as the cost of the jobs
+    cpu = []
+    for job in jobs:
+        artist_idle = idle.get(job['artist'])
+        rate = artist_idle['idle_cpu'] / artist_idle['idle_seconds'] \
+            if artist_idle and artist_idle['idle_seconds'] else 0.0
+
+        cpu.append(max(job['cpu'] - rate * job['seconds'], 0.0) / max(job['prompts'], 1))
+
+    return {
+        'artists': artists,
+        'seconds': seconds,
+        'jobs': len(jobs),
+        'jobs_failed': len([j for j in jobs if not j['status'] == 'success']),
+        'prompts': len(prompts),
+        'prompts_per_second': len(executed) / seconds,
+        'queue_wait': queue_wait,
+        'servers': servers,
+        'fairness_prompts': jain(done),
+        'fairness_queue_wait': jain(mean_waits),
+        'prompts_per_artist': percentiles(done, (50,)),
+        'client_cpu_per_prompt': percentiles(cpu, (50, 90))
+    }
+
+
+def start_servers(args, temp_dir):
+    """Fake servers started in this process, or the given servers, returns
+    (address, comfyui_dir) of each server."""
+
+    if args.servers:
+        return None, [(server, None) for server in args.servers]
+
+    import fake_comfyui
+
+    servers = []
+    addresses = []
+
+    for i in range(args.fake_servers):
+        comfyui_dir = os.path.join(temp_dir, 'ComfyUI_{}'.format(i))
+        server, _ = fake_comfyui.serve(**fake_comfyui.get_options(args, comfyui_dir))
+
+        servers.append(server)
+        addresses.append(('127.0.0.1:{}'.format(server.server_address[1]), comfyui_dir))
+
+    return servers, addresses
+
+
+def load(args, argv):
+    temp_dir = tempfile.mkdtemp(prefix='nuke_comfyui_load_')
+    servers, addresses = start_servers(args, temp_dir)
+    processes = []
+
+    try:
+        start = time()
+
+        for i in range(args.artists):
+            address, comfyui_dir = addresses[i % len(addresses)]
+            ip, _, port = address.rpartition(':')
+            cache_dir = os.path.join(temp_dir, 'artist_{:03d}'.format(i))
+            os.makedirs(cache_dir)
+
+            env = dict(os.environ)
+            env['NUKE_COMFYUI_IP'] = ip
+            env['NUKE_COMFYUI_PORT'] = port
+            env['NUKE_COMFYUI_DIR_LOCAL'] = comfyui_dir or args.dir_local or env.get('NUKE_COMFYUI_DIR_LOCAL', '')
+            env['NUKE_COMFYUI_DIR_REMOTE'] = comfyui_dir or args.dir_remote or env.get('NUKE_COMFYUI_DIR_REMOTE', '')
+            env['NUKE_COMFYUI_CACHE_DIR'] = cache_dir
+
+            output = os.path.join(cache_dir, 'events.jsonl')
+            command = [sys.executable, os.path.abspath(__file__), '--artist', str(i),
+                       '--output', output] + argv
+
+            with open(os.path.join(cache_dir, 'artist.log'), 'w') as log:
+                process = subprocess.Popen(command, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+            processes.append((process, output, cache_dir))
+
+        for process, _, _ in processes:
+            process.wait()
+
+        seconds = time() - start
+        events = []
+
+        for process, output, cache_dir in processes:
+            if not process.returncode == 0:
+                with open(os.path.join(cache_dir, 'artist.log')) as f:
+                    sys.stderr.write(f.read())
+
+            if os.path.isfile(output):
+                with open(output) as f:
+                    events += [json.loads(line) for line in f if line.strip()]
+
+        return summarize(events, args.artists, seconds), events
+
+    finally:
+        for process, _, _ in processes:
+            if process.poll() is None:
+                process.kill()
+
+        for server in servers or []:
+            server.shutdown()
+
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+def print_results(results):
+    def value_str(value):
+        return '{:.4f}'.format(value) if type(value) == float else str(value)
+
+    for key, value in sorted(results.items()):
+        if not type(value) == dict:
+            print('{:<24} {}'.format(key, value_str(value)))
+
+    for key in ['queue_wait', 'servers']:
+        print(key)
+        for name, values in sorted(results[key].items()):
+            print('    {:<20} {}'.format(name, '  '.join(
+                '{} {}'.format(k, value_str(v)) for k, v in sorted(values.items()))))
+
+    for key in ['prompts_per_artist', 'client_cpu_per_prompt']:
+        print('{:<24} {}'.format(key, '  '.join(
+            '{} {}'.format(k, value_str(v)) for k, v in sorted(results[key].items()))))
+
+
+def main(argv=None):
+    import fake_comfyui
+
+    # The generators are built on the stub
+    nuke_stub.install()
+    import graphs
+
+    argv = sys.argv[1:] if argv is None else argv
+
+    parser = argparse.ArgumentParser(
+        description='Many artists submitting to a pool of ComfyUI servers.')
+    parser.add_argument('--artists', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=30,
+                        help='seconds that each artist keeps submitting jobs')
+    parser.add_argument('--jobs', type=int, default=0,
+                        help='maximum jobs per artist, 0 for no limit')
+    parser.add_argument('--mix', nargs='+', default=['single=4', 'iteration=1', 'animation=1'],
+                        help='weights of the modes of the jobs, eg: single=4 animation=1')
+    parser.add_argument('--think', type=float, default=2.0,
+                        help='mean seconds between the jobs of an artist')
+    parser.add_argument('--iterations', type=int, default=3)
+    parser.add_argument('--frames', type=int, default=5)
+    parser.add_argument('--size', type=int, default=10,
+                        help='nodes of the graph of each job')
+    parser.add_argument('--graph', default='deep', choices=sorted(graphs.GENERATORS),
+                        help='graph of the single jobs')
+    parser.add_argument('--timeout', type=float, default=120,
+                        help='seconds per prompt before giving up')
+    parser.add_argument('--servers', nargs='+',
+                        help='host:port of running servers, instead of fake servers')
+    parser.add_argument('--fake-servers', type=int, default=1)
+    parser.add_argument('--dir-local', help='ComfyUI directory of the servers from this machine')
+    parser.add_argument('--dir-remote', help='ComfyUI directory in the servers')
+    parser.add_argument('--json', help='save the results and the events to this file')
+    parser.add_argument('--artist', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    fake_comfyui.add_arguments(parser)
+
+    args = parser.parse_args(argv)
+
+    try:
+        parse_mix(args.mix)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    if not args.artist is None:
+        artist = Artist(args.artist, args)
+        try:
+            artist.loop()
+        finally:
+            artist.close()
+
+        return 0
+
+    results, events = load(args, argv)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'results': results, 'events': events}, f, indent=4)
+
+    return 1 if results['jobs_failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,633 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+"""Minimal in-process stand-in of the nuke module, only what the submit
+needs: nodes, groups, knobs with animation, inputs and a main thread queue.
+Rendering does nothing (or writes empty files), so the benchmarks measure the
+Python side only."""
+import os
+import re
+import sys
+import types
+import tempfile
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue  # type: ignore
+
+STARTLINE = 0x1000
+READ_ONLY = 0x10000000
+INVISIBLE = 0x400
+NUKE_VERSION_MAJOR = 15
+
+messages = []
+warnings = []
+tasks = []
+
+# Functions sent to the main thread, run by process_events()
+main_thread_queue = queue.Queue()
+
+# Write nodes create empty files for each frame when enabled
+write_placeholders = False
+
+# Name of the root, as in Nuke the path of the script
+script_name = os.path.join(tempfile.gettempdir(), 'benchmark.nk')
+
+
+class Knob(object):
+    def __init__(self, name, label=None, value=0):
+        self._name = name
+        self._label = label or name
+        self._value = value
+        self._keys = {}
+        self._flags = 0
+        self._node = None
+
+    def name(self):
+        return self._name
+
+    def label(self):
+        return self._label
+
+    def node(self):
+        return self._node
+
+    def value(self):
+        return self._value
+
+    def getValue(self):
+        return self._value
+
+    def setValue(self, value):
+        self._value = value
+        return True
+
+    def setText(self, value):
+        self._value = value
+
+    def fromUserText(self, value):
+        self._value = value
+
+    def getText(self):
+        return self._value
+
+    def setAnimated(self):
+        pass
+
+    def setValueAt(self, value, frame):
+        self._keys[frame] = value
+
+    def isAnimated(self):
+        return bool(self._keys)
+
+    def valueAt(self, frame):
+        if not self._keys:
+            return self._value
+
+        if frame in self._keys:
+            return self._keys[frame]
+
+        frames = sorted(self._keys)
+        if frame <= frames[0]:
+            return self._keys[frames[0]]
+        if frame >= frames[-1]:
+            return self._keys[frames[-1]]
+
+        for a, b in zip(frames, frames[1:]):
+            if a <= frame <= b:
+                t = float(frame - a) / (b - a)
+                return self._keys[a] + (self._keys[b] - self._keys[a]) * t
+
+    def toScript(self):
+        if self._keys:
+            return '{{curve {}}}'.format(' '.join(
+                'x{} {}'.format(f, v) for f, v in sorted(self._keys.items())))
+
+        return str(self._value)
+
+    def setFlag(self, flag):
+        self._flags |= flag
+
+    def clearFlag(self, flag):
+        self._flags &= ~flag
+
+    def setVisible(self, visible):
+        pass
+
+    def setEnabled(self, enabled):
+        pass
+
+    def setTooltip(self, tooltip):
+        pass
+
+    def setRange(self, min_value, max_value):
+        pass
+
+    def setName(self, name):
+        self._name = name
+
+
+class Int_Knob(Knob):
+    pass
+
+
+class Double_Knob(Knob):
+    pass
+
+
+class Boolean_Knob(Knob):
+    def __init__(self, name, label=None, value=False):
+        Knob.__init__(self, name, label, value)
+
+
+class String_Knob(Knob):
+    def __init__(self, name, label=None, value=''):
+        Knob.__init__(self, name, label, value)
+
+
+class File_Knob(String_Knob):
+    pass
+
+
+class Multiline_Eval_String_Knob(String_Knob):
+    pass
+
+
+class PyScript_Knob(String_Knob):
+    pass
+
+
+class Tab_Knob(Knob):
+    pass
+
+
+class Text_Knob(String_Knob):
+    pass
+
+
+class Enumeration_Knob(Knob):
+    def __init__(self, name, label=None, values=[]):
+        Knob.__init__(self, name, label, values[0] if values else '')
+        self._values = list(values)
+
+    def values(self):
+        return self._values
+
+
+class Array_Knob(Knob):
+    pass
+
+
+class BBox(object):
+    def __init__(self, width, height):
+        self._width = width
+        self._height = height
+
+    def w(self):
+        return self._width
+
+    def h(self):
+        return self._height
+
+    def x(self):
+        return 0
+
+    def y(self):
+        return 0
+
+
+class Node(object):
+    def __init__(self, node_class, name=None, parent=None):
+        self._class = node_class
+        self._name = name or node_class + '1'
+        self._parent = parent
+        self._knobs = {}
+        self._inputs = []
+        self._max_inputs = 1
+        self._children = []
+        self._selected = False
+        self._xpos = 0
+        self._ypos = 0
+        self._first_frame = 1
+        self._last_frame = 1
+        self._width = 1920
+        self._height = 1080
+
+        for knob in [String_Knob('name', value=self._name), String_Knob('label'),
+                     Boolean_Knob('disable'), Int_Knob('tile_color'),
+                     Int_Knob('xpos'), Int_Knob('ypos'), Boolean_Knob('hide_input')]:
+            self.addKnob(knob)
+
+        if parent:
+            parent._children.append(self)
+
+    def __getitem__(self, name):
+        return self._knobs[name]
+
+    def __repr__(self):
+        return '<Node {} {}>'.format(self._class, self.fullName())
+
+    def Class(self):
+        return self._class
+
+    def name(self):
+        return self._name
+
+    def setName(self, name):
+        self._name = name
+        self._knobs['name'].setValue(name)
+
+    def fullName(self):
+        if self is _root[0]:
+            return 'root'
+
+        if self._parent and not self._parent is _root[0]:
+            return self._parent.fullName() + '.' + self._name
+        return self._name
+
+    def parent(self):
+        return self._parent
+
+    def knob(self, name):
+        return self._knobs.get(name)
+
+    def knobs(self):
+        return dict(self._knobs)
+
+    def allKnobs(self):
+        return list(self._knobs.values())
+
+    def addKnob(self, knob):
+        knob._node = self
+        self._knobs[knob.name()] = knob
+
+    def removeKnob(self, knob):
+        self._knobs.pop(knob.name(), None)
+
+    def input(self, i):
+        return self._inputs[i] if i < len(self._inputs) else None
+
+    def inputs(self):
+        return len(self._inputs)
+
+    def maxInputs(self):
+        return self._max_inputs
+
+    def setInput(self, i, node):
+        while len(self._inputs) <= i:
+            self._inputs.append(None)
+
+        self._inputs[i] = node
+        self._max_inputs = max(self._max_inputs, i + 1)
+        return True
+
+    def dependencies(self, what=None):
+        return [n for n in self._inputs if n]
+
+    def dependent(self, what=None, forceEvaluate=True):
+        group = self._parent or _root[0]
+        return [n for n in group._children if self in n._inputs]
+
+    def setSelected(self, selected):
+        self._selected = selected
+
+    def isSelected(self):
+        return self._selected
+
+    def xpos(self):
+        return self._xpos
+
+    def ypos(self):
+        return self._ypos
+
+    def setXYpos(self, x, y):
+        self._xpos = x
+        self._ypos = y
+
+    def setXpos(self, x):
+        self._xpos = x
+
+    def setYpos(self, y):
+        self._ypos = y
+
+    def screenWidth(self):
+        return 80
+
+    def screenHeight(self):
+        return 18
+
+    def autoplace(self):
+        pass
+
+    def firstFrame(self):
+        return self._first_frame
+
+    def lastFrame(self):
+        return self._last_frame
+
+    def setFrameRange(self, first, last):
+        self._first_frame = first
+        self._last_frame = last
+
+    def frameRange(self):
+        node = self
+
+        class FrameRange(object):
+            def first(self):
+                return node._first_frame
+
+            def last(self):
+                return node._last_frame
+
+        return FrameRange()
+
+    def bbox(self):
+        return BBox(self._width, self._height)
+
+    def width(self):
+        return self._width
+
+    def height(self):
+        return self._height
+
+    def showControlPanel(self):
+        pass
+
+    def hideControlPanel(self):
+        pass
+
+    # Groups
+    def begin(self):
+        _context.append(self)
+        return self
+
+    def end(self):
+        if len(_context) > 1:
+            _context.pop()
+
+    def __enter__(self):
+        return self.begin()
+
+    def __exit__(self, *args):
+        self.end()
+
+    def nodes(self):
+        return list(self._children)
+
+    def node(self, name):
+        for n in self._children:
+            if n._name == name:
+                return n
+
+
+class ProgressTask(object):
+    def __init__(self, message=''):
+        self._cancelled = False
+        tasks.append(self)
+
+    def cancel(self):
+        self._cancelled = True
+
+    def setProgress(self, progress):
+        pass
+
+    def setMessage(self, message):
+        pass
+
+    def isCancelled(self):
+        return self._cancelled
+
+
+class Undo(object):
+    @staticmethod
+    def begin(name=''):
+        pass
+
+    @staticmethod
+    def end():
+        pass
+
+    @staticmethod
+    def disable():
+        pass
+
+    @staticmethod
+    def enable():
+        pass
+
+
+_root = [None]
+_context = []
+_main_thread = threading.current_thread()
+
+
+def scriptClear():
+    root_node = Node('Root', script_name)
+    root_node.addKnob(Boolean_Knob('proxy'))
+    root_node.addKnob(Int_Knob('first_frame', value=1))
+    root_node.addKnob(Int_Knob('last_frame', value=100))
+    root_node.addKnob(String_Knob('colorManagement', value='Nuke'))
+
+    _root[0] = root_node
+    del _context[:]
+    _context.append(root_node)
+    del messages[:]
+    del warnings[:]
+    del tasks[:]
+
+
+def root():
+    return _root[0]
+
+
+Root = root
+
+
+def thisGroup():
+    return _context[-1]
+
+
+def thisNode():
+    return _context[-1]
+
+
+def toNode(name):
+    group = _root[0]
+
+    for part in name.split('.'):
+        if part == 'root':
+            continue
+
+        group = group.node(part) if group else None
+        if not group:
+            return
+
+    return group
+
+
+def allNodes(filter=None, group=None, recurseGroups=False):
+    group = group or _context[-1]
+    result = []
+
+    for n in group._children:
+        if not filter or n.Class() == filter:
+            result.append(n)
+
+        if recurseGroups and n._children:
+            result.extend(allNodes(filter, n, True))
+
+    return result
+
+
+def selectedNodes(filter=None):
+    return [n for n in allNodes(filter) if n.isSelected()]
+
+
+def selectedNode():
+    nodes = selectedNodes()
+    if not nodes:
+        raise ValueError('no node selected')
+
+    return nodes[-1]
+
+
+def createNode(node_class, knobs='', inpanel=True):
+    group = _context[-1]
+    names = set(n.name() for n in group._children)
+
+    index = 1
+    while '{}{}'.format(node_class, index) in names:
+        index += 1
+
+    node = Node(node_class, '{}{}'.format(node_class, index), group)
+
+    if node_class == 'Write':
+        for knob in [File_Knob('file'), Boolean_Knob('raw'),
+                     String_Knob('file_type'), String_Knob('channels')]:
+            node.addKnob(knob)
+
+    elif node_class == 'Read':
+        for knob in [File_Knob('file'), Int_Knob('first', value=1), Int_Knob('last', value=1),
+                     Boolean_Knob('raw'), String_Knob('colorspace'),
+                     String_Knob('frame_mode'), String_Knob('frame'),
+                     String_Knob('before'), String_Knob('after'),
+                     Boolean_Knob('postage_stamp')]:
+            node.addKnob(knob)
+
+    return node
+
+
+class Nodes(object):
+    """nuke.nodes, the nodes are created without connecting them to the
+    selection."""
+
+    def __getattr__(self, node_class):
+        return lambda **knobs: createNode(node_class, inpanel=False)
+
+
+nodes = Nodes()
+
+
+def delete(node):
+    group = node._parent or _root[0]
+    if node in group._children:
+        group._children.remove(node)
+
+    for n in group._children:
+        n._inputs = [None if i is node else i for i in n._inputs]
+
+
+def execute(node, first=None, last=None, incr=1, views=None):
+    if not write_placeholders or not node.knob('file'):
+        return
+
+    filename = node.knob('file').value()
+    first = node.firstFrame() if first is None else first
+    last = first if last is None else last
+
+    for frame in range(int(first), int(last) + 1, incr):
+        path = re.sub(r'#+', lambda m: str(frame).zfill(len(m.group(0))), filename)
+        open(path, 'wb').close()
+
+
+def getFileNameList(directory, *args):
+    """Files of the directory, the numbered sequences are not collapsed."""
+
+    if not os.path.isdir(directory):
+        return []
+
+    return sorted(f for f in os.listdir(directory)
+                  if os.path.isfile(os.path.join(directory, f)))
+
+
+def message(text):
+    messages.append(text)
+
+
+def warning(text):
+    warnings.append(text)
+
+
+def ask(text):
+    return True
+
+
+def executeInMainThread(function, args=(), kwargs={}):
+    if not type(args) == tuple:
+        args = (args,)
+
+    main_thread_queue.put((function, args, kwargs))
+
+
+def executeInMainThreadWithResult(function, args=(), kwargs={}):
+    if not type(args) == tuple:
+        args = (args,)
+
+    if threading.current_thread() is _main_thread:
+        return function(*args, **kwargs)
+
+    result = []
+    done = threading.Event()
+
+    def call():
+        result.append(function(*args, **kwargs))
+        done.set()
+
+    main_thread_queue.put((call, (), {}))
+    done.wait()
+    return result[0]
+
+
+def process_events(timeout=0.01):
+    """Runs the functions sent to the main thread, as the Nuke event loop,
+    waiting up to 'timeout' for the first one."""
+
+    try:
+        function, args, kwargs = main_thread_queue.get(timeout=timeout)
+    except queue.Empty:
+        return
+
+    function(*args, **kwargs)
+
+    while True:
+        try:
+            function, args, kwargs = main_thread_queue.get_nowait()
+        except queue.Empty:
+            return
+
+        function(*args, **kwargs)
+
+
+def install():
+    """Registers this module as 'nuke', must be called before the plugin is
+    imported."""
+
+    scriptClear()
+    sys.modules['nuke'] = sys.modules[__name__]
+
+    nukescripts = types.ModuleType('nukescripts')
+    sys.modules.setdefault('nukescripts', nukescripts)
@@ -0,0 +1,222 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+"""Benchmarks of the submit preparation (get_connected_comfyui_nodes,
+extract_node_data, check_node, path remapping and extract_data) with the nuke
+stub, so they run with any Python and without a Nuke license.
+
+    python benchmarks/prep.py                 compare with the baselines
+    python benchmarks/prep.py --record        save the current times as baselines
+    python benchmarks/prep.py --sizes 10 100 --graphs deep wide
+
+The baselines depend on the machine, record them on the same machine that
+runs the comparison.
+"""
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import traceback
+from time import time
+
+import nuke_stub
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+plugin_dir = os.path.dirname(benchmarks_dir)
+package = os.path.basename(plugin_dir)
+
+SIZES = [10, 100, 1000, 10000]
+BASELINES = os.path.join(benchmarks_dir, 'baselines.json')
+
+
+def setup_environment(temp_dir):
+    """ComfyUI directory, object_info cache and the stub, everything in a
+    temporary directory."""
+
+    local_dir = os.path.join(temp_dir, 'ComfyUI')
+    for dirname in ['comfy', 'input', 'output', 'temp']:
+        os.makedirs(os.path.join(local_dir, dirname))
+
+    os.environ['NUKE_COMFYUI_DIR_LOCAL'] = local_dir
+    os.environ['NUKE_COMFYUI_DIR_REMOTE'] = '/remote/ComfyUI'
+    os.environ['NUKE_COMFYUI_CACHE_DIR'] = os.path.join(temp_dir, 'cache')
+
+    nuke_stub.install()
+    sys.path.insert(0, os.path.dirname(plugin_dir))
+
+    import graphs
+    import schemas
+    plugin = __import__(package)
+
+    object_info = plugin.src.object_info
+    object_info.save(object_info.normalize(schemas.get_object_info()))
+
+    return plugin, graphs
+
+
+def measure(function, repeat):
+    times = []
+    result = None
+
+    for _ in range(repeat):
+        start = time()
+        result = function()
+        times.append(time() - start)
+
+    times.sort()
+    return times[len(times) // 2], result
+
+
+def get_cases(plugin, run_node, frame):
+    nodes = plugin.src.nodes
+    common = plugin.src.common
+
+    connected = nodes.get_connected_comfyui_nodes(run_node, frame=frame)
+    comfyui_nodes = [n for n, _ in connected]
+    prompt = dict((n.name(), data) for n, data in connected)
+
+    def extract_node_data():
+        for n in comfyui_nodes:
+            nodes.extract_node_data(n, frame)
+
+    def check_node():
+        for n in comfyui_nodes:
+            nodes.check_node(n)
+
+    return [
+        ('get_connected_comfyui_nodes',
+         lambda: nodes.get_connected_comfyui_nodes(run_node, frame=frame)),
+        ('extract_node_data', extract_node_data),
+        ('check_node', check_node),
+        ('replace_local_paths_with_remote',
+         lambda: common.replace_local_paths_with_remote(prompt)),
+        ('extract_data', lambda: nodes.extract_data(frame, run_node)),
+    ]
+
+
+def run(graph_names, sizes, repeat):
+    temp_dir = tempfile.mkdtemp(prefix='nuke_comfyui_bench_')
+    results = {}
+
+    try:
+        plugin, graphs = setup_environment(temp_dir)
+
+        for graph_name in graph_names:
+            for size in sizes:
+                frame = 10 if graph_name == 'animated' else -1
+                run_node = graphs.GENERATORS[graph_name](size)
+                repeat_size = max(1, repeat * 100 // max(size, 100))
+
+                try:
+                    cases = get_cases(plugin, run_node, frame)
+                except Exception:
+                    error = traceback.format_exc().strip().splitlines()[-1]
+                    results['{}/{}/setup'.format(graph_name, size)] = {'error': error}
+                    print('{:<60} ERROR {}'.format(
+                        '{}/{}'.format(graph_name, size), error))
+                    continue
+
+                for case_name, function in cases:
+                    key = '{}/{}/{}'.format(graph_name, size, case_name)
+
+                    try:
+                        median, _ = measure(function, repeat_size)
+                        results[key] = {'median': median}
+                        print('{:<60} {:>10.3f} ms'.format(key, median * 1000))
+                    except Exception:
+                        error = traceback.format_exc().strip().splitlines()[-1]
+                        results[key] = {'error': error}
+                        print('{:<60} ERROR {}'.format(key, error))
+
+                if nuke_stub.messages:
+                    print('    messages: ' + ' | '.join(
+                        set(m.replace('\n', ' ') for m in nuke_stub.messages)))
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return results
+
+
+def compare(results, baselines, tolerance):
+    regressions = []
+
+    for key, result in sorted(results.items()):
+        baseline = baselines.get(key)
+        if not baseline:
+            continue
+
+        if 'error' in result and not 'error' in baseline:
+            regressions.append('{}: {}'.format(key, result['error']))
+            continue
+
+        if not 'median' in result or not 'median' in baseline:
+            continue
+
+        ratio = result['median'] / max(baseline['median'], 1e-6)
+        if ratio > 1 + tolerance:
+            regressions.append('{}: {:.3f} ms -> {:.3f} ms ({:+.0f}%)'.format(
+                key, baseline['median'] * 1000, result['median'] * 1000, (ratio - 1) * 100))
+
+    return regressions
+
+
+def main(argv=None):
+    # The generators are built on the stub
+    nuke_stub.install()
+    import graphs
+
+    parser = argparse.ArgumentParser(
+        description='Benchmarks of the submit preparation.')
+    parser.add_argument('--graphs', nargs='+', default=['wide', 'deep', 'animated', 'masked', 'gizmo_nested'],
+                        choices=sorted(graphs.GENERATORS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=SIZES)
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='repetitions of the graphs of 100 nodes, less for bigger graphs')
+    parser.add_argument('--record', action='store_true',
+                        help='save the results as the new baselines')
+    parser.add_argument('--baselines', default=BASELINES)
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed slowdown, 0.25 = 25%%')
+
+    args = parser.parse_args(argv)
+    results = run(args.graphs, args.sizes, args.repeat)
+
+    if args.record:
+        baselines = {}
+        if os.path.isfile(args.baselines):
+            with open(args.baselines) as f:
+                baselines = json.load(f)
+
+        baselines.update(results)
+
+        with open(args.baselines, 'w') as f:
+            json.dump(baselines, f, indent=4, sort_keys=True)
+
+        print('\nBaselines saved: ' + args.baselines)
+        return 0
+
+    if not os.path.isfile(args.baselines):
+        print('\nNo baselines, run with --record first')
+        return 0
+
+    with open(args.baselines) as f:
+        baselines = json.load(f)
+
+    regressions = compare(results, baselines, args.tolerance)
+
+    if regressions:
+        print('\nRegressions:')
+        for regression in regressions:
+            print(' - ' + regression)
+        return 1
+
+    print('\nNo regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
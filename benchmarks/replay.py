@@ -0,0 +1,286 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+"""Replays a session recorded with NUKE_COMFYUI_RECORD_FILE, without GPU:
+
+    NUKE_COMFYUI_RECORD_FILE=/tmp/wan.jsonl nuke    (run the workflow once)
+    python benchmarks/replay.py /tmp/wan.jsonl --speed 10
+
+The recorded prompts are submitted again with run.submit from a graph of the
+nuke stub with the same nodes, and a server answers with the recorded object_info
+and streams the recorded websocket messages of each prompt (progress, executed,
+binary previews ...) with the same timing, divided by --speed. Outputs are
+written as placeholders so that the readback also runs.
+
+The client cost (message handling, updates in the main thread and readback)
+is the wall time minus the duration of the recorded streams. Two builds can be
+compared on the same recording with --json.
+"""
+import os
+import sys
+import json
+import base64
+import shutil
+import argparse
+import tempfile
+from time import time, sleep
+
+import nuke_stub
+
+import fake_comfyui
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+plugin_dir = os.path.dirname(benchmarks_dir)
+package = os.path.basename(plugin_dir)
+
+
+class Recording(object):
+    def __init__(self, path):
+        self.header = {}
+        self.object_info = {}
+        self.prompts = []
+        self.streams = []
+
+        events = []
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    events.append(json.loads(line))
+
+        # The file can hold several sessions, the times are made continuous
+        offset = 0
+        last = 0
+
+        for event in events:
+            if event['kind'] == 'session':
+                if not self.header:
+                    self.header = event
+                offset = last
+                continue
+
+            event['t'] += offset
+            last = event['t']
+
+        self.load(events)
+
+    def load(self, events):
+        streams = {}
+
+        for event in events:
+            if not event['kind'] == 'http':
+                continue
+
+            if event['url'] == 'object_info' and event['status'] == 200:
+                self.object_info = json.loads(event['response'])
+
+            elif event['method'] == 'POST' and event['url'] == 'prompt' and event['status'] == 200:
+                body = event['body']
+                prompt_id = json.loads(event['response']).get('prompt_id') or body.get('prompt_id')
+
+                streams[prompt_id] = []
+                self.prompts.append((prompt_id, body))
+
+        # The messages can arrive before the answer of the POST
+        current = None
+
+        for event in events:
+            if not event['kind'] == 'ws':
+                continue
+
+            if 'binary' in event:
+                prompt_id = current
+                payload = base64.b64decode(event['binary'])
+            else:
+                message = json.loads(event['data'])
+                data = message.get('data') or {}
+
+                if message.get('type') == 'status':
+                    continue
+
+                if message.get('type') == 'execution_start':
+                    current = data.get('prompt_id')
+
+                prompt_id = data.get('prompt_id') or current
+                payload = message
+
+            if prompt_id in streams:
+                streams[prompt_id].append((event['t'], payload))
+
+        # The queue wait of the recording is not replayed, each stream starts
+        # with its first message
+        for prompt_id, _ in self.prompts:
+            stream = streams[prompt_id]
+            first = stream[0][0] if stream else 0
+            self.streams.append([(t - first, payload) for t, payload in stream])
+
+
+class ReplayComfyUI(fake_comfyui.FakeComfyUI):
+    """Executes each queued prompt sending the messages of the next recorded
+    prompt, with the prompt_id of the new one."""
+
+    def __init__(self, comfyui_dir, recording, speed=1.0, **options):
+        self.recording = recording
+        self.speed = speed
+        self.next_stream = 0
+
+        options['object_info'] = recording.object_info
+        fake_comfyui.FakeComfyUI.__init__(self, comfyui_dir, **options)
+
+    def execute(self, item):
+        _, prompt_id, prompt, extra_data, _ = item
+        client_id = extra_data.get('client_id')
+        start = time()
+
+        stream = self.recording.streams[self.next_stream % len(self.recording.streams)]
+        self.next_stream += 1
+
+        status = 'success'
+        outputs = {}
+        frames = 1
+
+        for delay, payload in stream:
+            wait = start + delay / self.speed - time()
+            if wait > 0:
+                sleep(wait)
+
+            if self.interrupt_id[0] == prompt_id:
+                status = 'interrupted'
+                self.send(client_id, 'execution_interrupted', {
+                    'prompt_id': prompt_id, 'node_id': None, 'executed': list(outputs)})
+                break
+
+            if type(payload) == bytes:
+                self.send_binary(client_id, payload)
+                continue
+
+            type_data = payload['type']
+            data = dict(payload['data'])
+            if 'prompt_id' in data:
+                data['prompt_id'] = prompt_id
+
+            if type_data == 'executed':
+                data['output'] = self.replace_outputs(prompt, data)
+                outputs[data['node']] = data['output']
+                frames = max(frames, len(data['output'].get('images', [])))
+
+            elif type_data == 'execution_error':
+                status = 'error'
+
+            elif type_data == 'execution_interrupted':
+                status = 'interrupted'
+
+            self.send(client_id, type_data, data)
+
+        self.add_history(item, start, status, outputs, frames)
+
+    def replace_outputs(self, prompt, data):
+        """Files of the recording with the prefix of the new prompt, written
+        as placeholders for the readback."""
+
+        output = data.get('output') or {}
+        node = prompt.get(data.get('node'))
+
+        if not node or not 'images' in output:
+            return output
+
+        replaced = self.write_outputs(node, len(output['images']))
+        return dict(output, **replaced) if replaced else output
+
+
+def replay(recording, speed, frames, timeout):
+    temp_dir = tempfile.mkdtemp(prefix='nuke_comfyui_replay_')
+    comfyui_dir = os.path.join(temp_dir, 'ComfyUI')
+
+    server, _ = fake_comfyui.serve(fake=ReplayComfyUI(comfyui_dir, recording, speed))
+
+    os.environ['NUKE_COMFYUI_IP'] = '127.0.0.1'
+    os.environ['NUKE_COMFYUI_PORT'] = str(server.server_address[1])
+    os.environ['NUKE_COMFYUI_DIR_LOCAL'] = comfyui_dir
+    os.environ['NUKE_COMFYUI_DIR_REMOTE'] = comfyui_dir
+    os.environ['NUKE_COMFYUI_CACHE_DIR'] = os.path.join(temp_dir, 'cache')
+
+    nuke_stub.install()
+    nuke_stub.write_placeholders = True
+    sys.path.insert(0, os.path.dirname(plugin_dir))
+
+    import graphs
+    plugin = __import__(package)
+    run = plugin.src.run
+    plugin.src.object_info.fetch(quiet=True)
+
+    results = []
+
+    try:
+        for prompt_id, body in recording.prompts:
+            run_node = graphs.from_prompt(body['prompt'], recording.object_info, frames)
+            run.states.clear()
+            nuke_stub.comfyui_running = False
+            done = []
+
+            start = time()
+            run.submit(run_node, success_callback=lambda read: done.append(time()))
+
+            deadline = start + timeout
+            while not done and time() < deadline:
+                nuke_stub.process_events(0.005)
+
+            total = time() - start
+            stream = recording.streams[len(results) % len(recording.streams)]
+            streamed = stream[-1][0] / speed if stream else 0
+
+            results.append({
+                'prompt_id': prompt_id,
+                'messages': len(stream),
+                'seconds': total,
+                'stream_seconds': streamed,
+                'client_overhead': total - streamed,
+                'timeout': not done
+            })
+
+        nuke_stub.process_events(0.1)
+    finally:
+        server.shutdown()
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replays a recorded ComfyUI session.')
+    parser.add_argument('recording', help='file recorded with NUKE_COMFYUI_RECORD_FILE')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='2 replays the messages twice as fast')
+    parser.add_argument('--frames', type=int, default=1,
+                        help='frames of the Read nodes of the inputs')
+    parser.add_argument('--timeout', type=float, default=600,
+                        help='seconds per prompt before giving up')
+    parser.add_argument('--json', help='save the results to this file')
+
+    args = parser.parse_args(argv)
+    recording = Recording(args.recording)
+
+    if not recording.prompts:
+        print('No prompts in ' + args.recording)
+        return 1
+
+    results = replay(recording, args.speed, args.frames, args.timeout)
+
+    for result in results:
+        print('{prompt_id}  {messages:>6} messages  {seconds:8.3f}s  '
+              'stream {stream_seconds:8.3f}s  overhead {client_overhead:7.3f}s{timeout}'.format(
+                  **dict(result, timeout='  TIMEOUT' if result['timeout'] else '')))
+
+    total = sum(r['client_overhead'] for r in results)
+    print('\nClient overhead: {:.3f}s in {} prompts'.format(total, len(results)))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    return 1 if any(r['timeout'] for r in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
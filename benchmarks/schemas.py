@@ -0,0 +1,71 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+"""object_info of the node types used by the benchmark graphs and served by
+the fake ComfyUI server."""
+
+SCHEMAS = {
+    'SaveImage': {
+        'input': {'required': {
+            'images': ['IMAGE', {}],
+            'filename_prefix': ['STRING', {'default': 'ComfyUI'}]}},
+        'output': [], 'output_name': [], 'output_node': True},
+    'ImageScaleBy': {
+        'input': {'required': {
+            'image': ['IMAGE', {}],
+            'upscale_method': [['nearest-exact', 'bilinear', 'area', 'bicubic', 'lanczos'], {}],
+            'scale_by': ['FLOAT', {'default': 1.0, 'min': 0.01, 'max': 8.0}]}},
+        'output': ['IMAGE'], 'output_name': ['IMAGE'], 'output_node': False},
+    'ImageAddNoise': {
+        'input': {'required': {
+            'image': ['IMAGE', {}],
+            'seed': ['INT', {'default': 0, 'min': 0, 'max': 0xffffffffffffffff}],
+            'strength': ['FLOAT', {'default': 0.5, 'min': 0.0, 'max': 1.0}]}},
+        'output': ['IMAGE'], 'output_name': ['IMAGE'], 'output_node': False},
+    'ImageBatch': {
+        'input': {'required': {
+            'image1': ['IMAGE', {}],
+            'image2': ['IMAGE', {}]}},
+        'output': ['IMAGE'], 'output_name': ['IMAGE'], 'output_node': False},
+    'ImageCompositeMasked': {
+        'input': {'required': {
+            'destination': ['IMAGE', {}],
+            'source': ['IMAGE', {}],
+            'x': ['INT', {'default': 0, 'min': 0}],
+            'y': ['INT', {'default': 0, 'min': 0}]},
+            'optional': {
+            'mask': ['MASK', {}]}},
+        'output': ['IMAGE'], 'output_name': ['IMAGE'], 'output_node': False},
+    'LoadEXR': {
+        'input': {'required': {
+            'filepath': ['STRING', {}],
+            'tonemap': [['sRGB', 'linear'], {}],
+            'image_load_cap': ['INT', {'default': 0}],
+            'select_every_nth': ['INT', {'default': 1}],
+            'skip_first_images': ['INT', {'default': 0}]}},
+        'output': ['IMAGE', 'MASK'], 'output_name': ['IMAGE', 'MASK'], 'output_node': False},
+    'SaveEXR': {
+        'input': {'required': {
+            'images': ['IMAGE', {}],
+            'filename_prefix': ['STRING', {'default': 'ComfyUI'}],
+            'tonemap': [['sRGB', 'linear'], {}]}},
+        'output': [], 'output_name': [], 'output_node': True},
+    'PreviewImage': {
+        'input': {'required': {
+            'images': ['IMAGE', {}]}},
+        'output': [], 'output_name': [], 'output_node': True},
+}
+
+
+def get_object_info():
+    info = {}
+
+    for name, schema in SCHEMAS.items():
+        schema = dict(schema)
+        schema.update({'name': name, 'display_name': name,
+                      'category': 'benchmark', 'description': ''})
+        info[name] = schema
+
+    return info
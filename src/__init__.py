@@ -1,10 +1,46 @@
-from . import (
-    common,
-    connection,
-    nodes,
-    run,
-    update_menu,
-    read_media,
-    upload,
-    workflow_importer
-)
+import importlib
+
+
+class LazyModule(object):
+    """Stands for a module that is only imported the first time one of its
+    attributes is used, eg: from a menu or a knob callback."""
+
+    def __init__(self, name, package):
+        self.__dict__['_name'] = name
+        self.__dict__['_package'] = package
+        self.__dict__['_module'] = None
+
+    def _load(self):
+        if not self._module:
+            self.__dict__['_module'] = importlib.import_module(
+                self._name, self._package)
+
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+
+batch_import = LazyModule('.batch_import', __name__)
+common = LazyModule('.common', __name__)
+connection = LazyModule('.connection', __name__)
+dispatcher = LazyModule('.dispatcher', __name__)
+metrics = LazyModule('.metrics', __name__)
+nodes = LazyModule('.nodes', __name__)
+object_info = LazyModule('.object_info', __name__)
+pre_export = LazyModule('.pre_export', __name__)
+run = LazyModule('.run', __name__)
+update_menu = LazyModule('.update_menu', __name__)
+read_media = LazyModule('.read_media', __name__)
+recorder = LazyModule('.recorder', __name__)
+search = LazyModule('.search', __name__)
+timing = LazyModule('.timing', __name__)
+upload = LazyModule('.upload', __name__)
+workflow_importer = LazyModule('.workflow_importer', __name__)
+
+__all__ = ['batch_import', 'common', 'connection', 'dispatcher', 'metrics',
+           'nodes', 'object_info', 'pre_export', 'run', 'update_menu', 'read_media', 'recorder',
+           'search', 'timing', 'upload', 'workflow_importer']
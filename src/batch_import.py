@@ -0,0 +1,231 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+"""Converts a directory of ComfyUI workflows into .nk files without GUI,
+the workflows are split between several 'nuke -t' processes that share the
+cached object_info and node templates.
+
+    nuke -t nuke_comfyui/batch_import.py <workflows_dir> <output_dir> [-j 4]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import traceback
+import subprocess
+from time import time
+
+import nuke  # type: ignore
+
+from ..python_util.util import jread
+from . import object_info
+from . import update_menu
+from .update_menu import create_comfyui_node
+from .workflow_importer import create_workflow
+
+launcher = os.path.join(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))), 'batch_import.py')
+
+
+def get_workflows(workflows_dir):
+    return [os.path.join(workflows_dir, f) for f in sorted(os.listdir(workflows_dir))
+            if f.lower().endswith('.json')]
+
+
+def get_output_path(workflow_path, output_dir):
+    name = os.path.splitext(os.path.basename(workflow_path))[0]
+    return os.path.join(output_dir, name + '.nk')
+
+
+def convert(workflow_path, output_dir):
+    result = {'output': None, 'missing': [], 'error': None}
+
+    try:
+        nuke.scriptClear()
+        data = jread(workflow_path)
+        nodes, not_installed = create_workflow(data)
+
+        result['missing'] = sorted(set(not_installed))
+
+        if nodes:
+            output_path = get_output_path(workflow_path, output_dir)
+            nuke.nodeCopy(output_path)
+            result['output'] = output_path
+        else:
+            result['error'] = 'Empty workflow'
+
+    except Exception:
+        result['error'] = traceback.format_exc()
+
+    return result
+
+
+def warm_templates(workflows):
+    """Creates one node of each type used by the workflows, so that the
+    workers only paste the templates saved in the cache."""
+
+    types = set()
+
+    for workflow_path in workflows:
+        try:
+            data = jread(workflow_path)
+        except Exception:
+            continue
+
+        for attrs in data.get('nodes', []):
+            types.add(attrs['type'])
+
+    nodes = object_info.get_nodes()
+
+    for node_type in sorted(types):
+        if not node_type in nodes:
+            continue
+
+        template = update_menu.get_template_path(node_type)
+        if os.path.isfile(template):
+            continue
+
+        nuke.scriptClear()
+        try:
+            create_comfyui_node(node_type, inpanel=False)
+        except Exception:
+            pass
+
+    nuke.scriptClear()
+
+
+def worker(chunk_path, output_dir, result_path):
+    update_menu.save_templates = False
+
+    with open(chunk_path) as f:
+        workflows = json.load(f)
+
+    results = {}
+
+    for workflow_path in workflows:
+        start = time()
+        results[workflow_path] = convert(workflow_path, output_dir)
+        results[workflow_path]['time'] = round(time() - start, 3)
+
+        print('{}: {}'.format(os.path.basename(workflow_path),
+                              'ERROR' if results[workflow_path]['error'] else 'OK'))
+
+    with open(result_path, 'w') as f:
+        json.dump(results, f, indent=4)
+
+
+def run_workers(workflows, output_dir, jobs, executable):
+    temp_dir = tempfile.mkdtemp(prefix='nuke_comfyui_batch_')
+    processes = []
+
+    for i in range(jobs):
+        chunk = workflows[i::jobs]
+        if not chunk:
+            continue
+
+        chunk_path = os.path.join(temp_dir, 'chunk_{}.json'.format(i))
+        result_path = os.path.join(temp_dir, 'result_{}.json'.format(i))
+
+        with open(chunk_path, 'w') as f:
+            json.dump(chunk, f)
+
+        command = [executable, '-t', launcher, '--worker',
+                   chunk_path, output_dir, result_path]
+
+        processes.append((subprocess.Popen(command), chunk, result_path))
+
+    results = {}
+
+    for process, chunk, result_path in processes:
+        process.wait()
+
+        try:
+            with open(result_path) as f:
+                results.update(json.load(f))
+        except (IOError, OSError, ValueError):
+            for workflow_path in chunk:
+                results[workflow_path] = {
+                    'output': None, 'missing': [], 'time': None,
+                    'error': 'Worker exited with code {}'.format(process.returncode)}
+
+    return results
+
+
+def get_report(results):
+    missing_nodes = {}
+
+    for workflow_path, result in results.items():
+        for node_type in result['missing']:
+            missing_nodes.setdefault(node_type, []).append(
+                os.path.basename(workflow_path))
+
+    return {
+        'converted': len([r for r in results.values() if r['output']]),
+        'failed': len([r for r in results.values() if r['error']]),
+        'missing_nodes': dict((k, sorted(v)) for k, v in sorted(missing_nodes.items())),
+        'workflows': results
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Converts ComfyUI workflows into Nuke scripts.')
+    parser.add_argument('workflows_dir', nargs='?')
+    parser.add_argument('output_dir', nargs='?')
+    parser.add_argument('-j', '--jobs', type=int, default=4,
+                        help='number of worker processes')
+    parser.add_argument('--report', help='missing nodes report, by default '
+                        '<output_dir>/missing_nodes.json')
+    parser.add_argument('--offline', action='store_true',
+                        help='use the cached object_info without connecting to ComfyUI')
+    parser.add_argument('--nuke', default=sys.executable,
+                        help='Nuke executable for the workers')
+    parser.add_argument('--worker', nargs=3, help=argparse.SUPPRESS)
+
+    args = parser.parse_args(argv)
+
+    if args.worker:
+        worker(*args.worker)
+        return 0
+
+    if not args.workflows_dir or not args.output_dir:
+        parser.print_usage()
+        return 1
+
+    if not args.offline:
+        object_info.fetch(quiet=True)
+
+    if not object_info.load_manifest():
+        print('No object_info cache, ComfyUI must be running the first time !')
+        return 1
+
+    workflows = get_workflows(args.workflows_dir)
+    if not workflows:
+        print('No workflows found in ' + args.workflows_dir)
+        return 1
+
+    if not os.path.isdir(args.output_dir):
+        os.makedirs(args.output_dir)
+
+    start = time()
+    warm_templates(workflows)
+
+    results = run_workers(workflows, args.output_dir,
+                          max(1, args.jobs), args.nuke)
+    report = get_report(results)
+    report['time'] = round(time() - start, 3)
+
+    report_path = args.report or os.path.join(
+        args.output_dir, 'missing_nodes.json')
+
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=4)
+
+    print('\n{} converted, {} failed, {} missing node types in {:.1f}s'.format(
+        report['converted'], report['failed'], len(report['missing_nodes']), report['time']))
+    print('Report: ' + report_path)
+
+    return 0 if not report['failed'] else 2
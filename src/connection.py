@@ -6,6 +6,7 @@
 import sys
 import json
 import traceback
+from time import time
 from collections import OrderedDict
 
 if sys.version_info.major == 2:
@@ -15,6 +16,8 @@ else:
 
 import nuke  # type: ignore
 from ..env import NUKE_COMFYUI_IP, NUKE_COMFYUI_PORT
+from . import metrics
+from . import recorder
 
 
 def _should_suppress_messages():
@@ -26,46 +29,88 @@ def _should_suppress_messages():
         return False
 
 
-def GET(relative_url):
+def get_server():
+    return '{}:{}'.format(NUKE_COMFYUI_IP(), NUKE_COMFYUI_PORT())
+
+
+def record_request(relative_url, start, error=False):
+    # Only the endpoint, ids and query strings would make too many series
+    endpoint = relative_url.split('?')[0].split('/')[0]
+    server = get_server()
+
+    metrics.inc('nuke_comfyui_requests_total', server=server, endpoint=endpoint)
+    metrics.observe('nuke_comfyui_request_seconds', time() - start, server=server, endpoint=endpoint)
+
+    if error:
+        metrics.inc('nuke_comfyui_request_errors_total', server=server, endpoint=endpoint)
+
+
+def GET(relative_url, quiet=False):
     url = 'http://{}:{}/{}'.format(NUKE_COMFYUI_IP(), NUKE_COMFYUI_PORT(), relative_url)
+    start = time()
 
     try:
         response = urllib2.urlopen(url)
         data = response.read().decode()
+        record_request(relative_url, start)
+        recorder.http('GET', relative_url, None, response.getcode(), data)
         return json.loads(data, object_pairs_hook=OrderedDict)
     except:
-        if not _should_suppress_messages():
+        record_request(relative_url, start, error=True)
+        recorder.http('GET', relative_url, None, None, '')
+
+        if not quiet and not _should_suppress_messages():
             nuke.message(
                 'Error connecting to server {} on port {} !'.format(NUKE_COMFYUI_IP(), NUKE_COMFYUI_PORT()))
 
 
 def check_connection():
+    start = time()
+
     try:
         response = urllib2.urlopen('http://{}:{}'.format(NUKE_COMFYUI_IP(), NUKE_COMFYUI_PORT()))
         if response.getcode() == 200:
+            record_request('', start)
+            recorder.http('GET', '', None, 200, '')
             return True
     except:
+        record_request('', start, error=True)
+
         if not _should_suppress_messages():
             nuke.message(
                 'Error connecting to server {} on port {} !'.format(NUKE_COMFYUI_IP(), NUKE_COMFYUI_PORT()))
         return
 
 
-def POST(relative_url, data={}):
+def POST(relative_url, data={}, result=None, quiet=False):
+    """Returns the error as text, 'quiet' doesn't touch the UI, for the calls
+    made out of the main thread."""
+
     url = 'http://{}:{}/{}'.format(NUKE_COMFYUI_IP(), NUKE_COMFYUI_PORT(), relative_url)
     headers = {'Content-Type': 'application/json'}
     bytes_data = json.dumps(data).encode('utf-8')
     request = urllib2.Request(url, bytes_data, headers)
+    start = time()
 
     try:
-        urllib2.urlopen(request)
+        response = urllib2.urlopen(request)
+        response_data = response.read().decode()
+
+        if not result is None and response_data:
+            result.update(json.loads(response_data))
+
+        record_request(relative_url, start)
+        recorder.http('POST', relative_url, data, response.getcode(), response_data)
         return ''
 
     except urllib2.HTTPError as e:
+        record_request(relative_url, start, error=True)
+
         try:
             error_str = str(e.read()).strip()
+            recorder.http('POST', relative_url, data, e.code, error_str)
             if not error_str:
-                if not _should_suppress_messages():
+                if not quiet and not _should_suppress_messages():
                     nuke.message(traceback.format_exc())
                 return 'ERROR: HTTPError'
 
@@ -74,7 +119,9 @@ def POST(relative_url, data={}):
             node_errors = error['node_errors'] if error['node_errors'] else {}
 
             for name, value in node_errors.items():
-                nuke.toNode(name).setSelected(True)
+                error_node = None if quiet else nuke.toNode(name)
+                if error_node:
+                    error_node.setSelected(True)
                 errors += '{}:\n'.format(name)
 
                 for err in value['errors']:
@@ -85,13 +132,24 @@ def POST(relative_url, data={}):
 
             return errors
         except:
+            if quiet:
+                return traceback.format_exc()
+
             if not _should_suppress_messages():
                 nuke.message(traceback.format_exc())
 
     except Exception as e:
+        record_request(relative_url, start, error=True)
         return 'Error: {}'.format(e)
 
 
+def queue_prompt(body):
+    result = {}
+    error = POST('prompt', body, result)
+
+    return result.get('prompt_id', body.get('prompt_id')), error
+
+
 def convert_to_utf8(data):
     if isinstance(data, dict):
         return {convert_to_utf8(key): convert_to_utf8(value) for key, value in data.items()}
@@ -111,3 +169,33 @@ def interrupt():
     if error:
         if not _should_suppress_messages():
             nuke.message(error)
+
+
+def cancel_prompts(prompt_ids):
+    """Remove the prompts from the server queue and interrupt the execution
+    only if one of them is the prompt currently running, so that the jobs of
+    other users are never touched. It is called from the dispatcher thread,
+    so the errors are returned and never shown here."""
+
+    queue = GET('queue', quiet=True)
+    if not queue:
+        return 'Error: Could not get the queue from the server'
+
+    running = [item[1] for item in queue.get('queue_running', [])]
+    pending = [item[1] for item in queue.get('queue_pending', [])]
+
+    to_delete = [i for i in prompt_ids if i in pending]
+    to_interrupt = [i for i in prompt_ids if i in running]
+
+    if to_delete:
+        error = POST('queue', {'delete': to_delete}, quiet=True)
+        if error:
+            return error
+
+    for prompt_id in to_interrupt:
+        # Servers that support it only interrupt if the prompt_id matches
+        error = POST('interrupt', {'prompt_id': prompt_id}, quiet=True)
+        if error:
+            return error
+
+    return ''
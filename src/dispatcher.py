@@ -0,0 +1,485 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+import os
+import json
+import uuid
+import threading
+import traceback
+from time import time
+from collections import OrderedDict
+
+import nuke  # type: ignore
+import websocket
+
+from ..env import NUKE_COMFYUI_IP, NUKE_COMFYUI_PORT
+from . import profiling
+from . import recorder
+from . import preview
+
+client_id = str(uuid.uuid4())[:32].replace('-', '')
+
+# Maximum number of times per second that progress is pushed to the main thread
+UPDATE_RATE = float(os.environ.get('NUKE_COMFYUI_UPDATE_RATE', 10))
+CONNECT_TIMEOUT = 5
+
+# Seconds that the websocket stays open without jobs, so that consecutive
+# submits (iterations, animation frames) don't connect again
+IDLE_TIMEOUT = float(os.environ.get('NUKE_COMFYUI_IDLE_TIMEOUT', 30))
+
+# Maximum number of background prompts in the server queue, shared by all
+# users, so that batch work never takes the whole queue.
+BACKGROUND_LIMIT = int(os.environ.get('NUKE_COMFYUI_BACKGROUND_LIMIT', 4))
+LANE_CHECK_INTERVAL = 1.0
+
+jobs = {}
+_lock = threading.Lock()
+_wakeup = threading.Event()
+_connected = threading.Event()
+_connect_attempted = threading.Event()
+_thread = [None]
+
+# Messages for prompts that are not registered yet, this happens when the
+# server answers before the POST of the prompt returns.
+_pending = OrderedDict()
+_max_pending = 16
+
+# Prompt being executed on the server, old servers don't send the prompt_id
+# in the 'progress' messages.
+_current_prompt = [None]
+_last_lane_check = [0]
+
+
+class Job(object):
+    def __init__(self, task, on_executed=None, on_error=None, on_finished=None, cancel_tasks=None, timing=None, profile=None,
+                 preview=None, on_preview=None):
+        self.prompt_id = str(uuid.uuid4())
+        self.task = task
+        self.cancel_tasks = cancel_tasks or []
+
+        self.on_executed = on_executed
+        self.on_error = on_error
+        self.on_finished = on_finished
+        self.on_preview = on_preview
+
+        self.progress = None
+        self.message = None
+        self.executed = OrderedDict()
+        self.errors = []
+        self.finished = False
+        self.cancelled = False
+        self.started = False
+        self.waiting = False
+        self.released = False
+        self.post = None
+        self.created = time()
+        self.timing = timing
+        self.profile = profile
+        self.preview = preview
+        self.lock = threading.Lock()
+
+    def is_cancelled(self):
+        for task in [self.task] + self.cancel_tasks:
+            if task and task[0].isCancelled():
+                return True
+
+        return False
+
+    def feed(self, type_data, data):
+        if self.profile:
+            with profiling.section('websocket', self.profile):
+                self._feed(type_data, data)
+        else:
+            self._feed(type_data, data)
+
+    def _feed(self, type_data, data):
+        if self.timing:
+            self.timing.feed(type_data, data)
+
+        with self.lock:
+            if type_data == 'executed':
+                node = data.get('node')
+                self.executed.pop(node, None)
+                self.executed[node] = data
+
+            elif type_data == 'progress':
+                self.progress = int(data['value'] * 100 / data['max'])
+
+            elif type_data == 'executing':
+                node = data.get('node')
+
+                if node:
+                    self.message = 'Inference: ' + node
+                else:
+                    self.finished = True
+
+            elif type_data == 'execution_error':
+                execution_message = data.get('exception_message', '')
+                error = 'Error: {}\n\n'.format(data.get('node_type'))
+                error += execution_message + '\n\n'
+
+                for tb in data.get('traceback', []):
+                    error += tb + '\n'
+
+                self.errors.append(
+                    (data.get('node_id'), execution_message, error))
+                self.finished = True
+
+            elif type_data in ['execution_success', 'execution_interrupted']:
+                self.finished = True
+
+    def fail(self, error):
+        with self.lock:
+            self.errors.append((None, None, error))
+            self.finished = True
+
+    def take(self):
+        with self.lock:
+            update = {
+                'progress': self.progress,
+                'message': self.message,
+                'executed': list(self.executed.items()),
+                'errors': self.errors,
+                'finished': self.finished or self.cancelled,
+                'cancelled': self.cancelled,
+                'preview': None
+            }
+
+            self.progress = None
+            self.message = None
+            self.executed = OrderedDict()
+            self.errors = []
+
+        # The preview is written here, out of the main thread
+        if self.preview and not update['finished']:
+            update['preview'] = self.preview.take()
+
+        if update['progress'] is None and not update['message'] and \
+                not update['executed'] and not update['errors'] and \
+                not update['finished'] and not update['preview']:
+            return
+
+        return update
+
+
+def register(job):
+    """Add the job to the dispatcher and wait for the websocket to be
+    connected, so that no message of the prompt is lost."""
+
+    with _lock:
+        jobs[job.prompt_id] = job
+        connected = _connected.is_set()
+
+        if not connected:
+            _connect_attempted.clear()
+
+    if not _thread[0] or not _thread[0].is_alive():
+        _thread[0] = threading.Thread(target=_run)
+        _thread[0].daemon = True
+        _thread[0].start()
+
+    if not connected:
+        _wakeup.set()
+        _connect_attempted.wait(CONNECT_TIMEOUT * 2)
+
+        if not _connected.is_set():
+            unregister(job)
+            return False
+
+    job.started = True
+    return True
+
+
+def lane_extra_data(lane):
+    return {'nuke_comfyui': {'lane': lane}}
+
+
+def background_slots():
+    from .connection import GET
+
+    queue = GET('queue', quiet=True)
+    if not queue:
+        return 1
+
+    count = 0
+    for item in queue.get('queue_running', []) + queue.get('queue_pending', []):
+        extra_data = item[3] if len(item) > 3 else {}
+        nuke_comfyui = extra_data.get('nuke_comfyui', {})
+
+        if nuke_comfyui.get('lane') == 'background':
+            count += 1
+
+    # Released jobs whose prompt is not in the server queue yet
+    with _lock:
+        count += len([j for j in jobs.values() if j.released])
+
+    return BACKGROUND_LIMIT - count
+
+
+def hold(job, post):
+    """Keep the job waiting until there is room in the background lane,
+    then 'post' is called in the main thread."""
+
+    job.post = post
+    job.waiting = True
+
+
+def _release_waiting(active_jobs):
+    waiting = [j for j in active_jobs if j.waiting and not j.cancelled]
+    if not waiting:
+        return
+
+    if time() - _last_lane_check[0] < LANE_CHECK_INTERVAL:
+        return
+
+    _last_lane_check[0] = time()
+    slots = background_slots()
+
+    for job in sorted(waiting, key=lambda j: j.created)[:max(slots, 0)]:
+        job.waiting = False
+        job.released = True
+        nuke.executeInMainThread(job.post)
+
+
+def unregister(job):
+    with _lock:
+        jobs.pop(job.prompt_id, None)
+
+
+def set_prompt_id(job, prompt_id):
+    if not prompt_id or prompt_id == job.prompt_id:
+        return
+
+    with _lock:
+        jobs.pop(job.prompt_id, None)
+        job.prompt_id = prompt_id
+        jobs[prompt_id] = job
+        messages = _pending.pop(prompt_id, [])
+
+    for type_data, data in messages:
+        job.feed(type_data, data)
+
+
+def handle_message(opcode, message):
+    recorder.message(opcode, message)
+
+    if opcode == websocket.ABNF.OPCODE_BINARY:
+        handle_preview(message)
+        return
+
+    try:
+        message = json.loads(message)
+    except:
+        return
+
+    data = message.get('data', None)
+    type_data = message.get('type', None)
+
+    if not data:
+        return
+
+    prompt_id = data.get('prompt_id')
+
+    if type_data == 'execution_start':
+        _current_prompt[0] = prompt_id
+
+    if not prompt_id:
+        prompt_id = _current_prompt[0]
+
+    if not prompt_id:
+        return
+
+    with _lock:
+        job = jobs.get(prompt_id)
+
+        if not job:
+            _pending.setdefault(prompt_id, []).append((type_data, data))
+            while len(_pending) > _max_pending:
+                _pending.popitem(last=False)
+            return
+
+    job.feed(type_data, data)
+
+
+def handle_preview(message):
+    frame = preview.parse(message)
+    if not frame:
+        return
+
+    prompt_id, ext, image = frame
+
+    with _lock:
+        job = jobs.get(prompt_id or _current_prompt[0])
+
+    if job and job.preview:
+        job.preview.put(ext, image)
+
+
+def _connect():
+    url = 'ws://{}:{}/ws?clientId={}'.format(
+        NUKE_COMFYUI_IP(), NUKE_COMFYUI_PORT(), client_id)
+
+    ws = websocket.create_connection(url, timeout=CONNECT_TIMEOUT)
+    ws.settimeout(1.0 / UPDATE_RATE)
+    return ws
+
+
+def _close(ws):
+    if not ws:
+        return
+
+    try:
+        ws.close()
+    except:
+        pass
+
+
+def _run():
+    ws = None
+    last_flush = 0
+    idle_since = None
+
+    while True:
+        with _lock:
+            active = bool(jobs)
+
+            if active:
+                idle_since = None
+            elif idle_since is None:
+                idle_since = time()
+
+            close = not active and (not ws or time() - idle_since > IDLE_TIMEOUT)
+            if close:
+                _connected.clear()
+
+        if close:
+            _close(ws)
+            ws = None
+            _wakeup.wait()
+            _wakeup.clear()
+            continue
+
+        if not ws:
+            try:
+                ws = _connect()
+                _connected.set()
+            except Exception as e:
+                # Jobs still waiting in register() are rejected there and
+                # the error is shown by the caller.
+                with _lock:
+                    for job in list(jobs.values()):
+                        if not job.started:
+                            jobs.pop(job.prompt_id)
+
+                _fail_all('error: ' + str(e))
+                _flush()
+
+            _connect_attempted.set()
+            continue
+
+        try:
+            opcode, message = ws.recv_data()
+            handle_message(opcode, message)
+
+        except websocket.WebSocketTimeoutException:
+            pass
+
+        except Exception as e:
+            _connected.clear()
+            _close(ws)
+            ws = None
+
+            if not 'connected' in str(e):
+                _fail_all('error: ' + str(e))
+                _flush()
+                continue
+
+        if time() - last_flush < 1.0 / UPDATE_RATE:
+            continue
+
+        last_flush = time()
+        _flush()
+
+
+def _fail_all(error):
+    with _lock:
+        active_jobs = list(jobs.values())
+
+    for job in active_jobs:
+        job.fail(error)
+
+
+def _flush():
+    with _lock:
+        active_jobs = list(jobs.values())
+
+    updates = []
+
+    for job in active_jobs:
+        if not job.finished and job.is_cancelled():
+            job.cancelled = True
+            cancel(job)
+
+        update = job.take()
+        if not update:
+            continue
+
+        if update['finished']:
+            unregister(job)
+
+        updates.append((job, update))
+
+    _release_waiting(active_jobs)
+
+    if updates:
+        nuke.executeInMainThread(_apply, args=(updates,))
+
+
+def cancel(job):
+    from .connection import cancel_prompts, _should_suppress_messages
+
+    error = cancel_prompts([job.prompt_id])
+    if error and not _should_suppress_messages():
+        nuke.executeInMainThread(nuke.message, args=(error,))
+
+
+def _apply(updates):
+    for job, update in updates:
+        try:
+            with profiling.section('main', job.profile):
+                _apply_job(job, update)
+        except:
+            nuke.message(traceback.format_exc())
+
+
+def _apply_job(job, update):
+    task = job.task
+
+    if task:
+        if update['progress'] is not None:
+            task[0].setProgress(update['progress'])
+
+        if update['message']:
+            task[0].setMessage(update['message'])
+
+    if update['preview'] and job.on_preview:
+        job.on_preview(update['preview'])
+
+    if job.on_executed:
+        for node, data in update['executed']:
+            job.on_executed(node, data)
+
+    if job.on_error:
+        for node_id, message, error in update['errors']:
+            job.on_error(node_id, message, error)
+
+    if not update['finished']:
+        return
+
+    if task:
+        del task[0]
+
+    if job.on_finished:
+        job.on_finished(update['cancelled'])
@@ -0,0 +1,238 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+import os
+import json
+import socket
+import atexit
+import threading
+from time import time, sleep
+
+# Counters and histograms are written to this file every METRICS_INTERVAL
+# seconds, as a Prometheus textfile if it ends with '.prom' or as JSON lines.
+# '{host}' and '{pid}' are replaced, so that many sessions can share a path.
+METRICS_FILE = os.environ.get('NUKE_COMFYUI_METRICS_FILE', '')
+METRICS_INTERVAL = float(os.environ.get('NUKE_COMFYUI_METRICS_INTERVAL', 60))
+
+# The JSONL file is moved to '<file>.1' when it is bigger than this
+METRICS_MAX_SIZE = int(os.environ.get('NUKE_COMFYUI_METRICS_MAX_SIZE', 10 * 1024 * 1024))
+
+BUCKETS = (0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+HELP = {
+    'nuke_comfyui_jobs_submitted_total': 'Prompts queued on the server',
+    'nuke_comfyui_jobs_finished_total': 'Prompts finished by status',
+    'nuke_comfyui_jobs_failed_total': 'Submits and executions that failed',
+    'nuke_comfyui_cache_hits_total': 'Results and inputs reused without sending or exporting',
+    'nuke_comfyui_cache_misses_total': 'Results and inputs that had to be sent or exported',
+    'nuke_comfyui_exported_bytes_total': 'Bytes written to the ComfyUI input directory',
+    'nuke_comfyui_requests_total': 'HTTP requests to the server',
+    'nuke_comfyui_request_errors_total': 'HTTP requests that failed',
+    'nuke_comfyui_request_seconds': 'Time of the HTTP requests',
+    'nuke_comfyui_export_seconds': 'Time rendering the inputs',
+    'nuke_comfyui_queue_wait_seconds': 'Time in the server queue',
+    'nuke_comfyui_inference_seconds': 'Time executing on the server',
+    'nuke_comfyui_job_seconds': 'Time from the submit until the result is read',
+}
+
+_counters = {}
+_histograms = {}
+_lock = threading.Lock()
+_thread = [None]
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, value=1, **labels):
+    key = _key(name, labels)
+
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+    _start()
+
+
+def observe(name, value, buckets=BUCKETS, **labels):
+    key = _key(name, labels)
+
+    with _lock:
+        histogram = _histograms.get(key)
+        if not histogram:
+            histogram = _histograms[key] = [buckets, [0] * len(buckets), 0, 0.0]
+
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                histogram[1][i] += 1
+                break
+
+        histogram[2] += 1
+        histogram[3] += value
+
+    _start()
+
+
+def snapshot():
+    """Copy of the counters and histograms, the histogram buckets are
+    cumulative as in Prometheus."""
+
+    with _lock:
+        counters = dict(_counters)
+        histograms = dict((key, (h[0], list(h[1]), h[2], h[3]))
+                          for key, h in _histograms.items())
+
+    result = {'counters': [], 'histograms': []}
+
+    for (name, labels), value in sorted(counters.items()):
+        result['counters'].append({'name': name, 'labels': dict(labels), 'value': value})
+
+    for (name, labels), (buckets, counts, count, total) in sorted(histograms.items()):
+        cumulative = []
+        accumulated = 0
+
+        for bound, bucket_count in zip(buckets, counts):
+            accumulated += bucket_count
+            cumulative.append([bound, accumulated])
+
+        result['histograms'].append({
+            'name': name, 'labels': dict(labels), 'buckets': cumulative,
+            'count': count, 'sum': total})
+
+    return result
+
+
+def job_finished(record, server, workflow):
+    """Metrics of a finished submit from its timing record."""
+
+    durations = record.durations()
+    labels = {'server': server, 'workflow': workflow}
+
+    inc('nuke_comfyui_jobs_finished_total', status=record.status, **labels)
+
+    if not record.status == 'success':
+        return
+
+    if durations['export_inputs']:
+        observe('nuke_comfyui_export_seconds', durations['export_inputs'], **labels)
+
+    observe('nuke_comfyui_queue_wait_seconds', durations['queue'], **labels)
+    observe('nuke_comfyui_inference_seconds', durations['execution'], **labels)
+    observe('nuke_comfyui_job_seconds', record.total(), **labels)
+
+
+def _format_labels(labels, extra=None):
+    labels = dict(labels, **(extra or {}))
+    if not labels:
+        return ''
+
+    return '{' + ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                          for k, v in sorted(labels.items())) + '}'
+
+
+def to_prometheus(data):
+    lines = []
+    described = set()
+
+    def describe(name, metric_type):
+        if name in described:
+            return
+
+        described.add(name)
+        lines.append('# HELP {} {}'.format(name, HELP.get(name, name)))
+        lines.append('# TYPE {} {}'.format(name, metric_type))
+
+    for counter in data['counters']:
+        describe(counter['name'], 'counter')
+        lines.append('{}{} {}'.format(
+            counter['name'], _format_labels(counter['labels']), counter['value']))
+
+    for histogram in data['histograms']:
+        name = histogram['name']
+        describe(name, 'histogram')
+
+        for bound, count in histogram['buckets']:
+            lines.append('{}_bucket{} {}'.format(
+                name, _format_labels(histogram['labels'], {'le': bound}), count))
+
+        lines.append('{}_bucket{} {}'.format(
+            name, _format_labels(histogram['labels'], {'le': '+Inf'}), histogram['count']))
+        lines.append('{}_sum{} {}'.format(name, _format_labels(histogram['labels']), histogram['sum']))
+        lines.append('{}_count{} {}'.format(name, _format_labels(histogram['labels']), histogram['count']))
+
+    return '\n'.join(lines) + '\n'
+
+
+def get_path():
+    if not METRICS_FILE:
+        return ''
+
+    return METRICS_FILE.replace('{host}', socket.gethostname()).replace('{pid}', str(os.getpid()))
+
+
+def write(path=None):
+    path = path or get_path()
+    if not path:
+        return
+
+    data = snapshot()
+
+    dirname = os.path.dirname(path)
+    if dirname and not os.path.isdir(dirname):
+        os.makedirs(dirname)
+
+    if path.endswith('.prom'):
+        # The textfile collector must never read a half written file
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(to_prometheus(data))
+
+        if hasattr(os, 'replace'):
+            os.replace(temp_path, path)
+        else:
+            if os.path.isfile(path):
+                os.remove(path)
+            os.rename(temp_path, path)
+        return
+
+    if os.path.isfile(path) and os.path.getsize(path) > METRICS_MAX_SIZE:
+        if os.path.isfile(path + '.1'):
+            os.remove(path + '.1')
+        os.rename(path, path + '.1')
+
+    data['time'] = time()
+    data['host'] = socket.gethostname()
+    data['pid'] = os.getpid()
+
+    with open(path, 'a') as f:
+        f.write(json.dumps(data) + '\n')
+
+
+def _start():
+    if not METRICS_FILE or _thread[0]:
+        return
+
+    with _lock:
+        if _thread[0]:
+            return
+
+        _thread[0] = threading.Thread(target=_run)
+        _thread[0].daemon = True
+        _thread[0].start()
+
+    atexit.register(_write_quiet)
+
+
+def _run():
+    while True:
+        sleep(METRICS_INTERVAL)
+        _write_quiet()
+
+
+def _write_quiet():
+    try:
+        write()
+    except:
+        pass
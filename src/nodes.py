@@ -8,15 +8,33 @@ import os
 import shutil
 import random
 import traceback
+from collections import OrderedDict
 import nuke  # type: ignore
 
 from ..nuke_util.nuke_util import get_connected_nodes, get_project_name
 from .common import image_inputs, mask_inputs, get_comfyui_dir_remote, get_comfyui_dir_local
+from . import object_info
+from . import timing
+from . import metrics
 
 states = {}
 
+# Inputs of ComfyUI nodes that limit how many frames of an image batch are used
+frame_count_inputs = ['length', 'num_frames', 'frame_count',
+                      'video_length', 'image_load_cap']
+frame_skip_inputs = ['skip_first_images', 'skip_first_frames', 'batch_index']
+frame_nth_inputs = ['select_every_nth']
 
-def extract_data(frame, run_node):
+# Nodes that change the order of frames, all frames are exported for them
+frame_reorder_nodes = ['ReverseImageBatch', 'VHS_ReverseImages']
+
+# Nodes known to take only those frames of their image inputs, in any other
+# node the same inputs can mean something else and all frames are exported
+frame_range_nodes = ['ImageFromBatch', 'VHS_SelectEveryNthImage', 'WanImageToVideo',
+                     'WanVaceToVideo', 'WanFunControlToVideo']
+
+
+def extract_data(frame, run_node, window=None):
     output_node = get_input(run_node, 0)
 
     if not output_node:
@@ -35,7 +53,8 @@ def extract_data(frame, run_node):
     from .read_media import get_tonemap
     tonemap = get_tonemap(run_node)
 
-    comfyui_nodes = [n.name() for n, _ in nodes]
+    consumers = get_consumers(nodes)
+    nodes_data = dict((n.name(), node_data) for n, node_data in nodes)
     data = {}
     input_node_changed = False
 
@@ -55,37 +74,267 @@ def extract_data(frame, run_node):
                     seed_knob.setValue(random_value)
                     node_data['inputs'][seed_knob.name()[:-1]] = random_value
 
-        for key in image_inputs + mask_inputs:
-            input_key = node_data['inputs'].get(key)
-            if not input_key or not type(input_key) == list:
+        data[n.name()] = node_data
+
+    for input_node, alpha in get_input_nodes(nodes).values():
+        input_window = window
+        if not input_window and frame < 0:
+            input_window = get_consumed_window(
+                input_node, consumers, nodes_data)
+
+        load_image_data, changed_node, execution_canceled = create_load_images_and_save(
+            input_node, alpha, tonemap, frame, input_window)
+
+        if execution_canceled:
+            return {}, None
+
+        input_node_changed = True if changed_node else input_node_changed
+        data[input_node.name()] = load_image_data
+
+    return data, input_node_changed
+
+
+def get_image_inputs(n, node_data, comfyui_nodes):
+    """Nuke nodes connected to the IMAGE and MASK inputs of the ComfyUI node
+    'n', as (input_node, mask)."""
+
+    for key, input_key in list(node_data['inputs'].items()):
+        if not input_key or not type(input_key) == list:
+            continue
+
+        input_node = nuke.toNode(n.parent().fullName(
+        ) + '.' + input_key[0]) if input_key else None
+
+        if not input_node:
+            continue
+
+        input_type = get_input_type(node_data['class_type'], key, node=n)
+
+        if not input_type in ['IMAGE', 'MASK']:
+            continue
+
+        if is_switch_any(input_node):
+            continue
+
+        if not input_node.name() in comfyui_nodes:
+            yield input_node, input_type == 'MASK'
+
+
+def get_input_nodes(nodes):
+    """Nuke nodes connected to the ComfyUI nodes, once each, as
+    {name: (input_node, alpha)}. Every node is exported once to a single
+    LoadEXR, the image is its output 0 and the alpha its output 1 (MASK), so
+    the alpha is exported if any of the inputs is a mask."""
+
+    comfyui_nodes = [n.name() for n, _ in nodes]
+    input_nodes = OrderedDict()
+
+    for n, node_data in nodes:
+        for input_node, mask in get_image_inputs(n, node_data, comfyui_nodes):
+            _, alpha = input_nodes.get(input_node.name(), (None, False))
+            input_nodes[input_node.name()] = (input_node, alpha or mask)
+
+    return input_nodes
+
+
+def export_inputs(run_node):
+    """Exports the inputs of the Run that changed since their last export,
+    as a single frame submit does, so that the next submit finds them ready.
+    Returns the number of exported inputs."""
+
+    if not get_input(run_node, 0):
+        return 0
+
+    nodes = get_connected_comfyui_nodes(run_node)
+
+    from .read_media import get_tonemap
+    tonemap = get_tonemap(run_node)
+
+    consumers = get_consumers(nodes)
+    nodes_data = dict((n.name(), node_data) for n, node_data in nodes)
+    exported = 0
+
+    for input_node, alpha in get_input_nodes(nodes).values():
+        window = get_consumed_window(input_node, consumers, nodes_data)
+
+        _, changed_node, execution_canceled = create_load_images_and_save(
+            input_node, alpha, tonemap, window=window, quiet=True)
+
+        if execution_canceled:
+            return exported
+
+        exported += 1 if changed_node else 0
+
+    return exported
+
+
+def get_input_type(class_type, input_name, declared=None, node=None):
+    """Type of an input from the cached schema, then from the type declared
+    in the data knob of the node and last from the name of the input. The
+    data knob of 'node' is only read if the schema doesn't have the input."""
+
+    input_type = object_info.get_input_type(class_type, input_name)
+    if input_type:
+        return input_type
+
+    if declared is None and node:
+        declared = get_declared_types(get_node_data(node)).get(input_name)
+
+    if declared:
+        return declared[0].upper()
+
+    if input_name in image_inputs:
+        return 'IMAGE'
+    elif input_name in mask_inputs:
+        return 'MASK'
+
+
+def get_declared_types(node_data):
+    return dict((i['name'], i.get('outputs')) for i in node_data.get('inputs', []))
+
+
+def get_consumers(nodes):
+    consumers = {}
+
+    for n, node_data in nodes:
+        for value in node_data['inputs'].values():
+            if not type(value) == list:
                 continue
 
-            input_node = nuke.toNode(n.parent().fullName(
-            ) + '.' + input_key[0]) if input_key else None
+            consumers.setdefault(value[0], []).append(n.name())
+
+    return consumers
+
 
-            if not input_node:
+def get_frame_range(node_data):
+    """(count, skip, nth) of the frames that a node takes from its batch, a
+    count of 0 uses the frames of the nodes after it, None if any frame can
+    be used."""
+
+    if node_data['class_type'] in frame_reorder_nodes:
+        return
+
+    inputs = node_data['inputs']
+    frame_inputs = frame_count_inputs + frame_skip_inputs + frame_nth_inputs
+
+    if not node_data['class_type'] in frame_range_nodes:
+        # Unknown node, it passes the batch on unless it has inputs that
+        # might select frames
+        if any(key in inputs for key in frame_inputs):
+            return
+
+        return 0, 0, 1
+
+    def get_value(names, default):
+        for key in names:
+            value = inputs.get(key)
+            if value is None:
                 continue
 
-            if is_switch_any(input_node):
+            # Linked to another node, the value is not known until execution
+            if not type(value) in [int, float]:
+                return
+
+            return int(value)
+
+        return default
+
+    frame_range = (get_value(frame_count_inputs, 0),
+                   get_value(frame_skip_inputs, 0),
+                   get_value(frame_nth_inputs, 1))
+
+    if None in frame_range:
+        return
+
+    return frame_range
+
+
+def get_consumed_frames(name, consumers, nodes_data, results=None):
+    """Number of frames from the start of the batch that the node 'name' and
+    the nodes after it use, None if all frames can be used. The nodes after
+    it are walked with a stack so that long chains don't reach the recursion
+    limit, 'results' keeps the count of the nodes already walked."""
+
+    if results is None:
+        results = {}
+
+    stack = [name]
+    visiting = set()
+
+    while stack:
+        current = stack[-1]
+
+        if current in results:
+            stack.pop()
+            continue
+
+        node_data = nodes_data.get(current)
+        frame_range = get_frame_range(node_data) if node_data else None
+
+        if not frame_range:
+            results[current] = None
+            stack.pop()
+            continue
+
+        count, skip, nth = frame_range
+
+        if not count:
+            outputs = consumers.get(current, [])
+            pending = [o for o in outputs if not o in results]
+
+            if pending:
+                # A node after it is still being walked, the workflow has a cycle
+                if current in visiting or any(o in visiting for o in pending):
+                    results[current] = None
+                    visiting.discard(current)
+                    stack.pop()
+                    continue
+
+                visiting.add(current)
+                stack.extend(pending)
                 continue
 
-            if not input_node.name() in comfyui_nodes:
-                load_image_data, changed_node, execution_canceled = create_load_images_and_save(
-                    input_node, key in mask_inputs, tonemap, frame)
+            output_counts = [results[o] for o in outputs]
+            count = 0 if not outputs or None in output_counts else max(output_counts)
 
-                if execution_canceled:
-                    return {}, None
+        visiting.discard(current)
+        stack.pop()
 
-                input_node_changed = True if changed_node else input_node_changed
-                data[input_node.name()] = load_image_data
+        results[current] = skip + (count - 1) * max(nth, 1) + 1 if count >= 1 else None
 
-        data[n.name()] = node_data
+    return results[name]
 
-    return data, input_node_changed
 
+def get_consumed_window(input_node, consumers, nodes_data):
+    """Frame window of 'input_node' used by the workflow, in the same format
+    as the animation windows, None if all frames are used."""
+
+    count = 0
+    results = {}
+
+    for name in consumers.get(input_node.name(), []):
+        consumed = get_consumed_frames(name, consumers, nodes_data, results)
+        if consumed is None:
+            return
+
+        count = max(count, consumed)
+
+    first_frame = input_node.firstFrame()
+    last_frame = first_frame + count - 1
+
+    if not count or last_frame >= input_node.lastFrame():
+        return
 
-def create_load_images_and_save(node, alpha, tonemap, frame=-1):
-    animation = frame >= 0
+    return first_frame, last_frame, first_frame, last_frame
+
+
+def create_load_images_and_save(node, alpha, tonemap, frame=-1, window=None, quiet=False):
+    animation = frame >= 0 and not window
+
+    if window:
+        first_frame, last_frame, window_start, window_end = window
+    else:
+        first_frame, last_frame = node.firstFrame(), node.lastFrame()
 
     global states
     connected_nodes = get_connected_nodes(node, continue_at_up_level=True)
@@ -93,13 +342,19 @@ def create_load_images_and_save(node, alpha, tonemap, frame=-1):
     state = ''
 
     for n in connected_nodes:
-        n.setSelected(False)
-        node_state = ''.join(k.toScript() for k in n.knobs().values())
+        # The selection doesn't change the image
+        node_state = ''.join(k.toScript() for name, k in n.knobs().items()
+                             if not name == 'selected')
         node_state = node_state.replace(
             str(n.xpos()), '').replace(str(n.ypos()), '')
         state += node_state
 
-    current_state = {'connected_nodes': state.strip(), 'state_id': 0}
+    current_state = {
+        'connected_nodes': state.strip(),
+        'frame_range': [first_frame, last_frame],
+        'alpha': alpha,
+        'state_id': 0
+    }
     prev_state = states.get(node.fullName(), {})
 
     load_image_data = {
@@ -113,9 +368,19 @@ def create_load_images_and_save(node, alpha, tonemap, frame=-1):
         'class_type': 'LoadEXR'
     }
 
+    if window:
+        # The whole range is exported once and each window selects its frames
+        load_image_data['inputs']['skip_first_images'] = window_start - first_frame
+        load_image_data['inputs']['image_load_cap'] = window_end - window_start + 1
+
     input_dir = '{}/input'.format(get_comfyui_dir_local())
 
-    if current_state.get('connected_nodes') == prev_state.get('connected_nodes') and not animation:
+    # An export with alpha also serves the inputs without it
+    same_state = current_state.get('connected_nodes') == prev_state.get('connected_nodes') and \
+        current_state.get('frame_range') == prev_state.get('frame_range') and \
+        (prev_state.get('alpha') or not alpha)
+
+    if same_state and not animation:
         dirname = prev_state.get('dirname', 'none')
         sequence_dir = os.path.join(input_dir, dirname)
 
@@ -124,8 +389,11 @@ def create_load_images_and_save(node, alpha, tonemap, frame=-1):
             if files:
                 load_image_data['inputs']['filepath'] = sequence_dir
                 load_image_data['inputs']['id'] = prev_state.get('state_id', 0)
+                metrics.inc('nuke_comfyui_cache_hits_total', kind='input')
                 return load_image_data, False, False
 
+    metrics.inc('nuke_comfyui_cache_misses_total', kind='input')
+
     dirname = '{}_{}'.format(get_project_name(), node.fullName())
     sequence_dir = os.path.join(input_dir, dirname)
     sequence_dir = sequence_dir.replace('\\', '/')
@@ -136,30 +404,42 @@ def create_load_images_and_save(node, alpha, tonemap, frame=-1):
     os.mkdir(sequence_dir)
     filename = '{}/{}_#####.exr'.format(sequence_dir, dirname)
 
-    [n.setSelected(False) for n in nuke.selectedNodes()]
-
-    write = nuke.createNode('Write', inpanel=False)
-    write.knob('hide_input').setValue(True)
-    write.setName(node.name() + '_write')
-    write.setXYpos(node.xpos(), node.ypos())
-    write.setSelected(False)
-    write.setInput(0, node)
-    write.knob('file').setValue(filename)
-    write.knob('raw').setValue(True)
-    write.knob('file_type').setValue('exr')
-    write.knob('channels').setValue('rgba' if alpha else 'rgb')
+    if quiet:
+        # Exported while the artist works, without undo entries and without
+        # touching the selection
+        nuke.Undo.disable()
+    else:
+        [n.setSelected(False) for n in nuke.selectedNodes()]
 
     try:
-        if animation:
-            nuke.execute(write, frame, frame)
-        else:
-            nuke.execute(write, node.firstFrame(), node.lastFrame())
-    except:
-        nuke.delete(write)
-        nuke.message(traceback.format_exc())
-        return {}, False, True
+        write = nuke.nodes.Write() if quiet else nuke.createNode('Write', inpanel=False)
+        write.knob('hide_input').setValue(True)
+        write.setName(node.name() + '_write')
+        write.setXYpos(node.xpos(), node.ypos())
+        write.setSelected(False)
+        write.setInput(0, node)
+        write.knob('file').setValue(filename)
+        write.knob('raw').setValue(True)
+        write.knob('file_type').setValue('exr')
+        write.knob('channels').setValue('rgba' if alpha else 'rgb')
+
+        try:
+            with timing.span('export_inputs'):
+                if animation:
+                    nuke.execute(write, frame, frame)
+                else:
+                    nuke.execute(write, first_frame, last_frame)
+        except:
+            nuke.delete(write)
+            if not quiet:
+                nuke.message(traceback.format_exc())
+            return {}, False, True
 
-    nuke.delete(write)
+        nuke.delete(write)
+    finally:
+        if quiet:
+            nuke.Undo.enable()
+    metrics.inc('nuke_comfyui_exported_bytes_total', get_dir_size(sequence_dir))
 
     state_id = random.randrange(1, 9999)
     current_state['dirname'] = dirname
@@ -173,6 +453,17 @@ def create_load_images_and_save(node, alpha, tonemap, frame=-1):
     return load_image_data, True, False
 
 
+def get_dir_size(dirname):
+    size = 0
+
+    for filename in os.listdir(dirname):
+        filepath = os.path.join(dirname, filename)
+        if os.path.isfile(filepath):
+            size += os.path.getsize(filepath)
+
+    return size
+
+
 def get_connected_comfyui_nodes(root_node, visited=None, ignore_nodes=[], frame=-1):
     if visited is None:
         visited = set()
@@ -187,17 +478,27 @@ def get_connected_comfyui_nodes(root_node, visited=None, ignore_nodes=[], frame=
 
     sd_nodes = []
 
-    for i in range(root_node.maxInputs()):
-        inode = root_node.input(i)
+    # Depth first with an explicit stack of (node, next input), in the same
+    # order as a recursive walk, deep graphs would exceed the recursion limit
+    stack = [(root_node, 0)]
+
+    while stack:
+        node, i = stack.pop()
+
+        if i >= node.maxInputs():
+            continue
+
+        stack.append((node, i + 1))
+        inode = node.input(i)
 
         if not inode:
             continue
 
-        if not i == 0 and is_disabled(root_node):
+        if not i == 0 and is_disabled(node):
             continue
 
-        if is_switch_any(root_node):
-            if not root_node.knob('which').value() == i:
+        if is_switch_any(node):
+            if not node.knob('which').value() == i:
                 continue
 
         if inode in visited:
@@ -213,8 +514,7 @@ def get_connected_comfyui_nodes(root_node, visited=None, ignore_nodes=[], frame=
         if not is_disabled(inode) and node_data:
             sd_nodes.append((inode, node_data))
 
-        sd_nodes.extend(get_connected_comfyui_nodes(
-            inode, visited, ignore_nodes, frame))
+        stack.append((inode, 0))
 
     return sd_nodes
 
@@ -276,9 +576,12 @@ def extract_node_data(node, frame=-1):
         output_index = 0
 
         if not get_node_data(inode):
-            if input_name in image_inputs:
+            input_type = get_input_type(
+                data['class_type'], input_name, data['inputs'][i].get('outputs'))
+
+            if input_type == 'IMAGE':
                 output_index = 0
-            elif input_name in mask_inputs:
+            elif input_type == 'MASK':
                 output_index = 1
         else:
             output_index = get_output_index(node, data, i)
@@ -331,7 +634,10 @@ def check_node(node):
         inode_data = get_node_data(inode)
 
         if not inode_data:
-            if input_name in image_inputs + mask_inputs:
+            input_type = get_input_type(
+                node_data['class_type'], input_name, index_data.get('outputs'))
+
+            if input_type in ['IMAGE', 'MASK']:
                 if inode.bbox().w() < 10 or inode.bbox().h() < 10:
                     nuke.message(
                         '{}: input "{}" without image !'.format(node.name(), input_name))
@@ -0,0 +1,413 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+import os
+import sys
+import json
+import hashlib
+from collections import OrderedDict
+
+from .connection import GET, convert_to_utf8
+from ..env import NUKE_COMFYUI_NUKE_USER
+
+if sys.version_info.major > 2:
+    from sys import intern
+
+MANIFEST_VERSION = 3
+
+# Enumerations with at least this number of items are stored only once
+ENUM_MIN_SIZE = 4
+MAX_SCHEMAS = 256
+
+_manifest = [None]
+_enums = [None]
+_schemas = OrderedDict()
+_input_types = {}
+
+
+class NodeRecord(object):
+    """Menu and search data of a node, the schema stays on disk until the
+    node is created."""
+
+    __slots__ = ('name', 'display_name', 'category', 'menu', 'input_types',
+                 'output_types', 'hash', 'offset', 'size')
+
+    def __init__(self, name, entry):
+        self.name = _intern(name)
+        self.display_name = _intern(entry['display_name'])
+        self.category = _intern(entry['category'])
+        self.menu = _intern(entry['menu'])
+        self.input_types = tuple(_intern(t) for t in entry['input_types'])
+        self.output_types = tuple(_intern(t) for t in entry['output_types'])
+        self.hash = str(entry['hash'])
+        self.offset = entry['offset']
+        self.size = entry['size']
+
+
+def _intern(string):
+    return intern(convert_to_utf8(string))
+
+
+def get_cache_dir():
+    return os.environ.get('NUKE_COMFYUI_CACHE_DIR', os.path.join(
+        NUKE_COMFYUI_NUKE_USER(), 'nuke_comfyui_cache'))
+
+
+def get_manifest_path():
+    return os.path.join(get_cache_dir(), 'manifest.json')
+
+
+def normalize_string(string):
+    string = ''.join(char if ord(
+        char) < 128 else '' for char in string)
+    return string.replace(' /', '/').replace('/ ', '/').strip()
+
+
+def schema_hash(value):
+    data = json.dumps(value, sort_keys=True).encode('utf-8')
+    return hashlib.md5(data).hexdigest()
+
+
+def normalize(info):
+    nodes = OrderedDict()
+
+    for _, value in info.items():
+        category = normalize_string(value['category'])
+        if not category:
+            category = 'Uncategorized'
+
+        value['category'] = category
+
+        input_data = value.get('input', {})
+        if not value.get('input_order'):
+            value['input_order'] = {
+                'required': list(input_data.get('required', {})),
+                'optional': list(input_data.get('optional', {}))
+            }
+
+        nodes[value['name']] = value
+
+    return nodes
+
+
+def get_input_types(value):
+    input_data = value.get('input', {})
+    types = []
+
+    for section in ['required', 'optional']:
+        for _input in input_data.get(section, {}).values():
+            if not _input or type(_input[0]) == list:
+                continue
+
+            if not _input[0] in types:
+                types.append(_input[0])
+
+    return types
+
+
+def get_output_types(value):
+    types = []
+
+    for output in value.get('output', []):
+        if type(output) == list:
+            continue
+
+        if not output in types:
+            types.append(output)
+
+    return types
+
+
+def fetch(quiet=False):
+    """Download object_info from the server and update the local cache,
+    returns the normalized schemas and the changes compared to the previous
+    cache, or (None, None) if the server is not available."""
+
+    info = GET('object_info', quiet=quiet)
+    if not info:
+        return None, None
+
+    nodes = normalize(info)
+    changes = save(nodes)
+
+    return nodes, changes
+
+
+def diff(old_nodes, new_nodes):
+    changes = {'added': [], 'removed': [], 'changed': []}
+
+    for name, entry in new_nodes.items():
+        old_entry = old_nodes.get(name)
+
+        if not old_entry:
+            changes['added'].append((name, entry))
+
+        elif not old_entry.hash == entry.hash or \
+                not old_entry.menu == entry.menu:
+            changes['changed'].append((name, old_entry, entry))
+
+    for name, entry in old_nodes.items():
+        if not name in new_nodes:
+            changes['removed'].append((name, entry))
+
+    return changes
+
+
+def compact_schema(value, enums, enum_ids):
+    """Replaces the long enumerations of the inputs, eg: the list of all
+    checkpoints, by the id of a table shared by all nodes."""
+
+    def enum_ref(items):
+        if not type(items) == list or len(items) < ENUM_MIN_SIZE:
+            return items
+
+        key = json.dumps(items)
+        if not key in enum_ids:
+            enum_ids[key] = len(enums)
+            enums.append(items)
+
+        return {'__enum__': enum_ids[key]}
+
+    value = OrderedDict(value)
+    input_data = OrderedDict(value.get('input', {}))
+
+    for section in ['required', 'optional']:
+        inputs = OrderedDict()
+
+        for key, _input in input_data.get(section, {}).items():
+            _input = list(_input)
+
+            if _input:
+                _input[0] = enum_ref(_input[0])
+
+            if len(_input) > 1 and type(_input[1]) == dict and 'options' in _input[1]:
+                info = dict(_input[1])
+                info['options'] = enum_ref(info['options'])
+                _input[1] = info
+
+            inputs[key] = _input
+
+        if section in input_data:
+            input_data[section] = inputs
+
+    value['input'] = input_data
+    return value
+
+
+def save(nodes):
+    old_nodes = get_nodes()
+
+    cache_dir = get_cache_dir()
+    if not os.path.isdir(cache_dir):
+        os.makedirs(cache_dir)
+
+    manifest_nodes = {}
+    enums = []
+    enum_ids = {}
+    lines = []
+
+    for name, value in nodes.items():
+        line = json.dumps(compact_schema(value, enums, enum_ids)) + '\n'
+        lines.append(line.encode('utf-8'))
+
+        display_name = normalize_string(value['display_name'])
+
+        manifest_nodes[name] = {
+            'display_name': display_name,
+            'category': value['category'],
+            'menu': '{}/{}'.format(value['category'], display_name),
+            'input_types': get_input_types(value),
+            'output_types': get_output_types(value),
+            'hash': schema_hash(value)
+        }
+
+    # The first line holds the enumerations and then one schema per line
+    lines.insert(0, (json.dumps(enums) + '\n').encode('utf-8'))
+    offset = 0
+
+    for name, line in zip([None] + list(nodes), lines):
+        if name:
+            manifest_nodes[name]['offset'] = offset
+            manifest_nodes[name]['size'] = len(line)
+
+        offset += len(line)
+
+    content = b''.join(lines)
+    schemas_file = 'schemas_{}.jsonl'.format(
+        hashlib.md5(content).hexdigest()[:12])
+
+    with open(os.path.join(cache_dir, schemas_file), 'wb') as f:
+        f.write(content)
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'schemas_file': schemas_file,
+        'enums_size': len(lines[0]),
+        'nodes': manifest_nodes
+    }
+
+    manifest_path = get_manifest_path()
+    temp_path = manifest_path + '.tmp'
+
+    with open(temp_path, 'w') as f:
+        json.dump(manifest, f)
+
+    if os.path.isfile(manifest_path):
+        os.remove(manifest_path)
+    os.rename(temp_path, manifest_path)
+
+    # Old schemas are only removed once the new manifest points to the new file
+    for filename in os.listdir(cache_dir):
+        if filename.startswith('schemas_') and not filename == schemas_file:
+            try:
+                os.remove(os.path.join(cache_dir, filename))
+            except OSError:
+                pass
+
+    set_manifest(manifest)
+    changes = diff(old_nodes, get_nodes())
+
+    for name, _ in changes['removed']:
+        _schemas.pop(name, None)
+
+    for name, _, _ in changes['changed']:
+        _schemas.pop(name, None)
+
+    return changes
+
+
+def set_manifest(manifest):
+    manifest['nodes'] = dict((_intern(name), NodeRecord(name, entry))
+                             for name, entry in manifest['nodes'].items())
+
+    _manifest[0] = manifest
+    _enums[0] = None
+    _input_types.clear()
+
+
+def load_manifest():
+    if _manifest[0]:
+        return _manifest[0]
+
+    manifest_path = get_manifest_path()
+    if not os.path.isfile(manifest_path):
+        return
+
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except ValueError:
+        return
+
+    if not manifest.get('version') == MANIFEST_VERSION:
+        return
+
+    set_manifest(manifest)
+    return manifest
+
+
+def get_nodes():
+    manifest = load_manifest()
+    if not manifest:
+        return {}
+
+    return manifest['nodes']
+
+
+def read_schemas_file(manifest, offset, size):
+    schemas_path = os.path.join(get_cache_dir(), manifest['schemas_file'])
+    if not os.path.isfile(schemas_path):
+        return
+
+    with open(schemas_path, 'rb') as f:
+        f.seek(offset)
+        line = f.read(size)
+
+    return convert_to_utf8(json.loads(line.decode('utf-8')))
+
+
+def get_enums(manifest):
+    """Enumerations shared by all the schemas, as tuples so that no schema
+    can change them for the others."""
+
+    if _enums[0] is None:
+        enums = read_schemas_file(manifest, 0, manifest['enums_size']) or []
+        _enums[0] = [tuple(items) for items in enums]
+
+    return _enums[0]
+
+
+def expand_schema(schema, enums):
+    def enum_list(value):
+        if type(value) == dict and '__enum__' in value:
+            return enums[value['__enum__']]
+        return value
+
+    for section in ['required', 'optional']:
+        for _input in schema.get('input', {}).get(section, {}).values():
+            if not _input:
+                continue
+
+            _input[0] = enum_list(_input[0])
+
+            if len(_input) > 1 and type(_input[1]) == dict and 'options' in _input[1]:
+                _input[1]['options'] = enum_list(_input[1]['options'])
+
+    return schema
+
+
+def get_schema(name):
+    """Reads the schema of a single node from the cache, schemas are only
+    loaded when a node is created and their enumerations are shared tuples.
+    The schema is kept in the cache, it must not be modified."""
+
+    schema = _schemas.pop(name, None)
+    if schema:
+        # Most recently used last, the first one is evicted
+        _schemas[name] = schema
+        return schema
+
+    manifest = load_manifest()
+    if not manifest:
+        return
+
+    entry = manifest['nodes'].get(name)
+    if not entry:
+        return
+
+    schema = read_schemas_file(manifest, entry.offset, entry.size)
+    if not schema:
+        return
+
+    schema = expand_schema(schema, get_enums(manifest))
+
+    _schemas[name] = schema
+    while len(_schemas) > MAX_SCHEMAS:
+        _schemas.popitem(last=False)
+
+    return schema
+
+
+def get_input_type(class_type, input_name):
+    """Type declared in the schema for an input of a node, eg: IMAGE, MASK,
+    LATENT, COMBO for enumerations, None if the node or input is unknown."""
+
+    types = _input_types.get(class_type)
+
+    if types is None:
+        types = {}
+        schema = get_schema(class_type) or {}
+
+        for section in ['required', 'optional']:
+            for name, _input in schema.get('input', {}).get(section, {}).items():
+                if not _input:
+                    continue
+
+                _type = _input[0]
+                types[name] = 'COMBO' if type(_type) in [list, tuple] else _type.upper()
+
+        _input_types[class_type] = types
+
+    return types.get(input_name)
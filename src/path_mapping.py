@@ -0,0 +1,246 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+import os
+import re
+import sys
+
+import nuke  # type: ignore
+
+from . import object_info
+from ..env import NUKE_COMFYUI_DIR_LOCAL, NUKE_COMFYUI_DIR_REMOTE
+
+if sys.version_info.major > 2:
+    string_types = (str,)
+else:
+    string_types = (basestring,)  # type: ignore
+
+# Extra mount rules 'local=remote' separated by ';', the rules of the
+# current platform are used before the generic ones, eg:
+# NUKE_COMFYUI_PATH_MAP_WINDOWS='Z:/models=/mnt/models;//nas/plates=/plates'
+PATH_MAP_ENV = 'NUKE_COMFYUI_PATH_MAP'
+
+_mapper = [None, None]
+_skipped_inputs = {}
+
+
+def get_platform():
+    if sys.platform.startswith('win'):
+        return 'WINDOWS'
+    elif sys.platform == 'darwin':
+        return 'MACOS'
+    return 'LINUX'
+
+
+def normalize(path):
+    return path.replace('\\', '/').rstrip('/')
+
+
+def parse_rules(value):
+    rules = []
+
+    for rule in (value or '').split(';'):
+        if not '=' in rule:
+            continue
+
+        local_dir, remote_dir = rule.split('=', 1)
+        rules.append((local_dir.strip(), remote_dir.strip()))
+
+    return rules
+
+
+def get_config():
+    platform_env = '{}_{}'.format(PATH_MAP_ENV, get_platform())
+
+    return (os.environ.get(platform_env), os.environ.get(PATH_MAP_ENV),
+            NUKE_COMFYUI_DIR_LOCAL(), NUKE_COMFYUI_DIR_REMOTE())
+
+
+def get_rules(config):
+    """The ComfyUI directory is mapped even if it is not mounted yet, so that
+    the rule works as soon as the mount appears."""
+
+    platform_rules, rules, local_dir, remote_dir = config
+    rules = parse_rules(platform_rules) + parse_rules(rules)
+
+    if local_dir and not os.path.isdir(os.path.join(local_dir, 'comfy')):
+        nuke.warning('ComfyUI: directory "{}" does not exist'.format(local_dir))
+
+    rules.append((local_dir, remote_dir))
+
+    return [(normalize(l), normalize(r)) for l, r in rules if l and r]
+
+
+class PathMapper(object):
+    """Rewrites the paths between the local and the remote mounts with one
+    precompiled pattern per direction, the strings that do not contain any
+    mount are returned as they are."""
+
+    def __init__(self, rules):
+        self.rules = rules
+        # With repeated mounts the first rule wins
+        self.remote = self.compile(dict(reversed(rules)))
+        self.local = self.compile(dict((r, l) for l, r in reversed(rules)))
+
+    def compile(self, mapping):
+        if not mapping:
+            return None, mapping
+
+        # Longest prefixes first, so that nested mounts take precedence
+        prefixes = sorted(mapping, key=len, reverse=True)
+        pattern = '|'.join(r'[\\/]'.join(re.escape(part) for part in prefix.split('/'))
+                           for prefix in prefixes)
+
+        return re.compile('(?:{})(?=[\\\\/]|$)'.format(pattern)), mapping
+
+    def replace(self, string, direction):
+        regex, mapping = direction
+        if not regex or not regex.search(string):
+            return string
+
+        return regex.sub(lambda m: mapping[normalize(m.group(0))],
+                         string.replace('\\', '/'))
+
+    def to_remote(self, string):
+        return self.replace(string, self.remote)
+
+    def to_local(self, string):
+        new_string = self.replace(string, self.local)
+        if new_string is string:
+            return string
+
+        return os.path.normpath(new_string)
+
+    def map(self, value, convert):
+        """Copy on write, only the containers with changed strings are
+        copied and the rest of the data is shared with the original."""
+
+        if isinstance(value, string_types):
+            return convert(value)
+
+        if isinstance(value, dict):
+            new_value = None
+
+            for key, item in value.items():
+                new_item = self.map(item, convert)
+
+                if not new_item is item:
+                    if new_value is None:
+                        new_value = dict(value)
+                    new_value[key] = new_item
+
+            return value if new_value is None else new_value
+
+        if isinstance(value, list):
+            new_value = None
+
+            for i, item in enumerate(value):
+                new_item = self.map(item, convert)
+
+                if not new_item is item:
+                    if new_value is None:
+                        new_value = list(value)
+                    new_value[i] = new_item
+
+            return value if new_value is None else new_value
+
+        return value
+
+    def prompt_to_remote(self, prompt):
+        if not self.rules:
+            return prompt
+
+        new_prompt = None
+
+        for node_id, node in prompt.items():
+            inputs = node.get('inputs') if isinstance(node, dict) else None
+
+            if not isinstance(inputs, dict):
+                new_node = self.map(node, self.to_remote)
+            else:
+                skipped_inputs = get_skipped_inputs(node.get('class_type'))
+                new_inputs = None
+
+                for name, value in inputs.items():
+                    if name in skipped_inputs:
+                        continue
+
+                    new_value = self.map(value, self.to_remote)
+                    if new_value is value:
+                        continue
+
+                    if new_inputs is None:
+                        new_inputs = dict(inputs)
+                    new_inputs[name] = new_value
+
+                new_node = node
+                if not new_inputs is None:
+                    new_node = dict(node)
+                    new_node['inputs'] = new_inputs
+
+            if not new_node is node:
+                if new_prompt is None:
+                    new_prompt = dict(prompt)
+                new_prompt[node_id] = new_node
+
+        return prompt if new_prompt is None else new_prompt
+
+    def message_to_local(self, data):
+        if not self.rules:
+            return data
+
+        output = data.get('output')
+        new_output = self.map(output, self.to_local)
+
+        if new_output is output:
+            return data
+
+        data = dict(data)
+        data['output'] = new_output
+        return data
+
+
+def get_skipped_inputs(class_type):
+    """Names of the inputs that can not carry a path according to the
+    schema (numbers, booleans, enumerations), the rest are rewritten."""
+
+    entry = object_info.get_nodes().get(class_type)
+    if not entry:
+        return ()
+
+    key = (class_type, entry.hash)
+    if key in _skipped_inputs:
+        return _skipped_inputs[key]
+
+    schema = object_info.get_schema(class_type)
+    if not schema:
+        return ()
+
+    skipped = set()
+    for section in ['required', 'optional']:
+        for name, _input in schema.get('input', {}).get(section, {}).items():
+            if _input and not _input[0] in ['STRING', '*']:
+                skipped.add(name)
+
+    _skipped_inputs[key] = skipped
+    return skipped
+
+
+def get_mapper():
+    config = get_config()
+
+    if not _mapper[0] or not _mapper[1] == config:
+        _mapper[0] = PathMapper(get_rules(config))
+        _mapper[1] = config
+
+    return _mapper[0]
+
+
+def to_remote(data):
+    return get_mapper().prompt_to_remote(data)
+
+
+def to_local(data):
+    return get_mapper().message_to_local(data)
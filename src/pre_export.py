@@ -0,0 +1,103 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+import os
+import threading
+
+import nuke  # type: ignore
+
+# Seconds without changes in the script before the inputs are exported
+PRE_EXPORT_DELAY = float(os.environ.get('NUKE_COMFYUI_PRE_EXPORT_DELAY', 2))
+
+# Knobs that don't change the images
+IGNORED_KNOBS = ['xpos', 'ypos', 'selected', 'name', 'label', 'note_font', 'note_font_size',
+                 'note_font_color', 'tile_color', 'gl_color', 'hide_input', 'postage_stamp',
+                 'bookmark', 'showPanel', 'hidePanel', 'timing']
+
+# Run nodes with 'Pre-export Inputs' enabled, None until the script is scanned
+_enabled = [None]
+_timer = [None]
+_exporting = [False]
+_lock = threading.Lock()
+
+
+def get_enabled_runs():
+    return [n.fullName() for n in nuke.allNodes(recurseGroups=True)
+            if n.knob('pre_export') and n.knob('pre_export').value()]
+
+
+def reset():
+    _enabled[0] = None
+
+
+def schedule():
+    """Restarts the wait, the export runs once the changes settle."""
+
+    with _lock:
+        if _timer[0]:
+            _timer[0].cancel()
+
+        _timer[0] = threading.Timer(
+            PRE_EXPORT_DELAY, nuke.executeInMainThread, args=(export,))
+        _timer[0].daemon = True
+        _timer[0].start()
+
+
+def knob_changed():
+    """Callback of any knob of the script, also called when the inputs of a
+    node are connected ('inputChange')."""
+
+    if _exporting[0]:
+        return
+
+    knob = nuke.thisKnob()
+    if not knob or knob.name() in IGNORED_KNOBS:
+        return
+
+    if knob.name() == 'pre_export':
+        reset()
+        if not knob.value():
+            return
+
+    elif _enabled[0] == []:
+        return
+
+    schedule()
+
+
+def node_created():
+    if not _exporting[0] and nuke.thisNode().knob('pre_export'):
+        reset()
+
+
+def export():
+    """Exports the inputs that changed of every enabled Run, in the main
+    thread."""
+
+    from .nodes import export_inputs
+
+    # A submit exports its own inputs, and the proxy resolution is never sent
+    if getattr(nuke, 'comfyui_running', False) or nuke.root().knob('proxy').value():
+        return
+
+    if _enabled[0] is None:
+        _enabled[0] = get_enabled_runs()
+
+    _exporting[0] = True
+
+    try:
+        for name in _enabled[0]:
+            run_node = nuke.toNode(name)
+            if not run_node:
+                continue
+
+            run_node.parent().begin()
+
+            try:
+                export_inputs(run_node)
+            finally:
+                run_node.parent().end()
+    finally:
+        _exporting[0] = False
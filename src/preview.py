@@ -0,0 +1,133 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+import os
+import re
+import json
+import struct
+import threading
+from time import time
+
+import nuke  # type: ignore
+
+from .object_info import get_cache_dir
+from .read_media import get_gizmo_group, set_correct_colorspace
+
+# Maximum number of sampler previews per second shown in Nuke, 0 disables them
+PREVIEW_RATE = float(os.environ.get('NUKE_COMFYUI_PREVIEW_RATE', 2))
+
+# Binary events of ComfyUI, the previews with metadata carry the prompt_id
+PREVIEW_IMAGE = 1
+PREVIEW_IMAGE_WITH_METADATA = 4
+
+IMAGE_TYPES = {1: 'jpg', 2: 'png'}
+MIME_TYPES = {'image/jpeg': 'jpg', 'image/png': 'png'}
+
+
+def parse(message):
+    """Returns (prompt_id, extension, image) of a binary preview frame, the
+    image is a view of the message, without copying it."""
+
+    if len(message) < 8:
+        return
+
+    event, = struct.unpack('>I', message[:4])
+    view = memoryview(message)
+
+    if event == PREVIEW_IMAGE:
+        image_type, = struct.unpack('>I', message[4:8])
+        ext = IMAGE_TYPES.get(image_type)
+        return (None, ext, view[8:]) if ext else None
+
+    if event == PREVIEW_IMAGE_WITH_METADATA:
+        size, = struct.unpack('>I', message[4:8])
+
+        try:
+            metadata = json.loads(bytes(view[8:8 + size]).decode('utf-8'))
+        except ValueError:
+            return
+
+        ext = MIME_TYPES.get(metadata.get('image_type'))
+        return (metadata.get('prompt_id'), ext, view[8 + size:]) if ext else None
+
+
+class Buffer(object):
+    """Last preview of a job, received in the websocket thread. It is written
+    in turn to two files of the Run, so that Nuke never reads the file being
+    written, the Read is reloaded after each change."""
+
+    def __init__(self, name):
+        self.name = re.sub(r'[^\w]', '_', name)
+        self.data = bytearray()
+        self.ext = None
+        self.new = False
+        self.index = 0
+        self.last_write = 0
+        self.lock = threading.Lock()
+
+    def put(self, ext, image):
+        with self.lock:
+            self.data[:] = image
+            self.ext = ext
+            self.new = True
+
+    def take(self):
+        """Writes the last preview if the rate allows it, returns its path."""
+
+        if not self.new or time() - self.last_write < 1.0 / PREVIEW_RATE:
+            return
+
+        dirname = os.path.join(get_cache_dir(), 'previews')
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname)
+
+        with self.lock:
+            self.index = 1 - self.index
+            filename = os.path.join(dirname, '{}_{}.{}'.format(self.name, self.index, self.ext))
+
+            with open(filename, 'wb') as f:
+                f.write(self.data)
+
+            self.new = False
+            self.last_write = time()
+
+        return filename.replace('\\', '/')
+
+
+def create(run_node):
+    if PREVIEW_RATE <= 0:
+        return
+
+    return Buffer(run_node.fullName())
+
+
+def show(run_node, filename):
+    """Loads the preview in a Read next to the result of the Run."""
+
+    main_node = get_gizmo_group(run_node)
+    if not main_node:
+        main_node = run_node
+
+    main_node.parent().begin()
+
+    try:
+        name = '{}Preview'.format(main_node.name())
+        read = nuke.toNode(name)
+
+        if not read:
+            read = nuke.createNode('Read', inpanel=False)
+            read.setName(name)
+            read.setXYpos(main_node.xpos() + 110, main_node.ypos() + 35)
+            read.knob('tile_color').setValue(
+                main_node.knob('tile_color').value())
+
+        read.knob('file').setValue(filename)
+        set_correct_colorspace(read)
+
+        # The same two files are written again, Nuke would show its cached frame
+        if read.knob('reload'):
+            read.knob('reload').execute()
+    finally:
+        main_node.parent().end()
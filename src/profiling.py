@@ -0,0 +1,237 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+import os
+import re
+import copy
+import pstats
+import cProfile
+import tempfile
+import threading
+from time import strftime
+from contextlib import contextmanager
+
+try:
+    from StringIO import StringIO  # type: ignore
+except ImportError:
+    from io import StringIO
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+import nuke  # type: ignore
+
+# Profiles every submit, as the 'Profile' knob of the Run
+PROFILE = not os.environ.get('NUKE_COMFYUI_PROFILE', '') in ['', '0']
+PROFILE_TOP = int(os.environ.get('NUKE_COMFYUI_PROFILE_TOP', 30))
+TRACEMALLOC_FRAMES = 10
+
+plugin_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_local = threading.local()
+
+# Sessions using tracemalloc, it is stopped when the last one is written
+_tracing = [0]
+
+
+class Session(object):
+    """Profiles of a single submit, one per thread where it runs: the main
+    thread (preparation and callbacks) and the websocket thread."""
+
+    def __init__(self, run_node):
+        self.run_node = run_node
+        self.prompt_id = ''
+        self.profiles = {}
+        self.tracemalloc = False
+        self.lock = threading.Lock()
+
+        if tracemalloc and (_tracing[0] or not tracemalloc.is_tracing()):
+            if not _tracing[0]:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+
+            _tracing[0] += 1
+            self.tracemalloc = True
+
+    def get_profile(self, name):
+        with self.lock:
+            if not name in self.profiles:
+                self.profiles[name] = cProfile.Profile()
+
+            return self.profiles[name]
+
+
+def release(session):
+    """Stops tracemalloc if it is the last session using it, a session that is
+    never written must be released."""
+
+    if not session.tracemalloc:
+        return
+
+    session.tracemalloc = False
+
+    _tracing[0] -= 1
+    if not _tracing[0]:
+        tracemalloc.stop()
+
+
+def is_enabled(run_node):
+    profile_knob = run_node.knob('profile')
+    return PROFILE or bool(profile_knob and profile_knob.value())
+
+
+def start(run_node):
+    if not is_enabled(run_node):
+        return
+
+    return Session(run_node.fullName())
+
+
+@contextmanager
+def section(name, session):
+    """Profiles the block in the profile 'name' of the session. The profile
+    of an outer section is paused, eg: the next iteration is submitted from
+    the callback of the previous one."""
+
+    if not session:
+        yield
+        return
+
+    outer = getattr(_local, 'profile', None)
+    profile = session.get_profile(name)
+
+    if profile is outer:
+        yield
+        return
+
+    if outer:
+        outer.disable()
+
+    try:
+        profile.enable()
+    except ValueError:
+        # Another profiler is active in this thread
+        if outer:
+            outer.enable()
+        yield
+        return
+
+    _local.profile = profile
+
+    try:
+        yield
+    finally:
+        profile.disable()
+        _local.profile = outer
+
+        if outer:
+            outer.enable()
+
+
+def get_output_prefix(session):
+    """Next to the script, or in the temporary directory if it is not saved."""
+
+    script = nuke.root().name()
+
+    if script and not script == 'Root':
+        dirname = os.path.dirname(script)
+        basename = os.path.splitext(os.path.basename(script))[0]
+    else:
+        dirname = tempfile.gettempdir()
+        basename = 'untitled'
+
+    run_node = re.sub(r'[^\w]', '_', session.run_node)
+    return os.path.join(dirname, '{}_comfyui_profile_{}_{}_{}'.format(
+        basename, run_node, strftime('%Y%m%d_%H%M%S'), session.prompt_id[:8]))
+
+
+def get_stats_report(session):
+    lines = []
+
+    for name, profile in sorted(session.profiles.items()):
+        for sort in ['cumulative', 'tottime']:
+            stream = StringIO()
+            stats = pstats.Stats(profile, stream=stream)
+            stats.strip_dirs().sort_stats(sort).print_stats(PROFILE_TOP)
+
+            lines.append('=== {} thread, top {} by {} ==='.format(name, PROFILE_TOP, sort))
+            lines.append(stream.getvalue())
+
+    return lines
+
+
+def get_memory_report(snapshot, peak):
+    lines = ['=== Memory, peak {:.1f} MB ==='.format(peak / 1048576.0)]
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__),
+              tracemalloc.Filter(False, __file__),
+              tracemalloc.Filter(False, '<frozen importlib._bootstrap*>')]
+
+    lines.append('Still allocated by the plugin:')
+    plugin_snapshot = snapshot.filter_traces(
+        ignore + [tracemalloc.Filter(True, os.path.join(plugin_dir, '*'))])
+
+    for stat in plugin_snapshot.statistics('lineno')[:PROFILE_TOP]:
+        lines.append('  ' + str(stat))
+
+    # The copies of the prompt are the biggest allocations of a submit
+    lines.append('\nStill allocated by copy.deepcopy, by caller:')
+    copy_snapshot = snapshot.filter_traces(
+        ignore + [tracemalloc.Filter(True, copy.__file__, all_frames=False)])
+
+    callers = {}
+
+    for stat in copy_snapshot.statistics('traceback'):
+        # The frames go from the oldest to the most recent
+        frames = [frame for frame in stat.traceback
+                  if frame.filename.startswith(plugin_dir)]
+        frame = frames[-1] if frames else stat.traceback[-1]
+
+        size, count = callers.get((frame.filename, frame.lineno), (0, 0))
+        callers[(frame.filename, frame.lineno)] = size + stat.size, count + stat.count
+
+    for (filename, lineno), (size, count) in sorted(callers.items(), key=lambda c: -c[1][0])[:10]:
+        lines.append('  {:.1f} KiB in {} blocks from {}:{}'.format(
+            size / 1024.0, count, filename, lineno))
+
+    return lines
+
+
+def write(session):
+    """Saves all the profiles of the session in a single .prof file, that
+    can be opened with snakeviz or gprof2dot, and the top of the hot
+    functions and allocations in a .txt file, whose path is shown in the
+    'Timing' of the Run."""
+
+    prefix = get_output_prefix(session)
+    report = ['Profile of {} {}'.format(session.run_node, session.prompt_id), '']
+
+    if session.profiles:
+        profiles = [p for _, p in sorted(session.profiles.items())]
+        stats = pstats.Stats(profiles[0])
+
+        for profile in profiles[1:]:
+            stats.add(profile)
+
+        stats.dump_stats(prefix + '.prof')
+        report += get_stats_report(session)
+
+    if session.tracemalloc:
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        release(session)
+
+        report += get_memory_report(snapshot, peak)
+
+    with open(prefix + '.txt', 'w') as f:
+        f.write('\n'.join(report) + '\n')
+
+    # Below the timing of the run
+    run_node = nuke.toNode(session.run_node)
+    summary_knob = run_node.knob('timing') if run_node else None
+    if summary_knob:
+        summary_knob.setValue('{}\nprofile: {}.txt'.format(summary_knob.value(), prefix))
+
+    return prefix
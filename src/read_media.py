@@ -4,6 +4,7 @@
 # WEBSITE -------> https://vinavfx.com
 # -----------------------------------------------------------
 import os
+import re
 import random
 import nuke  # type: ignore
 
@@ -163,6 +164,73 @@ def create_read(run_node, filename):
     return read
 
 
+def stitch_windows(sequence, overlap, first_frame, last_frame):
+    """Stitch the outputs of the animation windows into a single sequence,
+    'sequence' is a list of (filename, start_frame), the frames shared by two
+    windows are crossfaded."""
+
+    first_filename = sequence[0][0]
+    sequence_output = os.path.join(os.path.dirname(first_filename), 'stitched')
+
+    if not os.path.isdir(sequence_output):
+        os.makedirs(sequence_output)
+
+    basename = os.path.basename(first_filename.split(' ')[0])
+    basename = re.sub(r'#+|%0\dd', '', os.path.splitext(basename)[0])
+    basename = basename.strip('_.') or 'stitched'
+    output = '{}/{}_####.exr'.format(sequence_output.replace('\\', '/'), basename)
+
+    temp_nodes = []
+
+    with nuke.root():
+        result = None
+
+        for filename, start in sequence:
+            read = nuke.nodes.Read()
+            read.knob('file').fromUserText(filename)
+            set_correct_colorspace(read)
+            read.knob('frame_mode').setValue('start at')
+            read.knob('frame').setValue(str(start))
+            read.knob('before').setValue('black')
+            read.knob('after').setValue('black')
+            temp_nodes.append(read)
+
+            if not result:
+                result = read
+                continue
+
+            dissolve = nuke.nodes.Dissolve()
+            dissolve.setInput(0, result)
+            dissolve.setInput(1, read)
+
+            which = dissolve.knob('which')
+            which.setAnimated()
+            which.setValueAt(0, start - 1)
+            which.setValueAt(1, start + overlap)
+
+            curve = which.animation(0)
+            curve.changeInterpolation(curve.keys(), nuke.LINEAR)
+
+            temp_nodes.append(dissolve)
+            result = dissolve
+
+        write = nuke.nodes.Write()
+        write.setInput(0, result)
+        write.knob('file').setValue(output)
+        write.knob('raw').setValue(True)
+        write.knob('file_type').setValue('exr')
+        write.knob('channels').setValue('rgba')
+        temp_nodes.append(write)
+
+        try:
+            nuke.execute(write, first_frame, last_frame)
+        finally:
+            for n in temp_nodes:
+                nuke.delete(n)
+
+    return '{} {}-{}'.format(output, first_frame, last_frame)
+
+
 def save_image_backup():
     run_node = nuke.thisNode()
 
@@ -0,0 +1,82 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+import os
+import json
+import base64
+import atexit
+import threading
+from time import time
+
+from ..env import NUKE_COMFYUI_IP, NUKE_COMFYUI_PORT
+
+# All the requests and websocket messages of the session are appended to this
+# JSONL file, to replay them later with benchmarks/replay.py
+RECORD_FILE = os.environ.get('NUKE_COMFYUI_RECORD_FILE', '')
+
+RECORDING_VERSION = 1
+OPCODE_BINARY = 0x2
+
+_file = [None]
+_start = [0]
+_lock = threading.Lock()
+
+
+def _write(event):
+    with _lock:
+        if not _file[0]:
+            _file[0] = open(RECORD_FILE, 'a')
+            _start[0] = time()
+            atexit.register(close)
+
+            _file[0].write(json.dumps({
+                'kind': 'session',
+                'version': RECORDING_VERSION,
+                'time': _start[0],
+                'server': '{}:{}'.format(NUKE_COMFYUI_IP(), NUKE_COMFYUI_PORT())
+            }) + '\n')
+
+        event['t'] = time() - _start[0]
+        _file[0].write(json.dumps(event) + '\n')
+
+        # Requests are rare, the messages are flushed with them or at exit
+        if event['kind'] == 'http':
+            _file[0].flush()
+
+
+def http(method, relative_url, body, status, response):
+    """'body' is the data sent as json and 'response' the text received."""
+
+    if not RECORD_FILE:
+        return
+
+    if type(response) == bytes:
+        response = response.decode('utf-8', 'replace')
+
+    _write({'kind': 'http', 'method': method, 'url': relative_url,
+            'body': body, 'status': status, 'response': response})
+
+
+def message(opcode, data):
+    if not RECORD_FILE:
+        return
+
+    # Binary frames are the previews of the samplers
+    if opcode == OPCODE_BINARY:
+        _write({'kind': 'ws', 'opcode': opcode,
+                'binary': base64.b64encode(data).decode('ascii')})
+        return
+
+    if type(data) == bytes:
+        data = data.decode('utf-8', 'replace')
+
+    _write({'kind': 'ws', 'opcode': opcode, 'data': data})
+
+
+def close():
+    with _lock:
+        if _file[0]:
+            _file[0].close()
+            _file[0] = None
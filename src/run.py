@@ -8,22 +8,23 @@ import os
 import shutil
 import sys
 import nuke  # type: ignore
-import uuid
 import traceback
-from time import sleep
-import websocket
-import json
-import threading
 import copy
+from time import time
 
 from ..nuke_util.nuke_util import set_tile_color
 from ..env import NUKE_COMFYUI_IP, NUKE_COMFYUI_PORT
-from .common import get_comfyui_dir_remote, get_comfyui_dir_local, replace_local_paths_with_remote, replace_remote_paths_with_local, update_images_and_mask_inputs
-from .connection import POST, interrupt, check_connection
-from .nodes import extract_data, get_connected_comfyui_nodes
-from .read_media import create_read, update_filename_prefix, exr_filepath_fixed, get_filename
+from .common import get_comfyui_dir_remote, get_comfyui_dir_local, replace_local_paths_with_remote, replace_remote_paths_with_local
+from .connection import queue_prompt, check_connection, get_server
+from . import dispatcher
+from . import timing
+from . import metrics
+from . import profiling
+from . import preview
+from .dispatcher import client_id
+from .nodes import extract_data, get_connected_comfyui_nodes, get_input, get_node_data
+from .read_media import create_read, update_filename_prefix, exr_filepath_fixed, get_filename, stitch_windows
 
-client_id = str(uuid.uuid4())[:32].replace('-', '')
 states = {}
 iteration_mode = False
 
@@ -285,6 +286,15 @@ def animation_submit():
         nuke.message('Incompatible field of "Frames"')
         return
 
+    window_size_knob = run_node.knob('window_size')
+    window_size = int(window_size_knob.value()) if window_size_knob else 0
+
+    if window_size > 1:
+        window_overlap = int(run_node.knob('window_overlap').value())
+        window_animation_submit(
+            run_node, first_frame, last_frame, window_size, window_overlap)
+        return
+
     animation_task = [nuke.ProgressTask('Sending Frames...')]
     sequence = []
 
@@ -312,12 +322,74 @@ def animation_submit():
     submit(animation=[first_frame, last_frame, each_frame, finished_inference, animation_task])
 
 
-def submit(run_node=None, animation=None, iterations=None, success_callback=None):
+def window_animation_submit(run_node, first_frame, last_frame, window_size, window_overlap):
+    """Send windows of 'window_size' frames per request for temporal models,
+    consecutive windows share 'window_overlap' frames that are crossfaded."""
+
+    window_overlap = max(0, min(window_overlap, window_size - 1))
+    windows_count = len(get_windows(
+        first_frame, last_frame, window_size, window_overlap))
+
+    animation_task = [nuke.ProgressTask('Sending Windows...')]
+    sequence = []
+
+    def each_window(frame, filename):
+        sequence.append((filename, frame))
+        progress = int(len(sequence) * 100 / windows_count)
+        animation_task[0].setProgress(progress)
+        animation_task[0].setMessage('Window: {}/{}'.format(
+            len(sequence), windows_count))
+
+    def finished_inference():
+        del animation_task[0]
+
+        if not all(filename for filename, _ in sequence):
+            nuke.message('Some windows have no output !')
+            return
+
+        filename = stitch_windows(
+            sequence, window_overlap, first_frame, last_frame)
+        create_read(run_node, filename)
+
+    window = (window_size, window_overlap, first_frame)
+    submit(run_node, animation=[first_frame, last_frame, each_window,
+                                finished_inference, animation_task, window])
+
+
+def get_windows(first_frame, last_frame, window_size, window_overlap):
+    step = max(1, window_size - window_overlap)
+    windows = []
+
+    start = first_frame
+    while True:
+        end = min(start + window_size - 1, last_frame)
+        windows.append((start, end))
+
+        if end >= last_frame:
+            break
+
+        start += step
+
+    return windows
+
+
+def submit(run_node=None, animation=None, iterations=None, success_callback=None, priority=None):
+    profile = profiling.start(run_node if run_node else nuke.thisNode())
+    job = None
+
+    try:
+        with profiling.section('main', profile):
+            job = _submit(run_node, animation, iterations, success_callback, priority, profile)
+    finally:
+        # Without a job the profile is never written
+        if profile and not job:
+            profiling.release(profile)
+
+
+def _submit(run_node=None, animation=None, iterations=None, success_callback=None, priority=None, profile=None):
     if not check_connection():
         return
 
-    update_images_and_mask_inputs()
-
     if nuke.comfyui_running:
         if not iteration_mode:
             nuke.message('Inference in execution !')
@@ -331,6 +403,7 @@ def submit(run_node=None, animation=None, iterations=None, success_callback=None
         return
 
     frame = animation[0] if animation else -1
+    window = get_animation_window(animation)
 
     # Handle iterations parameter
     if iterations:
@@ -341,14 +414,21 @@ def submit(run_node=None, animation=None, iterations=None, success_callback=None
     run_node = run_node if run_node else nuke.thisNode()
     exr_filepath_fixed(run_node)
 
-    data, input_node_changed = extract_data(frame, run_node)
+    record = timing.Record(run_node.fullName(), get_mode(animation, iterations))
+
+    with timing.span('extract_data', record):
+        data, input_node_changed = extract_data(frame, run_node, window)
 
     if not data:
         nuke.comfyui_running = False
         return
 
+    server = get_server()
+    workflow = get_workflow_name(run_node)
+
     global states
     if data == states.get(run_node.fullName(), {}) and not input_node_changed and not animation:
+        metrics.inc('nuke_comfyui_cache_hits_total', kind='result')
         nuke.comfyui_running = False
         read = create_read(run_node, get_filename(run_node))
 
@@ -356,121 +436,63 @@ def submit(run_node=None, animation=None, iterations=None, success_callback=None
             success_callback(read)
         return
 
+    metrics.inc('nuke_comfyui_cache_misses_total', kind='result')
     update_filename_prefix(run_node)
-    data, _ = extract_data(frame, run_node)
+
+    with timing.span('extract_data', record):
+        data, _ = extract_data(frame, run_node, window)
 
     state_data = copy.deepcopy(data)
     run_node.knob('comfyui_submit').setEnabled(False)
 
     # Convert local paths to remote paths for sending to ComfyUI
-    remote_data = replace_local_paths_with_remote(data)
-
-    body = {
-        'client_id': client_id,
-        'prompt': remote_data,
-        'extra_data': {}
-    }
+    with timing.span('remap_paths', record):
+        remote_data = replace_local_paths_with_remote(data)
 
-    url = "ws://{}:{}/ws?clientId={}".format(NUKE_COMFYUI_IP(), NUKE_COMFYUI_PORT(), client_id)
     task = [nuke.ProgressTask('ComfyUI Connection...')]
-
     execution_error = [False]
 
-    def on_message(_, message):
-        # Check if message is binary data. This e.g. happens when a live preview is send from ComfyUI.
-        try:
-            message = json.loads(message)
-        except:
-            # TODO: maybe show the preview image in Nuke?
-            return
-
-        data = message.get('data', None)
-        type_data = message.get('type', None)
+    def on_executed(node, data):
+        update_node(node, data, run_node)
 
-        if not data:
-            return
-
-        elif type_data == 'executed':
-            node = data.get('node')
-            nuke.executeInMainThread(
-                update_node, args=(node, data, run_node))
-
-        elif type_data == 'progress':
-            progress = int(data['value'] * 100 / data['max'])
-            if task:
-                task[0].setProgress(progress)
-
-        elif type_data == 'executing':
-            node = data.get('node')
-
-            if task:
-                if node:
-                    task[0].setMessage('Inference: ' + node)
-                else:
-                    del task[0]
+    def on_preview(filename):
+        preview.show(run_node, filename)
 
-        elif type_data == 'execution_error':
-            execution_message = data.get('exception_message')
-            error = 'Error: {}\n\n'.format(data.get('node_type'))
-            error += execution_message + '\n\n'
-
-            for tb in data.get('traceback'):
-                error += tb + '\n'
-
-            execution_error[0] = True
-
-            if task:
-                del task[0]
-
-            nuke.executeInMainThread(
-                error_node_style, args=(data.get('node_id'), True, execution_message))
-            if not iteration_mode:
-                nuke.executeInMainThread(nuke.message, args=(error))
-
-    def on_error(ws, error):
-        ws.close()
-        if task:
-            del task[0]
+    def finish(status):
+        timing.finish(record, status, run_node)
+        metrics.job_finished(record, server, workflow)
 
-        if 'connected' in str(error):
-            return
+        if profile:
+            # Once the callback that is being profiled returns
+            profile.prompt_id = record.prompt_id
+            nuke.executeInMainThread(profiling.write, args=(profile,))
 
+    def on_error(node_id, execution_message, error):
         execution_error[0] = True
-        if not iteration_mode:
-            nuke.executeInMainThread(nuke.message, args=('error: ' + str(error)))
-
-    def progress_task_loop():
-        cancelled = False
-        while task:
-            if task[0].isCancelled():
-                cancelled = True
-                break
+        metrics.inc('nuke_comfyui_jobs_failed_total', reason='execution', server=server, workflow=workflow)
 
-            if animation:
-                if animation[4][0].isCancelled():
-                    cancelled = True
-                    break
+        if node_id:
+            error_node_style(node_id, True, execution_message)
 
-            sleep(.1)
-
-        interrupt()
-
-        if task:
-            del task[0]
+        if not iteration_mode:
+            nuke.message(error)
 
-        ws.close()
+    def on_finished(cancelled):
+        run_node.knob('comfyui_submit').setEnabled(True)
+        nuke.comfyui_running = False
 
         if cancelled:
-            run_node.knob('comfyui_submit').setEnabled(True)
-            nuke.comfyui_running = False
+            finish('cancelled')
             return
 
-        nuke.executeInMainThread(progress_finished, args=(run_node))
-        run_node.knob('comfyui_submit').setEnabled(True)
-        nuke.comfyui_running = False
+        try:
+            progress_finished(run_node)
+        finally:
+            finish('error' if execution_error[0] else 'success')
 
     def progress_finished(n):
-        filename = get_filename(run_node)
+        with timing.span('readback', record):
+            filename = get_filename(run_node)
 
         if iterations:
             current_iteration, total_iterations, iteration_callback, finished_callback, iteration_task = iterations
@@ -478,7 +500,8 @@ def submit(run_node=None, animation=None, iterations=None, success_callback=None
             # Run normal completion steps for this iteration
             try:
                 if filename:  # Only create read node if we have a valid filename
-                    read = create_read(n, filename)
+                    with timing.span('readback', record):
+                        read = create_read(n, filename)
                 else:
                     read = None
 
@@ -541,11 +564,22 @@ def submit(run_node=None, animation=None, iterations=None, success_callback=None
             return
 
         if animation:
-            frame, last_frame, each, end, animation_task = animation
+            frame, last_frame, each, end, animation_task = animation[:5]
             if animation_task[0].isCancelled():
                 return
 
-            each(frame, get_filename(run_node))
+            each(frame, filename)
+
+            if window:
+                window_size, window_overlap, _ = animation[5]
+                if window[3] >= last_frame:
+                    end()
+                    return
+
+                next_frame = frame + max(1, window_size - window_overlap)
+                submit(run_node, animation=(next_frame, last_frame, each,
+                                            end, animation_task, animation[5]))
+                return
 
             next_frame = frame + 1
             if next_frame > last_frame:
@@ -558,7 +592,8 @@ def submit(run_node=None, animation=None, iterations=None, success_callback=None
             return
 
         try:
-            read = create_read(n, filename)
+            with timing.span('readback', record):
+                read = create_read(n, filename)
 
             if success_callback:
                 success_callback(read)
@@ -571,14 +606,25 @@ def submit(run_node=None, animation=None, iterations=None, success_callback=None
             nuke.executeInMainThread(
                 nuke.message, args=(traceback.format_exc()))
 
-    ws = websocket.WebSocketApp(url, on_message=on_message, on_error=on_error)
+    job = dispatcher.Job(task, on_executed, on_error, on_finished,
+                         cancel_tasks=[animation[4]] if animation else [], timing=record, profile=profile,
+                         preview=preview.create(run_node), on_preview=on_preview)
+    record.prompt_id = job.prompt_id
+
+    lane = get_priority(run_node, animation, iterations, priority)
 
-    threading.Thread(target=ws.run_forever).start()
-    threading.Thread(target=progress_task_loop).start()
+    body = {
+        'client_id': client_id,
+        'prompt_id': job.prompt_id,
+        'prompt': remote_data,
+        'extra_data': dispatcher.lane_extra_data(lane)
+    }
 
-    error = POST('prompt', body)
+    if lane == 'interactive':
+        body['front'] = True
 
-    if error:
+    def submit_error(error):
+        dispatcher.unregister(job)
         execution_error[0] = True
         if task:
             del task[0]
@@ -586,6 +632,102 @@ def submit(run_node=None, animation=None, iterations=None, success_callback=None
         if not iteration_mode:
             nuke.message(error)
         run_node.knob('comfyui_submit').setEnabled(True)
+        metrics.inc('nuke_comfyui_jobs_failed_total', reason='submit', server=server, workflow=workflow)
+        finish('error')
+
+    hold_start = [None]
+
+    def post_prompt():
+        with profiling.section('main', profile):
+            _post_prompt()
+
+    def _post_prompt():
+        # Cancelled while it was waiting to be posted
+        if job.cancelled or job.is_cancelled():
+            job.released = False
+            return
+
+        if hold_start[0]:
+            record.add('background_hold', hold_start[0], time())
+
+        with timing.span('post_prompt', record):
+            prompt_id, error = queue_prompt(body)
+
+        job.released = False
+        record.queued = time()
+
+        if error:
+            submit_error(error)
+            return
+
+        dispatcher.set_prompt_id(job, prompt_id)
+        record.prompt_id = job.prompt_id
+
+        metrics.inc('nuke_comfyui_jobs_submitted_total', lane=lane, mode=record.mode,
+                    server=server, workflow=workflow)
+
+    if not dispatcher.register(job):
+        submit_error('Error connecting to websocket {} on port {} !'.format(
+            NUKE_COMFYUI_IP(), NUKE_COMFYUI_PORT()))
+        return job
+
+    if lane == 'background' and dispatcher.background_slots() < 1:
+        task[0].setMessage('Waiting for the background queue...')
+        hold_start[0] = time()
+        dispatcher.hold(job, post_prompt)
+        return job
+
+    post_prompt()
+    return job
+
+
+def get_animation_window(animation):
+    """Returns (first_frame, last_frame, start, end) of the window being sent,
+    where first_frame and last_frame is the full range that is exported."""
+
+    if not animation or len(animation) < 6 or not animation[5]:
+        return
+
+    frame, last_frame = animation[:2]
+    window_size, _, first_frame = animation[5]
+
+    return first_frame, last_frame, frame, min(frame + window_size - 1, last_frame)
+
+
+def get_workflow_name(run_node):
+    """Gizmo of the Run without the number, or the class of the output node
+    when the Run is not inside a gizmo."""
+
+    parent = run_node.parent()
+    if parent and not parent.Class() == 'Root':
+        return parent.name().rstrip('0123456789') or parent.name()
+
+    output_node = get_input(run_node, 0)
+    if not output_node:
+        return 'unknown'
+
+    return get_node_data(output_node).get('class_type', 'unknown')
+
+
+def get_mode(animation=None, iterations=None):
+    if animation:
+        return 'animation'
+
+    if iterations:
+        return 'iteration'
+
+    return 'single'
+
+
+def get_priority(run_node, animation=None, iterations=None, priority=None):
+    if not priority:
+        priority_knob = run_node.knob('priority')
+        priority = priority_knob.value() if priority_knob else 'auto'
+
+    if priority == 'auto':
+        return 'background' if animation or iterations else 'interactive'
+
+    return priority
 
 
 def iteration_submit(iteration_count):
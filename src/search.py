@@ -0,0 +1,194 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+import re
+import nuke  # type: ignore
+
+from . import object_info
+from .update_menu import create_comfyui_node
+
+MAX_RESULTS = 50
+
+_index = [None]
+_panel = [None]
+
+
+class SearchIndex(object):
+    """Trigram index over the text of the nodes plus an index of the types
+    of their inputs and outputs, built from the cached object_info manifest."""
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+        self.texts = {}
+        self.trigrams = {}
+        self.prefixes = {}
+        self.input_types = {}
+        self.output_types = {}
+
+        for name, entry in nodes.items():
+            text = ' '.join([name, entry.display_name, entry.category]).lower()
+            self.texts[name] = text
+
+            for word in set(re.split(r'[^a-z0-9]+', text)):
+                if word:
+                    self.prefixes.setdefault(word[:2], set()).add(name)
+
+            for i in range(len(text) - 2):
+                self.trigrams.setdefault(text[i:i + 3], set()).add(name)
+
+            for _type in entry.input_types:
+                self.input_types.setdefault(_type.upper(), set()).add(name)
+
+            for _type in entry.output_types:
+                self.output_types.setdefault(_type.upper(), set()).add(name)
+
+    def candidates(self, term):
+        if len(term) < 2:
+            return set(self.texts)
+
+        if len(term) < 3:
+            return self.prefixes.get(term[:2], set())
+
+        result = None
+        for i in range(len(term) - 2):
+            names = self.trigrams.get(term[i:i + 3], set())
+            result = names if result is None else result & names
+
+            if not result:
+                return set()
+
+        return result
+
+    def search(self, query, max_results=MAX_RESULTS):
+        """Words are matched against name, display name and category, the
+        'in:TYPE' and 'out:TYPE' words filter by the types of the inputs and
+        outputs, eg: 'in:image out:latent encode'."""
+
+        result = None
+        terms = []
+
+        for word in query.lower().split():
+            if word.startswith('in:') or word.startswith('out:'):
+                direction, _type = word.split(':', 1)
+                index = self.input_types if direction == 'in' else self.output_types
+                names = index.get(_type.upper(), set())
+            else:
+                terms.append(word)
+                names = set(n for n in self.candidates(word)
+                            if word in self.texts[n])
+
+            result = names if result is None else result & names
+
+            if not result:
+                return []
+
+        if result is None:
+            return []
+
+        def score(name):
+            entry = self.nodes[name]
+            display_name = entry.display_name.lower()
+            first = terms[0] if terms else ''
+
+            if first and (name.lower() == first or display_name == first):
+                rank = 0
+            elif first and display_name.startswith(first):
+                rank = 1
+            elif first and first in display_name:
+                rank = 2
+            else:
+                rank = 3
+
+            return rank, len(display_name), display_name
+
+        return sorted(result, key=score)[:max_results]
+
+
+def get_index():
+    manifest = object_info.load_manifest()
+    if not manifest:
+        return
+
+    index = _index[0]
+    if not index or not index.nodes is manifest['nodes']:
+        index = SearchIndex(manifest['nodes'])
+        _index[0] = index
+
+    return index
+
+
+def search(query, max_results=MAX_RESULTS):
+    index = get_index()
+    if not index:
+        return []
+
+    return index.search(query, max_results)
+
+
+def show_panel():
+    try:
+        from PySide2 import QtWidgets, QtCore  # type: ignore
+    except ImportError:
+        from PySide6 import QtWidgets, QtCore  # type: ignore
+
+    if not get_index():
+        nuke.message('Update all ComfyUI before searching nodes !')
+        return
+
+    if not _panel[0]:
+        _panel[0] = create_panel(QtWidgets, QtCore)
+
+    panel = _panel[0]
+    panel.show()
+    panel.raise_()
+    panel.activateWindow()
+
+
+def create_panel(QtWidgets, QtCore):
+    panel = QtWidgets.QDialog()
+    panel.setWindowTitle('ComfyUI Node Search')
+    panel.setWindowFlags(panel.windowFlags() | QtCore.Qt.WindowStaysOnTopHint)
+    panel.resize(420, 480)
+
+    line_edit = QtWidgets.QLineEdit()
+    line_edit.setPlaceholderText('name, category, in:IMAGE out:LATENT ...')
+
+    results = QtWidgets.QListWidget()
+    layout = QtWidgets.QVBoxLayout(panel)
+    layout.addWidget(line_edit)
+    layout.addWidget(results)
+
+    def update_results(text):
+        index = get_index()
+        results.clear()
+
+        if not index:
+            return
+
+        for name in index.search(text):
+            entry = index.nodes[name]
+            item = QtWidgets.QListWidgetItem(
+                '{}    ({})'.format(entry.display_name, entry.category))
+            item.setData(QtCore.Qt.UserRole, name)
+            item.setToolTip('{}\nin: {}\nout: {}'.format(
+                name, ', '.join(entry.input_types),
+                ', '.join(entry.output_types)))
+            results.addItem(item)
+
+        if results.count():
+            results.setCurrentRow(0)
+
+    def create(item=None):
+        item = item or results.currentItem()
+        if not item:
+            return
+
+        create_comfyui_node(item.data(QtCore.Qt.UserRole))
+
+    line_edit.textChanged.connect(update_results)
+    line_edit.returnPressed.connect(create)
+    results.itemActivated.connect(create)
+
+    return panel
@@ -0,0 +1,199 @@
+# -----------------------------------------------------------
+# AUTHOR --------> Francisco Contreras
+# OFFICE --------> Senior VFX Compositor, Software Developer
+# WEBSITE -------> https://vinavfx.com
+# -----------------------------------------------------------
+import os
+import json
+import threading
+from time import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Every finished submit is appended to this JSONL file when it is set
+TIMING_FILE = os.environ.get('NUKE_COMFYUI_TIMING_FILE', '')
+MAX_RECORDS = 200
+
+# Order of the stages in the summary
+STAGES = ['extract_data', 'export_inputs', 'remap_paths', 'background_hold',
+          'post_prompt', 'queue', 'execution', 'readback']
+
+records = OrderedDict()
+_current = [None]
+_nested = [0.0]
+_lock = threading.Lock()
+
+
+class Record(object):
+    """Times of a single submit, the spans are measured in the main thread and
+    the execution of the nodes from the websocket messages."""
+
+    def __init__(self, run_node, mode='single'):
+        self.prompt_id = None
+        self.run_node = run_node
+        self.mode = mode
+        self.created = time()
+        self.spans = []
+        self.nodes = OrderedDict()
+        self.cached = []
+        self.queued = None
+        self.started = None
+        self.executed = None
+        self.status = None
+        self.lock = threading.Lock()
+
+    def add(self, name, start, end, nested=0.0):
+        self.spans.append((name, start, end, nested))
+
+    def feed(self, type_data, data):
+        """Called with the messages of the prompt, in the dispatcher thread."""
+
+        now = time()
+
+        with self.lock:
+            if type_data == 'execution_start':
+                self.started = now
+
+            elif type_data == 'execution_cached':
+                self.cached.extend(data.get('nodes', []))
+
+            elif type_data == 'executing':
+                self._close_node(now)
+                node = data.get('node')
+
+                if self.started is None:
+                    self.started = now
+
+                if node:
+                    self.nodes[node] = [now, None]
+                else:
+                    self.executed = now
+
+            elif type_data in ['execution_success', 'execution_error', 'execution_interrupted']:
+                self._close_node(now)
+                if self.executed is None:
+                    self.executed = now
+
+    def _close_node(self, now):
+        for times in self.nodes.values():
+            if times[1] is None:
+                times[1] = now
+
+    def durations(self):
+        durations = OrderedDict((stage, 0.0) for stage in STAGES)
+
+        for name, start, end, nested in self.spans:
+            durations[name] = durations.get(name, 0.0) + end - start - nested
+
+        with self.lock:
+            if self.queued and self.started:
+                durations['queue'] = max(self.started - self.queued, 0.0)
+
+            if self.started and self.executed:
+                durations['execution'] = self.executed - self.started
+
+        return durations
+
+    def node_durations(self):
+        with self.lock:
+            return OrderedDict((node, end - start) for node, (start, end) in self.nodes.items()
+                               if not end is None)
+
+    def total(self):
+        ends = [end for _, _, end, _ in self.spans] + [self.executed or 0]
+        return max(ends) - self.created
+
+    def to_dict(self):
+        return {
+            'prompt_id': self.prompt_id,
+            'run_node': self.run_node,
+            'mode': self.mode,
+            'status': self.status,
+            'created': self.created,
+            'total': self.total(),
+            'stages': self.durations(),
+            'nodes': self.node_durations(),
+            'cached': list(self.cached)
+        }
+
+    def summary(self, slowest=3):
+        durations = self.durations()
+        lines = ['{} {} {:.2f}s'.format(
+            self.status or '', (self.prompt_id or '')[:8], self.total())]
+
+        stages = ['{} {:.2f}s'.format(stage, seconds)
+                  for stage, seconds in durations.items() if seconds > 0.005]
+
+        for i in range(0, len(stages), 3):
+            lines.append(', '.join(stages[i:i + 3]))
+
+        nodes = sorted(self.node_durations().items(), key=lambda n: -n[1])[:slowest]
+        if nodes:
+            lines.append('slowest: ' + ', '.join(
+                '{} {:.2f}s'.format(node, seconds) for node, seconds in nodes))
+
+        return '\n'.join(lines)
+
+
+@contextmanager
+def span(name, record=None):
+    """Measures the block as a stage of 'record', or of the record whose span
+    is open when no record is given, so that nested functions like the export
+    of the inputs don't need the record. The time of the nested spans is not
+    counted twice."""
+
+    previous, previous_nested = _current[0], _nested[0]
+    record = previous if record is None else record
+
+    _current[0] = record
+    _nested[0] = 0.0
+    start = time()
+
+    try:
+        yield record
+    finally:
+        end = time()
+        if record:
+            record.add(name, start, end, _nested[0])
+
+        _current[0] = previous
+        _nested[0] = previous_nested + end - start
+
+
+def finish(record, status, run_node=None):
+    """Keeps the record, shows the summary on the Run and appends it to the
+    TIMING_FILE."""
+
+    record.status = status
+
+    with record.lock:
+        if record.started and record.executed is None:
+            record.executed = time()
+
+    with _lock:
+        records[record.prompt_id or id(record)] = record
+        while len(records) > MAX_RECORDS:
+            records.popitem(last=False)
+
+    summary_knob = run_node.knob('timing') if run_node else None
+    if summary_knob:
+        summary_knob.setValue(record.summary())
+
+    if TIMING_FILE:
+        try:
+            export(TIMING_FILE, [record], append=True)
+        except:
+            pass
+
+
+def export(path, export_records=None, append=False):
+    """Writes the records as JSON lines, all the records kept in this session
+    by default."""
+
+    if export_records is None:
+        with _lock:
+            export_records = list(records.values())
+
+    with open(path, 'a' if append else 'w') as f:
+        for record in export_records:
+            f.write(json.dumps(record.to_dict()) + '\n')
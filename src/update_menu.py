@@ -7,15 +7,25 @@ from functools import partial
 import re
 import os
 import json
+import threading
 import nuke  # type: ignore
 
 from ..nuke_util.nuke_util import set_tile_color, get_output_nodes
-from .connection import GET, convert_to_utf8
+from . import object_info
 from ..env import NUKE_COMFYUI_NUKE_USER
 
 path = os.path.join(NUKE_COMFYUI_NUKE_USER(), 'nuke_comfyui')
-comfyui_nodes = {}
 menu_updated = False
+menu_built = False
+pending_categories = {}
+connected_menus = set()
+
+# Increase when create_node changes, so that old templates are not used
+TEMPLATE_VERSION = 1
+
+# The batch import workers only read templates, so that several processes
+# never write the same file.
+save_templates = True
 
 
 def remove_signs(string):
@@ -23,11 +33,77 @@ def remove_signs(string):
 
 
 def create_comfyui_node(node_type, inpanel=True):
-    node_data = comfyui_nodes.get(node_type)
+    template = get_template_path(node_type)
+
+    if template and os.path.isfile(template):
+        return paste_template(template, inpanel)
+
+    node_data = object_info.get_schema(node_type)
     if not node_data:
         return
 
-    return create_node(node_data, inpanel)
+    n = create_node(node_data, inpanel)
+
+    if template and save_templates and not 'ShowText' in node_data['name']:
+        save_template(n, template)
+
+    return n
+
+
+def get_template_path(node_type):
+    entry = object_info.get_nodes().get(node_type)
+    if not entry:
+        return
+
+    return os.path.join(object_info.get_cache_dir(), 'templates', '{}_{}_{}.nk'.format(
+        remove_signs(node_type), entry.hash[:12], TEMPLATE_VERSION))
+
+
+def save_template(node, template):
+    """Saves the node just created as a .nk, the next nodes of the same
+    schema are pasted from it instead of being built knob by knob."""
+
+    template_dir = os.path.dirname(template)
+    if not os.path.isdir(template_dir):
+        os.makedirs(template_dir)
+
+    prefix = os.path.basename(template).rsplit('_', 2)[0] + '_'
+    for filename in os.listdir(template_dir):
+        if filename.startswith(prefix) and filename.count('_') == prefix.count('_') + 1:
+            os.remove(os.path.join(template_dir, filename))
+
+    selected_nodes = nuke.selectedNodes()
+    [n.setSelected(False) for n in selected_nodes]
+
+    node.setSelected(True)
+    nuke.nodeCopy(template)
+    node.setSelected(False)
+
+    [n.setSelected(True) for n in selected_nodes]
+
+
+def paste_template(template, inpanel=True):
+    try:
+        selected_node = nuke.selectedNode()
+    except:
+        selected_node = None
+
+    [n.setSelected(False) for n in nuke.selectedNodes()]
+
+    n = nuke.nodePaste(template)
+
+    if selected_node:
+        n.setXYpos(selected_node.xpos(), selected_node.ypos() + 24)
+        n.setInput(0, selected_node)
+        for i, onode in get_output_nodes(selected_node):
+            onode.setInput(i, n)
+    else:
+        n.autoplace()
+
+    if inpanel:
+        n.showControlPanel()
+
+    return n
 
 
 def create_node(data, inpanel=True):
@@ -131,7 +207,7 @@ def create_node(data, inpanel=True):
             knob.setValue(default_value)
             knob.setTooltip(tooltip)
 
-        elif type(_class) == list:
+        elif type(_class) in [list, tuple]:
             knob = nuke.Enumeration_Knob(
                 knob_name, key, [str(i) for i in _class])
 
@@ -231,7 +307,10 @@ def create_node(data, inpanel=True):
 
 
 def update_menu():
-    if menu_updated:
+    if menu_updated or menu_built:
+        return True
+
+    if load_menu():
         return True
 
     return update()
@@ -240,67 +319,241 @@ def update_menu():
 def update():
     global menu_updated
 
-    info = GET('object_info')
-    if not info:
+    had_cache = bool(object_info.get_nodes())
+    nodes, changes = object_info.fetch()
+    if not nodes:
         return
 
     menu_updated = True
 
+    if not 'LoadEXR' in [name.replace('+', '') for name in nodes]:
+        nuke.message('ComfyUI-HQ-Image-Save module is required !')
+
+    if not apply_changes(changes):
+        return
+
+    report = changes_report(changes)
+    if report and had_cache:
+        nuke.message(report)
+
+    return True
+
+
+def update_in_background():
+    """Refresh the cache without blocking Nuke, the menu is updated in the
+    main thread when object_info has been downloaded."""
+
+    def refresh():
+        nodes, changes = object_info.fetch(quiet=True)
+        if nodes:
+            nuke.executeInMainThread(apply_changes, args=(changes,))
+
+    thread = threading.Thread(target=refresh)
+    thread.daemon = True
+    thread.start()
+
+
+def apply_changes(changes):
+    """Only add, remove or move the menu items of the nodes that changed."""
+
+    if not menu_built:
+        return load_menu()
+
+    comfyui_menu = nuke.menu('Nodes').menu('ComfyUI')
+    added_categories = []
+
+    # Not added to 'changes', that is also used for the report
+    moved = []
+
+    for name, entry in changes['removed']:
+        remove_menu_item(comfyui_menu, name, entry)
+
+    for name, old_entry, entry in changes['changed']:
+        if old_entry.menu == entry.menu:
+            continue
+
+        remove_menu_item(comfyui_menu, name, old_entry)
+        moved.append((name, old_entry, entry))
+
+    for name, entry in changes['added'] + [(name, entry) for name, _, entry in moved]:
+        category = entry.menu.split('/')[0]
+
+        if not comfyui_menu.findItem(category):
+            comfyui_menu.addMenu(category)
+            added_categories.append(category)
+
+        if category in pending_categories or category in added_categories:
+            pending_categories.setdefault(category, []).append(
+                (entry.menu, name))
+            continue
+
+        add_menu_item(comfyui_menu, name, entry)
+
+    used_categories = set(e.menu.split('/')[0]
+                          for e in object_info.get_nodes().values())
+
+    # Categories left empty by the removed and the moved nodes
+    for name, entry in changes['removed'] + [(name, old_entry) for name, old_entry, _ in moved]:
+        category = entry.menu.split('/')[0]
+        if category in used_categories or not comfyui_menu.findItem(category):
+            continue
+
+        comfyui_menu.removeItem(category)
+        pending_categories.pop(category, None)
+
+    if added_categories:
+        if not nuke.GUI or not connect_lazy_menus(added_categories):
+            for category in added_categories:
+                populate_category(category)
+
+    return True
+
+
+def add_menu_item(comfyui_menu, name, entry):
+    icon_gray = '{}/icons/comfyui_icon_gray.png'.format(path)
+    comfyui_menu.addCommand(entry.menu, partial(
+        create_comfyui_node, name), '', icon_gray)
+
+
+def remove_menu_item(comfyui_menu, name, entry):
+    category = entry.menu.split('/')[0]
+
+    if category in pending_categories:
+        items = pending_categories[category]
+        if (entry.menu, name) in items:
+            items.remove((entry.menu, name))
+        return
+
+    parent_path, item_name = entry.menu.rsplit('/', 1)
+    parent = comfyui_menu.findItem(parent_path)
+
+    if parent and parent.findItem(item_name):
+        parent.removeItem(item_name)
+
+
+def changes_report(changes, max_names=10):
+    report = ''
+
+    for title, items in [('Added', changes['added']),
+                         ('Removed', changes['removed']),
+                         ('Changed', changes['changed'])]:
+        if not items:
+            continue
+
+        names = sorted(item[0] for item in items)
+        report += '{} ({}):\n'.format(title, len(names))
+
+        for name in names[:max_names]:
+            report += ' - {}\n'.format(name)
+
+        if len(names) > max_names:
+            report += ' - ...\n'
+
+        report += '\n'
+
+    if not report:
+        return
+
+    return 'ComfyUI nodes updated:\n\n' + report
+
+
+def load_menu():
+    """Builds the ComfyUI menu from the cached manifest, only the category
+    submenus are created, their nodes are added when they are first opened."""
+
+    global menu_built
+
+    nodes = object_info.get_nodes()
+    if not nodes:
+        return
+
     comfyui_menu = nuke.menu('Nodes').addMenu('ComfyUI')
 
     for item in comfyui_menu.items():
-        if item.name() in ['Update all ComfyUI', 'Basic Nodes', 'Gizmos']:
+        if item.name() in ['Update all ComfyUI', 'Basic Nodes', 'Gizmos', 'Search Nodes']:
             continue
 
         if not hasattr(item, 'clearMenu'):
             continue
         item.clearMenu()
 
-    load_exr_exist = False
-    nodes = {}
+    pending_categories.clear()
 
-    def normalize_string(string):
-        string = ''.join(char if ord(
-            char) < 128 else '' for char in string)
-        return string.replace(' /', '/').replace('/ ', '/').strip()
+    for name, entry in nodes.items():
+        category = entry.menu.split('/')[0]
+        pending_categories.setdefault(category, []).append(
+            (entry.menu, name))
 
-    for _, value in info.items():
-        name = value['name'].replace('+', '')
+    for category in sorted(pending_categories):
+        comfyui_menu.addMenu(category)
 
-        if name == 'LoadEXR':
-            load_exr_exist = True
+    menu_built = True
 
-        display_name = normalize_string(value['display_name'])
-        category = normalize_string(value['category'])
+    if not nuke.GUI or not connect_lazy_menus(list(pending_categories)):
+        populate_all()
 
-        if not category:
-            category = 'Uncategorized'
-
-        value['category'] = category
+    return True
 
-        item_name = '{}/{}'.format(category, display_name)
-        nodes[item_name] = value
 
-    if not load_exr_exist:
-        nuke.message('ComfyUI-HQ-Image-Save module is required !')
+def populate_category(category):
+    items = pending_categories.pop(category, None)
+    if not items:
+        return
 
+    comfyui_menu = nuke.menu('Nodes').menu('ComfyUI')
     icon_gray = '{}/icons/comfyui_icon_gray.png'.format(path)
 
-    for fullname, value in sorted(nodes.items()):
-        input_data = value.get('input', {})
-        input_order = value.get('input_order', {})
+    for fullname, name in sorted(items):
+        comfyui_menu.addCommand(fullname, partial(
+            create_comfyui_node, name), '', icon_gray)
 
-        if not input_order:
-            value['input_order'] = {
-                'required': list(input_data.get('required', {})),
-                'optional': list(input_data.get('optional', {}))
-            }
 
-        value = json.loads(json.dumps(value))  # OrderedDict to Dict
-        value_utf8 = convert_to_utf8(value)
+def populate_all():
+    for category in list(pending_categories):
+        populate_category(category)
 
-        comfyui_nodes[value['name']] = value_utf8
-        comfyui_menu.addCommand(fullname, partial(
-            create_node, value_utf8), '', icon_gray)
 
-    return True
+def connect_lazy_menus(categories):
+    try:
+        from PySide2 import QtWidgets  # type: ignore
+    except ImportError:
+        try:
+            from PySide6 import QtWidgets  # type: ignore
+        except ImportError:
+            return
+
+    app = QtWidgets.QApplication.instance()
+    if not app:
+        return
+
+    connected = set()
+
+    for widget in app.allWidgets():
+        if not isinstance(widget, QtWidgets.QMenu):
+            continue
+
+        actions = widget.actions()
+        if not 'Update all ComfyUI' in [a.text().replace('&', '') for a in actions]:
+            continue
+
+        for action in actions:
+            category = action.text().replace('&', '')
+            submenu = action.menu()
+
+            if not submenu or not category in categories:
+                continue
+
+            connected.add(category)
+
+            if id(submenu) in connected_menus:
+                continue
+
+            submenu.aboutToShow.connect(partial(populate_category, category))
+            connected_menus.add(id(submenu))
+
+    # Categories that could not be found in Qt are filled now
+    for category in categories:
+        if not category in connected:
+            populate_category(category)
+
+    return bool(connected)
@@ -25,8 +25,33 @@ def center_nodes(nodes):
         node.setXYpos(int(new_x), int(new_y))
 
 
-def import_workflow():
-    workflow_path = nuke.getFilename('Workflow', '*.json')
+def get_link_index(data):
+    """link_id -> (origin_id, origin_slot), from the 'links' array of the
+    workflow, or from the outputs of the nodes if the array is missing."""
+
+    index = {}
+
+    for link in data.get('links') or []:
+        if type(link) == dict:
+            index[link['id']] = (link['origin_id'], link['origin_slot'])
+        elif link:
+            index[link[0]] = (link[1], link[2])
+
+    if index:
+        return index
+
+    for attrs in data['nodes']:
+        for slot, odata in enumerate(attrs.get('outputs') or []):
+            for link in odata.get('links') or []:
+                index[link] = (attrs['id'], slot)
+
+    return index
+
+
+def import_workflow(workflow_path=None):
+    if not workflow_path:
+        workflow_path = nuke.getFilename('Workflow', '*.json')
+
     if not workflow_path:
         return
 
@@ -36,6 +61,22 @@ def import_workflow():
     data = jread(workflow_path)
     [n.setSelected(False) for n in nuke.selectedNodes()]
 
+    nuke.Undo.begin('Import Workflow')
+    try:
+        _, not_installed = create_workflow(data)
+    finally:
+        nuke.Undo.end()
+
+    if not_installed:
+        nodes_list = '\n'.join(not_installed)
+        nuke.message(
+            'You need to install these nodes in ComfyUI:\n\n' + nodes_list)
+
+
+def create_workflow(data):
+    """Creates the nodes of the workflow in the current script, returns the
+    created nodes, left selected, and the types of the nodes that are not
+    installed in ComfyUI."""
     created_nodes = {}
     not_installed = []
     nodes = []
@@ -102,22 +143,20 @@ def import_workflow():
         bd.setSelected(False)
 
     if not nodes:
-        return
+        return nodes, not_installed
 
     center_nodes(nodes)
 
-    def find_node_link(link):
-        if not link:
-            return
+    link_index = get_link_index(data)
 
-        for node, attrs in created_nodes.values():
-            for odata in attrs.get('outputs', {}):
-                links = odata['links']
-                if not links:
-                    continue
+    def find_node_link(link):
+        origin_id, _ = link_index.get(link, (None, None))
+        node, _ = created_nodes.get(origin_id, (None, None))
+        return node
 
-                if link in links:
-                    return node
+    # All nodes of the same type share the knobs order, so the data knob is
+    # only parsed once per type.
+    knobs_orders = {}
 
     for node, attrs in created_nodes.values():
 
@@ -131,11 +170,14 @@ def import_workflow():
             node.knob('hide_input').setValue(True)
 
         else:
-            node_data = get_node_data(node)
-            if not node_data:
-                continue
+            if not attrs['type'] in knobs_orders:
+                node_data = get_node_data(node)
+                knobs_orders[attrs['type']] = node_data.get(
+                    'knobs_order') if node_data else None
 
-            knobs_order = node_data['knobs_order']
+            knobs_order = knobs_orders[attrs['type']]
+            if knobs_order is None:
+                continue
 
         widgets_values = attrs.get('widgets_values')
         values = []
@@ -193,7 +235,4 @@ def import_workflow():
 
     [n.setSelected(True) for n in nodes]
 
-    if not_installed:
-        nodes_list = '\n'.join(not_installed)
-        nuke.message(
-            'You need to install these nodes in ComfyUI:\n\n' + nodes_list)
+    return nodes, not_installed
@@ -1,3 +1,5 @@
-from . import (
-    testing
-)
+from ..src import LazyModule
+
+testing = LazyModule('.testing', __name__)
+
+__all__ = ['testing']
@@ -7,6 +7,8 @@ import nuke  # type: ignore
 
 
 def create_all_comfyui_nodes():
+    from ..src.update_menu import populate_all
+
     def get_menu_items(menu, items=None):
         if items is None:
             items = []
@@ -19,11 +21,12 @@ def create_all_comfyui_nodes():
 
         return items
 
+    populate_all()
     menu = nuke.menu('Nodes').menu('ComfyUI')
     all_items = get_menu_items(menu)
 
     for item in all_items:
-        if 'Update all' in item.name():
+        if 'Update all' in item.name() or 'Search Nodes' in item.name():
             continue
 
         item.invoke()